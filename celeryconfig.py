@@ -11,4 +11,23 @@ result_backend = "rpc://"
 imports = ('pmapi.celery_tasks',)
 
 # Celery prefetches tasks by default, which can cause it to hold open database connections even if concurrency is low. Limit the prefetch multiplier:
-worker_prefetch_multiplier = 1
\ No newline at end of file
+worker_prefetch_multiplier = 1
+
+# videos are transcoded by a worker consuming only this queue, its
+# --concurrency is the number of ffmpeg runs at once
+task_routes = {
+    "pmapi.celery_tasks.transcode_video": {"queue": "transcoding"},
+}
+
+# periodic tasks, run by the celery beat service
+beat_schedule = {
+    "prune-query-embeddings": {
+        "task": "pmapi.celery_tasks.prune_query_embedding_cache",
+        "schedule": int(os.getenv("QUERY_EMBEDDING_PRUNE_INTERVAL", 60 * 60)),
+    },
+    # the popularity of search suggestions counts upcoming event dates
+    "refresh-search-terms": {
+        "task": "pmapi.celery_tasks.refresh_search_terms",
+        "schedule": int(os.getenv("SEARCH_TERMS_REFRESH_INTERVAL", 60 * 60)),
+    },
+}
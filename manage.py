@@ -28,7 +28,6 @@ manager = Manager(app)
 manager.add_command("db", MigrateCommand)
 
 # manager.add_command("populate", Populate)
-# manager.add_command("cluster", ClusterEventLocations)
 class CreateDb(Command):
     def run(self):
         db.create_all()
@@ -78,27 +77,84 @@ class GenerateTypes(Command):
 
 class BackfillEventEmbeddings(Command):
     option_list = (
-        Option("--batch-size", dest="batch_size", type=int, default=100),
+        Option("--batch-size", dest="batch_size", type=int, default=1000),
         Option("--limit", dest="limit", type=int, default=None),
+        Option("--stale", action="store_true", dest="stale", default=False),
         Option("--force", action="store_true", dest="force", default=False),
     )
 
-    def run(self, batch_size, limit, force):
+    def run(self, batch_size, limit, stale, force):
         from scripts.backfill_event_embeddings import run_backfill
 
         run_backfill(
             batch_size=batch_size,
             limit=limit,
+            stale=stale,
             force=force,
             logger=app.logger,
         )
 
 
+class ClusterEventLocations(Command):
+    def run(self):
+        from pmapi.event_location.clustering import rebuild_clusters
+
+        count = rebuild_clusters(logger=app.logger)
+        print("Clustered {} locations".format(count))
+
+
+class VectorIndex(Command):
+    """Rebuilds the ANN index on event embeddings,
+    or exports them for the NumPy fallback index."""
+
+    option_list = (
+        Option("--method", dest="method", default="hnsw", choices=["hnsw", "ivfflat"]),
+        Option("--m", dest="m", type=int, default=16),
+        Option("--ef-construction", dest="ef_construction", type=int, default=64),
+        Option("--lists", dest="lists", type=int, default=None),
+        Option("--export", dest="export", default=None),
+    )
+
+    def run(self, method, m, ef_construction, lists, export):
+        from pmapi.services.vector_index import NumpyVectorIndex, build_index
+
+        if export:
+            index = NumpyVectorIndex.from_events()
+            index.save(export)
+            print("Exported {} embeddings to {}".format(len(index), export))
+            return
+
+        options = build_index(method, m=m, ef_construction=ef_construction, lists=lists)
+        print("Built {} index with {}".format(method, options))
+
+
+class SearchTerms(Command):
+    """Rebuilds the /search suggestions, refreshing their popularity."""
+
+    def run(self):
+        from pmapi.search.controllers import sync_search_terms
+
+        print("Wrote {} search terms".format(sync_search_terms()))
+
+
+class SiteMap(Command):
+    """Rewrites every sitemap shard and the sitemap index."""
+
+    def run(self):
+        from pmapi.sitemap.controllers import regenerate_sitemap
+
+        print("Wrote {} sitemap shards".format(regenerate_sitemap()))
+
+
 manager.add_command("create_db", CreateDb)
 manager.add_command("create_users", CreateUsers)
 manager.add_command("seed_test_db", SeedTestDb)
 manager.add_command("generate_types", GenerateTypes)
 manager.add_command("backfill_event_embeddings", BackfillEventEmbeddings)
+manager.add_command("cluster", ClusterEventLocations)
+manager.add_command("vector_index", VectorIndex)
+manager.add_command("search_terms", SearchTerms)
+manager.add_command("sitemap", SiteMap)
 
 # enable python shell with application context
 @manager.shell
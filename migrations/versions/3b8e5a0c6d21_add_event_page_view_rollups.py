@@ -0,0 +1,47 @@
+"""add event page view rollups
+
+Revision ID: 3b8e5a0c6d21
+Revises: 7d3f1c9a2b64
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e5a0c6d21'
+down_revision = '7d3f1c9a2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'event_page_view_rollups',
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('views', sa.Integer(), nullable=False),
+        sa.Column('unique_views', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('event_id', 'day')
+    )
+    op.create_index(
+        'idx_event_page_views_event_id_time',
+        'event_page_views_table',
+        ['event_id', 'time'],
+        unique=False
+    )
+    # backfill from the raw page views
+    op.execute(
+        "INSERT INTO event_page_view_rollups (event_id, day, views, unique_views) "
+        "SELECT event_id, time::date, count(*), count(DISTINCT user_id) "
+        "FROM event_page_views_table "
+        "WHERE event_id IS NOT NULL AND time IS NOT NULL "
+        "GROUP BY event_id, time::date"
+    )
+
+
+def downgrade():
+    op.drop_index('idx_event_page_views_event_id_time', table_name='event_page_views_table')
+    op.drop_table('event_page_view_rollups')
@@ -0,0 +1,27 @@
+"""add event location geography index
+
+Revision ID: 449648232d50
+Revises: 2b38c63195ff
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '449648232d50'
+down_revision = '2b38c63195ff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # used for KNN (<->) ordering and ST_DWithin in nearby searches
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_event_locations_geography "
+        "ON event_locations USING gist ((geo::geography))"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_event_locations_geography")
@@ -0,0 +1,80 @@
+"""add search terms
+
+Revision ID: 4f9c1e6a2d70
+Revises: e2a7b5d9c813
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f9c1e6a2d70'
+down_revision = 'e2a7b5d9c813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_table(
+        "search_terms",
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("term", sa.String(), nullable=False),
+        sa.Column("normalized", sa.String(), nullable=False),
+        sa.Column("popularity", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("kind", "key"),
+    )
+    op.create_index(
+        "idx_search_terms_normalized_trgm",
+        "search_terms",
+        ["normalized"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"normalized": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "idx_search_terms_kind_normalized",
+        "search_terms",
+        ["kind", "normalized"],
+        unique=False,
+        postgresql_ops={"normalized": "text_pattern_ops"},
+    )
+    # same rows as search_term_sources() in pmapi/search/controllers.py
+    op.execute(
+        """
+        INSERT INTO search_terms (kind, key, term, normalized, popularity)
+        SELECT 'tag', tags.tag, tags.tag, lower(tags.tag), count(event_tags.id)
+        FROM tags LEFT OUTER JOIN event_tags ON event_tags.tag_id = tags.tag
+        GROUP BY tags.tag
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO search_terms (kind, key, term, normalized, popularity)
+        SELECT 'artist', artists.id::varchar, artists.name, lower(artists.name),
+               coalesce(artists.popularity, 0)
+        FROM artists
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO search_terms (kind, key, term, normalized, popularity)
+        SELECT 'event', events.id::varchar, events.name, lower(events.name),
+               count(event_dates.id)
+        FROM events LEFT OUTER JOIN event_dates
+            ON event_dates.event_id = events.id
+            AND event_dates."end" >= now() AT TIME ZONE 'utc'
+            AND event_dates.cancelled != true
+        WHERE events.hidden = false
+        GROUP BY events.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("idx_search_terms_kind_normalized", table_name="search_terms")
+    op.drop_index("idx_search_terms_normalized_trgm", table_name="search_terms")
+    op.drop_table("search_terms")
@@ -0,0 +1,36 @@
+"""add query embeddings
+
+Revision ID: 5e1f8b3c9d47
+Revises: 9c4d2e7f1a35
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pmapi.db_types import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1f8b3c9d47'
+down_revision = '9c4d2e7f1a35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'query_embeddings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('query', sa.Text(), nullable=False),
+        sa.Column('embedding', Vector(dimensions=1536), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('model', 'query', name='uq_query_embeddings_model_query')
+    )
+    op.create_index('idx_query_embeddings_created_at', 'query_embeddings', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_query_embeddings_created_at', table_name='query_embeddings')
+    op.drop_table('query_embeddings')
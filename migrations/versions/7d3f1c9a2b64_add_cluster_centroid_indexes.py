@@ -0,0 +1,29 @@
+"""add cluster centroid indexes
+
+Revision ID: 7d3f1c9a2b64
+Revises: 449648232d50
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3f1c9a2b64'
+down_revision = '449648232d50'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # used to find the cluster of a grid cell and to filter clusters by map bounds
+    for zoom in range(2, 17):
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS idx_clusters_{0}_centroid "
+            "ON clusters_{0} USING gist (centroid)".format(zoom)
+        )
+
+
+def downgrade():
+    for zoom in range(2, 17):
+        op.execute("DROP INDEX IF EXISTS idx_clusters_{0}_centroid".format(zoom))
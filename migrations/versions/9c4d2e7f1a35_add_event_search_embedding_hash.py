@@ -0,0 +1,26 @@
+"""add event search embedding hash
+
+Revision ID: 9c4d2e7f1a35
+Revises: 3b8e5a0c6d21
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2e7f1a35'
+down_revision = '3b8e5a0c6d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('events', sa.Column('search_embedding_hash', sa.String(length=64), nullable=True))
+    op.add_column('events_version', sa.Column('search_embedding_hash', sa.String(length=64), autoincrement=False, nullable=True))
+
+
+def downgrade():
+    op.drop_column('events_version', 'search_embedding_hash')
+    op.drop_column('events', 'search_embedding_hash')
@@ -0,0 +1,28 @@
+"""add event search embedding ann index
+
+Revision ID: a6d0c4e2b918
+Revises: 5e1f8b3c9d47
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d0c4e2b918'
+down_revision = '5e1f8b3c9d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # requires pgvector >= 0.5.0, rebuild or tune with "manage.py vector_index"
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_events_search_embedding_ann "
+        "ON events USING hnsw (search_embedding vector_cosine_ops) "
+        "WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_events_search_embedding_ann")
@@ -0,0 +1,103 @@
+"""add gazetteer unique indexes
+
+Revision ID: a8d3e6f1c047
+Revises: f2c4d8a6b591
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3e6f1c047'
+down_revision = 'f2c4d8a6b591'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # merge the duplicates into the first row of each before indexing
+    op.execute("""
+        CREATE TEMPORARY TABLE region_duplicates ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY country_id, short_name ORDER BY id
+            ) AS keep_id
+            FROM regions
+        ) AS regions WHERE id <> keep_id
+    """)
+    op.execute("""
+        UPDATE localities SET region_id = d.keep_id
+        FROM region_duplicates d WHERE localities.region_id = d.id
+    """)
+    op.execute("""
+        UPDATE event_locations SET region_id = d.keep_id
+        FROM region_duplicates d WHERE event_locations.region_id = d.id
+    """)
+    op.execute("DELETE FROM regions USING region_duplicates d WHERE regions.id = d.id")
+
+    op.execute("""
+        CREATE TEMPORARY TABLE locality_duplicates ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY country_id, region_id, short_name ORDER BY id
+            ) AS keep_id
+            FROM localities
+        ) AS localities WHERE id <> keep_id
+    """)
+    op.execute("""
+        UPDATE event_locations SET locality_id = d.keep_id
+        FROM locality_duplicates d WHERE event_locations.locality_id = d.id
+    """)
+    op.execute("DELETE FROM localities USING locality_duplicates d WHERE localities.id = d.id")
+
+    op.execute("""
+        CREATE TEMPORARY TABLE type_duplicates ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (PARTITION BY type ORDER BY id) AS keep_id
+            FROM event_location_types
+        ) AS types WHERE id <> keep_id
+    """)
+    op.execute("""
+        INSERT INTO event_location_type_association (event_location_type_id, event_location_id)
+        SELECT d.keep_id, a.event_location_id
+        FROM event_location_type_association a
+        JOIN type_duplicates d ON a.event_location_type_id = d.id
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute("""
+        DELETE FROM event_location_type_association a
+        USING type_duplicates d WHERE a.event_location_type_id = d.id
+    """)
+    op.execute("DELETE FROM event_location_types t USING type_duplicates d WHERE t.id = d.id")
+
+    op.create_index(
+        "uq_regions_country_id_short_name",
+        "regions",
+        ["country_id", "short_name"],
+        unique=True,
+    )
+    op.create_index(
+        "uq_localities_country_id_region_id_short_name",
+        "localities",
+        ["country_id", "region_id", "short_name"],
+        unique=True,
+    )
+    op.create_index(
+        "uq_localities_country_id_short_name_no_region",
+        "localities",
+        ["country_id", "short_name"],
+        unique=True,
+        postgresql_where=sa.text("region_id IS NULL"),
+    )
+    op.create_unique_constraint(
+        "event_location_types_type_key", "event_location_types", ["type"]
+    )
+
+
+def downgrade():
+    op.drop_constraint("event_location_types_type_key", "event_location_types")
+    op.drop_index("uq_localities_country_id_short_name_no_region", table_name="localities")
+    op.drop_index("uq_localities_country_id_region_id_short_name", table_name="localities")
+    op.drop_index("uq_regions_country_id_short_name", table_name="regions")
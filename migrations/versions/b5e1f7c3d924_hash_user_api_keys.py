@@ -0,0 +1,36 @@
+"""hash user api keys
+
+Revision ID: b5e1f7c3d924
+Revises: a8d3e6f1c047
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1f7c3d924'
+down_revision = 'a8d3e6f1c047'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('api_key_hash', sa.String(length=64), nullable=True))
+    # existing keys keep working
+    op.execute("""
+        UPDATE users SET api_key_hash = encode(sha256(convert_to(api_key, 'UTF8')), 'hex')
+        WHERE api_key IS NOT NULL
+    """)
+    op.create_index(op.f('ix_users_api_key_hash'), 'users', ['api_key_hash'], unique=True)
+    op.drop_index(op.f('ix_users_api_key'), table_name='users')
+    op.drop_column('users', 'api_key')
+
+
+def downgrade():
+    # the keys can't be recovered from their hashes, new ones have to be generated
+    op.add_column('users', sa.Column('api_key', sa.String(length=255), nullable=True))
+    op.create_index(op.f('ix_users_api_key'), 'users', ['api_key'], unique=True)
+    op.drop_index(op.f('ix_users_api_key_hash'), table_name='users')
+    op.drop_column('users', 'api_key_hash')
@@ -0,0 +1,28 @@
+"""add media item status
+
+Revision ID: b7e3d1f05a92
+Revises: 4f9c1e6a2d70
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3d1f05a92'
+down_revision = '4f9c1e6a2d70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # not versioned, media_items_version doesn't get the column
+    op.add_column(
+        "media_items",
+        sa.Column("status", sa.String(length=20), server_default="ready", nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("media_items", "status")
@@ -0,0 +1,25 @@
+"""add media item progress
+
+Revision ID: c3f8a2e7d416
+Revises: b7e3d1f05a92
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a2e7d416'
+down_revision = 'b7e3d1f05a92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # not versioned, media_items_version doesn't get the column
+    op.add_column("media_items", sa.Column("progress", sa.SmallInteger(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("media_items", "progress")
@@ -0,0 +1,29 @@
+"""add sitemap shards
+
+Revision ID: c7d2a9e4f316
+Revises: b5e1f7c3d924
+Create Date: 2026-10-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2a9e4f316'
+down_revision = 'b5e1f7c3d924'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sitemap_shards',
+        sa.Column('shard', sa.String(length=32), nullable=False),
+        sa.Column('pending_since', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('shard')
+    )
+
+
+def downgrade():
+    op.drop_table('sitemap_shards')
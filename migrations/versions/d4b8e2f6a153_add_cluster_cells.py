@@ -0,0 +1,59 @@
+"""add cluster cells
+
+Revision ID: d4b8e2f6a153
+Revises: c7d2a9e4f316
+Create Date: 2026-10-22 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2f6a153'
+down_revision = 'c7d2a9e4f316'
+branch_labels = None
+depends_on = None
+
+CLUSTER_ZOOM_LEVELS = range(2, 17)
+# web mercator can't represent the poles
+MAX_LATITUDE = 85.05112878
+
+
+def upgrade():
+    for zoom in CLUSTER_ZOOM_LEVELS:
+        table = 'clusters_{}'.format(zoom)
+        op.add_column(table, sa.Column('cell', sa.BigInteger(), nullable=True))
+        op.create_unique_constraint('{}_cell_key'.format(table), table, ['cell'])
+        # the cell of each centroid, the same grid as clustering.grid_cells.
+        # Only the first cluster of a cell gets it, the next rebuild merges the others
+        n = 2 ** (zoom + 2)
+        op.execute(
+            """
+            UPDATE {table} SET cell = cells.cell
+            FROM (
+                SELECT DISTINCT ON (cell) cluster_id, cell FROM (
+                    SELECT
+                        cluster_id,
+                        least(greatest(floor((ST_X(centroid) + 180) / 360 * {n}), 0), {n} - 1)::bigint * {n}
+                        + least(greatest(floor(
+                            (1 - ln(tan(lat) + 1 / cos(lat)) / pi()) / 2 * {n}
+                        ), 0), {n} - 1)::bigint AS cell
+                    FROM {table},
+                    LATERAL (
+                        SELECT radians(least(greatest(ST_Y(centroid), -{max_lat}), {max_lat})) AS lat
+                    ) AS latitude
+                    WHERE centroid IS NOT NULL
+                ) AS centroid_cells
+                ORDER BY cell, cluster_id
+            ) AS cells
+            WHERE {table}.cluster_id = cells.cluster_id
+            """.format(table=table, n=n, max_lat=MAX_LATITUDE)
+        )
+
+
+def downgrade():
+    for zoom in CLUSTER_ZOOM_LEVELS:
+        table = 'clusters_{}'.format(zoom)
+        op.drop_constraint('{}_cell_key'.format(table), table, type_='unique')
+        op.drop_column(table, 'cell')
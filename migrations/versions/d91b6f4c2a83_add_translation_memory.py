@@ -0,0 +1,33 @@
+"""add translation memory
+
+Revision ID: d91b6f4c2a83
+Revises: c3f8a2e7d416
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91b6f4c2a83'
+down_revision = 'c3f8a2e7d416'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'translation_memory',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_hash', sa.String(length=64), nullable=False),
+        sa.Column('lang', sa.String(length=10), nullable=False),
+        sa.Column('translation', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('source_hash', 'lang', name='uq_translation_memory_source_hash_lang')
+    )
+
+
+def downgrade():
+    op.drop_table('translation_memory')
@@ -0,0 +1,31 @@
+"""add event name trigram index
+
+Revision ID: e2a7b5d9c813
+Revises: a6d0c4e2b918
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7b5d9c813'
+down_revision = 'a6d0c4e2b918'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "idx_events_name_trgm",
+        "events",
+        ["name"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+
+
+def downgrade():
+    op.drop_index("idx_events_name_trgm", table_name="events")
@@ -0,0 +1,40 @@
+"""add event location tz
+
+Revision ID: e5a9c7b3f120
+Revises: d91b6f4c2a83
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pmapi.services.timezones import timezones_at
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c7b3f120'
+down_revision = 'd91b6f4c2a83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # not versioned, event_locations_version doesn't get the column
+    op.add_column("event_locations", sa.Column("tz", sa.String(), nullable=True))
+
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.text(
+            "SELECT id, lat, lng FROM event_locations"
+            " WHERE lat IS NOT NULL AND lng IS NOT NULL"
+        )
+    ).fetchall()
+    tzs = timezones_at([(row.lat, row.lng) for row in rows])
+    updates = [{"id": row.id, "tz": tz} for row, tz in zip(rows, tzs) if tz]
+    if updates:
+        conn.execute(
+            sa.text("UPDATE event_locations SET tz = :tz WHERE id = :id"), updates
+        )
+
+
+def downgrade():
+    op.drop_column("event_locations", "tz")
@@ -0,0 +1,41 @@
+"""add geocode cache
+
+Revision ID: f2c4d8a6b591
+Revises: e5a9c7b3f120
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c4d8a6b591'
+down_revision = 'e5a9c7b3f120'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'geocode_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('key', sa.Text(), nullable=False),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'key', name='uq_geocode_cache_kind_key')
+    )
+    op.create_index(
+        'idx_event_locations_lower_description',
+        'event_locations',
+        [sa.text('lower(description)')],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('idx_event_locations_lower_description', table_name='event_locations')
+    op.drop_table('geocode_cache')
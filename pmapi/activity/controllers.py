@@ -8,7 +8,14 @@ from sqlalchemy import or_, desc, and_
 from sqlalchemy import inspect
 from sqlalchemy.orm import contains_eager, aliased
 from collections import defaultdict
-from pmapi.common.controllers import CustomPagination, paginate_json, paginated_results
+from pmapi.common.controllers import (
+    CursorPagination,
+    CustomPagination,
+    estimate_count,
+    keyset_page,
+    paginate_json,
+    paginated_results,
+)
 import pprint
 from pmapi.exceptions import InvalidAPIRequest
 
@@ -56,13 +63,19 @@ def get_activities(user_id=None, **kwargs):
     # Manual pagination
     page = kwargs.get('page', 1)
     per_page = kwargs.get('per_page', 10)
-    total = transactions_query.count()
+    cursor = kwargs.get('cursor')
 
-    if page > 0:
-        transactions_query = transactions_query.offset((page - 1) * per_page).limit(per_page)
+    if cursor is not None:
+        transactions, next_cursor = keyset_page(
+            transactions_query, [(Transaction.id, True)], cursor, per_page
+        )
+    else:
+        total = transactions_query.count()
 
+        if page > 0:
+            transactions_query = transactions_query.offset((page - 1) * per_page).limit(per_page)
 
-    transactions = transactions_query.all()
+        transactions = transactions_query.all()
 
     # Fetch all activity details for the transaction ids
     transaction_ids = [transaction.transaction_id for transaction in transactions]
@@ -84,6 +97,10 @@ def get_activities(user_id=None, **kwargs):
             "username": transaction.username,
             "activities": activities,
         })
+    if cursor is not None:
+        return CursorPagination(
+            json_result, per_page, cursor, next_cursor, estimate_count(transactions_query)
+        )
     return CustomPagination(json_result, page, per_page, total)
 
 def get_activities_unique(user_id=None, **kwargs):
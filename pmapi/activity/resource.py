@@ -7,7 +7,7 @@ from flask_login import login_required
 from flask_login import current_user
 from marshmallow import fields
 
-from pmapi.common.controllers import paginated_view_args
+from pmapi.common.controllers import cursor_pagination_args, paginated_view_args
 from pmapi.event.model import Event
 from pmapi.extensions import db, activity_plugin
 from pmapi.activity.schemas import ActivityListSchema, PaginatedTransactionActivitiesSchema, TransactionActivitiesSchema
@@ -78,6 +78,7 @@ class ActivityResource(MethodResource):
         {
             "username": fields.String(required=False),
             **paginated_view_args(sort_options=["id"]),
+            **cursor_pagination_args,
         },
         location="query")
     def get(self, **kwargs):
@@ -3,26 +3,23 @@ application.py
 - creates a Flask app instance and registers the database object
 """
 
+import atexit
 import logging
 import os
-from datetime import datetime
 
+import click
 from celery.app.control import Control
 from flask import Flask, g, jsonify, render_template, request
 from flask.helpers import get_debug_flag
 from flask_cors import cross_origin
 from flask_login import AnonymousUserMixin, current_user
 from flask_migrate import Migrate
-from flask_track_usage.storage.sql import SQLStorage
-from flask_track_usage.summarization import (
-    sumLanguage,
-    sumRemote,
-    sumServer,
-    sumUrl,
-    sumUserAgent,
-)
 from sqlalchemy.exc import DatabaseError, DBAPIError, IntegrityError
-from werkzeug.exceptions import InternalServerError, UnprocessableEntity
+from werkzeug.exceptions import (
+    InternalServerError,
+    RequestEntityTooLarge,
+    UnprocessableEntity,
+)
 from werkzeug.routing import RequestRedirect
 
 from pmapi import extensions
@@ -33,11 +30,15 @@ from pmapi.admin.views import (
     LogoutMenuLink,
     UserModelView,
 )
+from pmapi.auth import principal
 from pmapi.event.model import Event
+from pmapi.event.page_views import flush_on_exit
 from pmapi.event_date.model import EventDate
 from pmapi.event_location.model import EventLocation
+from pmapi.metrics import usage
 from pmapi.services.ip_location import get_location_from_ip
 from pmapi.services.translations import update_translations
+from pmapi.user import activity
 from pmapi.user.model import User
 from pmapi.utils import ROLES, SUPPORTED_LANGUAGES
 
@@ -84,13 +85,10 @@ def create_app(config=CONFIG, app_name="PARTYMAP"):
     @extensions.lm.request_loader
     def load_user_from_request(request):
         """Load user from API key header if present."""
-        from pmapi.user.model import User
-        from pmapi.utils import ROLES
-
         api_key = request.headers.get("X-API-Key") or request.args.get("api_key")
         if api_key:
-            user = User.query.filter_by(api_key=api_key).first()
-            if user and user.status == "active":
+            user = principal.load_api_key_principal(api_key)
+            if user and user.is_active:
                 return user
         return None
 
@@ -101,12 +99,19 @@ def create_app(config=CONFIG, app_name="PARTYMAP"):
         redirect_uri = request.args.get("redirect_uri")
         return render_template("oauth_redirect.html", redirect_uri=redirect_uri)
 
+    @app.before_request
+    def limit_content_length():
+        # werkzeug only checks MAX_CONTENT_LENGTH when it parses a form,
+        # a json or raw body would be read whatever its size
+        max_length = request.max_content_length
+        if max_length is not None and (request.content_length or 0) > max_length:
+            raise RequestEntityTooLarge()
+
     @app.before_request
     def update_last_active():
+        # noted in memory and written in batches (see user/activity.py)
         if current_user and current_user.is_authenticated:
-            current_user.last_active = datetime.utcnow()
-            extensions.db.session.add(current_user)
-            extensions.db.session.commit()
+            activity.record_activity(current_user)
 
     @app.after_request
     def add_partitioned_cookie(response):
@@ -120,12 +125,27 @@ def create_app(config=CONFIG, app_name="PARTYMAP"):
                 ]
         return response
 
+    @app.after_request
+    def add_server_timing(response):
+        # stages timed during the request (see event/retrieval.py)
+        timings = g.get("server_timing")
+        if timings:
+            response.headers["Server-Timing"] = ", ".join(
+                "{};dur={:.1f}".format(stage, duration) for stage, duration in timings
+            )
+        return response
+
     @app.teardown_appcontext
     def shutdown_session(exception=None):
         if exception:
             db.session.rollback()  # Rollback any uncommitted transaction
         db.session.remove()
 
+    # write the page views, usage and activity still buffered when the worker exits
+    atexit.register(flush_on_exit, app)
+    atexit.register(usage.flush_on_exit, app)
+    atexit.register(activity.flush_on_exit, app)
+
     with app.app_context():
         from pmapi import event_listeners  # Import here to avoid circular imports
 
@@ -180,12 +200,32 @@ def create_app(config=CONFIG, app_name="PARTYMAP"):
     def purge_tasks():
         pass
 
+    @app.cli.command("generate-api-key")
+    @click.argument("username")
+    def generate_api_key(username):
+        """Issues a new api key to a user, replacing their old one"""
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException("No user named {}".format(username))
+        api_key = user.generate_api_key()
+        db.session.commit()
+        # only the hash is stored, the key can't be shown again
+        click.echo(api_key)
+
     return app
 
 
 def register_extensions(app):
     with app.app_context():
         extensions.cache.init_app(app)
+        if app.config["RESPONSE_CACHE_TIMEOUT"] and not extensions.cache_is_shared(app):
+            # another process's commits couldn't invalidate the responses
+            app.logger.warning(
+                "CACHE_TYPE %s isn't shared between processes, "
+                "responses aren't cached",
+                app.config["CACHE_TYPE"],
+            )
+            app.config["RESPONSE_CACHE_TIMEOUT"] = 0
         try:
             extensions.db.init_app(app)
         except Exception as e:
@@ -200,12 +240,8 @@ def register_extensions(app):
         try:
             extensions.tracker.init_app(
                 app,
-                [
-                    SQLStorage(
-                        db=db,
-                        hooks=[sumRemote, sumLanguage, sumUrl, sumUserAgent, sumServer],
-                    ),
-                ],
+                # buffered, written with the summaries by a flusher thread
+                [usage.store_usage],
                 get_location_from_ip,
             )
 
@@ -267,7 +303,8 @@ def register_blueprints(app):
     app.register_blueprint(artists_blueprint, url_prefix="/api/artist")
     app.register_blueprint(search_blueprint, url_prefix="/api/search")
     app.register_blueprint(services_blueprint, url_prefix="/api/services")
-    app.register_blueprint(sitemap_blueprint, url_prefix="/sitemap.xml")
+    # /sitemap.xml and its /sitemap-<shard>.xml.gz
+    app.register_blueprint(sitemap_blueprint)
     app.register_blueprint(metrics_blueprint, url_prefix="/api/metrics")
 
 
@@ -325,7 +362,7 @@ def register_docs(app):
     )
     from pmapi.event_tag.resource import TagsResource
     from pmapi.services.resource import IpLookupResource
-    from pmapi.sitemap.resource import SiteMapResource
+    from pmapi.sitemap.resource import SiteMapResource, SiteMapShardResource
     from pmapi.suggestions.resource import (
         SuggestedEditResource,
         SuggestedEditsResource,
@@ -353,6 +390,7 @@ def register_docs(app):
     extensions.apidocs.register(ArtistResource, "artists.ArtistResource")
     extensions.apidocs.register(IpLookupResource, "service.IpLookupResource")
     extensions.apidocs.register(SiteMapResource, "sitemap.SiteMapResource")
+    extensions.apidocs.register(SiteMapShardResource, "sitemap.SiteMapShardResource")
 
 
 def register_errorhandlers(app):
@@ -1,5 +1,5 @@
 from flask import flash, current_app
-from flask_login import current_user, login_user
+from flask_login import login_user
 from flask_dance.contrib.google import make_google_blueprint
 from flask_dance.consumer import oauth_authorized, oauth_error, oauth_before_login
 from flask_dance.consumer.storage.sqla import SQLAlchemyStorage
@@ -7,6 +7,7 @@ from sqlalchemy.orm.exc import NoResultFound
 from flask import request, session, redirect
 import uuid
 
+from pmapi.auth import principal
 from pmapi.user.model import User, OAuth
 from pmapi.extensions import db, cache
 
@@ -15,7 +16,7 @@ import pmapi.user.controllers as users
 oauth_google_blueprint = make_google_blueprint(
     scope="openid https://www.googleapis.com/auth/userinfo.email",
     storage=SQLAlchemyStorage(
-        OAuth, db.session, cache=cache, user=current_user),
+        OAuth, db.session, cache=cache, user=principal.current_user_model),
 )
 
 
@@ -0,0 +1,121 @@
+"""
+principal.py
+- who is making a request, without loading their User. The session's
+  user id and the hash of an X-API-Key resolve to a Principal (id, role,
+  status, locale, last_active) kept in the cache for PRINCIPAL_CACHE_TTL
+  seconds. Any other attribute is read from the User, loaded on first
+  use, so current_user still works for writes.
+  Principals are invalidated when a commit changes their user
+  (see event_listeners.py), in any process, so they're only cached when
+  the cache is shared. Otherwise they're read from the db per request.
+"""
+
+from collections import namedtuple
+
+from flask import current_app
+from flask_login import current_user
+from sqlalchemy import select
+
+from pmapi.extensions import cache, cache_is_shared, db
+from pmapi.user.model import User
+
+USER_KEY_PREFIX = "principal:user:"
+API_KEY_PREFIX = "principal:api_key:"
+# the User columns a principal holds
+PRINCIPAL_COLUMNS = ("id", "role", "status", "locale", "last_active")
+
+
+class Principal(namedtuple("Principal", PRINCIPAL_COLUMNS)):
+    """An authenticated user as flask-login's current_user"""
+
+    __slots__ = ()
+
+    is_authenticated = True
+    is_anonymous = False
+
+    @property
+    def is_active(self):
+        return self.status == "active"
+
+    def get_id(self):
+        return self.id
+
+    @property
+    def user(self):
+        """The User, loaded once per session"""
+        return db.session.get(User, self.id)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+
+def user_key(user_id):
+    return USER_KEY_PREFIX + str(user_id)
+
+
+def api_key_key(api_key_hash):
+    return API_KEY_PREFIX + api_key_hash
+
+
+def cache_enabled():
+    return bool(current_app.config["PRINCIPAL_CACHE_TTL"]) and cache_is_shared()
+
+
+def cache_principal(principal):
+    if cache_enabled():
+        cache.set(
+            user_key(principal.id),
+            principal,
+            timeout=current_app.config["PRINCIPAL_CACHE_TTL"],
+        )
+
+
+def load_principal(user_id):
+    """The principal of a user id, None if there's no such user"""
+    principal = cache.get(user_key(user_id)) if cache_enabled() else None
+    if principal is None:
+        row = db.session.execute(
+            select(*[getattr(User, column) for column in PRINCIPAL_COLUMNS]).where(
+                User.id == user_id
+            )
+        ).first()
+        if row is None:
+            return None
+        principal = Principal(str(row.id), *row[1:])
+        cache_principal(principal)
+    return principal
+
+
+def load_api_key_principal(api_key):
+    """The principal of an api key, None if it isn't one"""
+    api_key_hash = User.hash_api_key(api_key)
+    user_id = cache.get(api_key_key(api_key_hash)) if cache_enabled() else None
+    if user_id is None:
+        user_id = db.session.execute(
+            select(User.id).where(User.api_key_hash == api_key_hash)
+        ).scalar()
+        if user_id is None:
+            return None
+        if cache_enabled():
+            cache.set(
+                api_key_key(api_key_hash),
+                str(user_id),
+                timeout=current_app.config["PRINCIPAL_CACHE_TTL"],
+            )
+    return load_principal(user_id)
+
+
+def current_user_model():
+    """The User of current_user, for relationships that need the model.
+    None if the user is anonymous"""
+    if not current_user.is_authenticated:
+        return None
+    user = current_user._get_current_object()
+    return user.user if isinstance(user, Principal) else user
+
+
+def invalidate(keys):
+    if cache_enabled():
+        cache.delete_many(*keys)
@@ -5,11 +5,11 @@ from flask_apispec import marshal_with
 from flask_apispec import MethodResource
 from flask_apispec import use_kwargs
 from marshmallow import fields
+from pmapi.auth import principal
 from pmapi.auth.controllers import authenticate_apple_user, authenticate_user
 import pmapi.exceptions as exc
 
 import pmapi.exceptions as exc
-from pmapi.user.model import User
 from pmapi.extensions import lm, db
 from pmapi.user.schemas import PrivateUserSchema
 
@@ -18,12 +18,7 @@ auth_blueprint = Blueprint("auth", __name__)
 
 @lm.user_loader
 def load_user(user_id):
-    print("load_user called")
-    print(user_id)
-    try:
-        return User.query.get(user_id)
-    except exc.RecordNotFound:
-        return None
+    return principal.load_principal(user_id)
 
 
 @doc(tags=["auth"])
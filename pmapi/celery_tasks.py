@@ -1,8 +1,6 @@
 import logging
 import os
-import time
 
-from ffmpy import FFmpeg
 from flask import g
 from flask.helpers import get_debug_flag
 from psycopg2 import OperationalError
@@ -15,8 +13,16 @@ from pmapi.event_artist.model import Artist
 from pmapi.event_date.model import EventDate
 from pmapi.event_review.model import EventReview
 from pmapi.extensions import db, mail
+from pmapi.media_item.renditions import process_media_item
+from pmapi.media_item.transcoding import transcode_media_item
 from pmapi.services.embeddings import refresh_event_embedding
-from pmapi.services.translations import get_description_translation
+from pmapi.services.query_embeddings import (
+    fill_query_embedding,
+    prune_query_embeddings,
+)
+from pmapi.search.controllers import refresh_search_term_popularity
+from pmapi.services.translations import get_translations
+from pmapi.sitemap.controllers import regenerate_sitemap
 from pmapi.utils import SUPPORTED_LANGUAGES
 
 from .config import DevConfig, ProdConfig
@@ -42,55 +48,6 @@ def background_send_mail(
     return result
 
 
-@celery.task()
-def run_video_conversion(
-    input_filepath,
-    output_filepath,
-    min_bitrate,
-    target_bitrate,
-    max_bitrate,
-    width,
-    height,
-):
-    ff = FFmpeg(
-        executable="/usr/bin/ffmpeg",
-        inputs={input_filepath: None},
-        outputs={
-            output_filepath: "-c:a libvorbis -c:v vp9 -b:v {0}k -minrate {1}k -maxrate {2}k \
-             -quality good -speed 4 -c:a libvorbis -vf scale={3}x{4}".format(
-                target_bitrate, min_bitrate, max_bitrate, width, height
-            )
-        },
-    )
-    ff.run()
-
-
-@celery.task()
-def get_video_thumbnail(
-    input_filepath,
-    thumb_out_filepath,
-    poster_out_filepath,
-    thumb_width=None,
-    thumb_height=None,
-):
-    ff = FFmpeg(
-        executable="/usr/bin/ffmpeg",
-        inputs={input_filepath: None},
-        outputs={
-            thumb_out_filepath: "-ss 00:00:01.000 -vframes 1 -vf scale={0}x{1}".format(
-                thumb_width, thumb_height
-            )
-        },
-    )
-    ff.run()
-    ff = FFmpeg(
-        executable="/usr/bin/ffmpeg",
-        inputs={input_filepath: None},
-        outputs={poster_out_filepath: "-ss 00:00:01.000 -vframes 1"},
-    )
-    ff.run()
-
-
 @celery.task(
     autoretry_for=(RequestException, OperationalError),
     retry_backoff=True,
@@ -136,6 +93,61 @@ def update_event_embedding(event_id):
         db.session.close()
 
 
+@celery.task(
+    autoretry_for=(RequestException, OperationalError),
+    retry_backoff=True,
+    retry_backoff_max=30,
+    max_retries=3,
+    ignore_result=True,
+)
+def cache_query_embedding(query):
+    fill_query_embedding(query)
+
+
+# scheduled by celery beat, see celeryconfig.py
+@celery.task(ignore_result=True)
+def prune_query_embedding_cache():
+    prune_query_embeddings()
+
+
+# scheduled by celery beat, see celeryconfig.py
+@celery.task(ignore_result=True)
+def refresh_search_terms():
+    refresh_search_term_popularity()
+
+
+@celery.task(
+    autoretry_for=(OperationalError,),
+    retry_backoff=True,
+    max_retries=3,
+    ignore_result=True,
+)
+def process_media_renditions(media_item_id):
+    process_media_item(media_item_id)
+
+
+# routed to the transcoding queue, see celeryconfig.py
+@celery.task(
+    autoretry_for=(OperationalError,),
+    retry_backoff=True,
+    max_retries=3,
+    ignore_result=True,
+    acks_late=True,
+)
+def transcode_video(media_item_id):
+    transcode_media_item(media_item_id)
+
+
+@celery.task(
+    autoretry_for=(OperationalError,),
+    retry_backoff=True,
+    max_retries=3,
+    ignore_result=True,
+)
+def update_sitemap(shards):
+    regenerate_sitemap(shards)
+
+
 @celery.task(
     autoretry_for=(RequestException, OperationalError),
     retry_backoff=True,
@@ -188,9 +200,11 @@ def update_translation_field(translation_field, input_text, onlyMissing=False):
     if translation_field is None:
         translation_field = {}
 
-    for lang in SUPPORTED_LANGUAGES:
-        if not onlyMissing or lang not in translation_field:
-            translation_field[lang] = get_description_translation(input_text, lang)
-            time.sleep(1.5)
+    langs = [
+        lang
+        for lang in SUPPORTED_LANGUAGES
+        if not onlyMissing or lang not in translation_field
+    ]
+    translation_field.update(get_translations(input_text, langs))
 
     return translation_field
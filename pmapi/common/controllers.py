@@ -1,6 +1,18 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
 from marshmallow import fields
 from marshmallow.validate import OneOf
 from math import ceil
+from sqlalchemy import and_, func, or_, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from pmapi.exceptions import InvalidAPIRequest
+from pmapi.extensions import db
+
 # kwargs params common to paginated views
 common_pagination_args = {
     "per_page": fields.Int(missing=10, description="Items per page"),
@@ -15,6 +27,17 @@ common_pagination_args = {
     "desc": fields.Bool(missing=False, description="Reverse sort results"),
 }
 
+# kwargs params of views that support keyset pagination
+cursor_pagination_args = {
+    "cursor": fields.Str(
+        description=(
+            "Opaque cursor for keyset pagination. Pass an empty cursor "
+            "for the first page, then the next_cursor of the previous "
+            "page. Replaces page, total is an estimate."
+        ),
+    ),
+}
+
 
 def paginated_view_args(sort_options):
     return dict(
@@ -26,7 +49,15 @@ def paginated_view_args(sort_options):
 
 
 def paginated_results(
-    model, query=None, page=1, per_page=10, sort=None, desc=False, **kwargs
+    model,
+    query=None,
+    page=1,
+    per_page=10,
+    sort=None,
+    desc=False,
+    cursor=None,
+    cursor_keys=None,
+    **kwargs
 ):
     """Returns a paginated list of `model`, optionally sorted
     :param obj model: a db.model to query for items
@@ -36,9 +67,18 @@ def paginated_results(
     :param int per_page: how many items to include in results
     :param str sort: model property to sort once
     :param bool desc: results should be sorted in reverse
+    :param str cursor: use keyset pagination from this cursor
+                       ("" for the first page) instead of page
+    :param list cursor_keys: [(column, descending)] the results are
+                             ordered and seeked on, defaults to sort, id
     """
     if not query:
         query = model.query
+    if cursor is not None:
+        if cursor_keys is None:
+            cursor_keys = [(seek_key(getattr(model, sort)), desc)] if sort else []
+            cursor_keys.append((model.id, desc))
+        return cursor_paginated_results(query, cursor_keys, cursor, per_page)
     if sort:
         sort_field = getattr(model, sort)
         if sort_field and desc:
@@ -50,6 +90,141 @@ def paginated_results(
         return {"items": query.all()}
     return query.paginate(page=page, per_page=per_page)
 
+
+def encode_cursor(values):
+    values = [
+        {"$dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, length):
+    def object_hook(obj):
+        if "$dt" in obj:
+            return datetime.fromisoformat(obj["$dt"])
+        return obj
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()), object_hook=object_hook)
+    except (ValueError, TypeError):
+        raise InvalidAPIRequest("Invalid cursor")
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidAPIRequest("Invalid cursor")
+    return values
+
+
+# what a null compares as when seeking on a nullable column, by type
+NULL_SEEK_VALUES = (
+    ((int, float, Decimal), 0),
+    ((str,), ""),
+    ((datetime,), datetime.min),
+)
+
+
+def seek_key(column):
+    """`column` to order and seek on. A row comparison with a null is null,
+    so the page after a null would come back empty: a nullable column
+    is seeked on with nulls as the lowest value of its type."""
+    expression = getattr(column, "expression", column)
+    if not getattr(expression, "nullable", False):
+        return column
+    try:
+        python_type = expression.type.python_type
+    except NotImplementedError:
+        python_type = None
+    for types, value in NULL_SEEK_VALUES:
+        if python_type and issubclass(python_type, types):
+            return func.coalesce(column, value)
+    raise InvalidAPIRequest("Can't page by {} with a cursor".format(expression.name))
+
+
+def seek_filter(keys, values):
+    """Rows after `values` in the order of `keys`. Keys must not be null,
+    see seek_key."""
+    if len({descending for column, descending in keys}) == 1:
+        # a row comparison can use a multicolumn index
+        row = tuple_(*[column for column, descending in keys])
+        values = tuple_(*values)
+        return row < values if keys[0][1] else row > values
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def keyset_page(query, keys, cursor=None, per_page=10):
+    """Returns (rows, next cursor) of the page of `query` after `cursor`.
+    Rows are entities for single entity queries.
+    :param list keys: [(column, descending)] to order and seek on, the
+                      last one must be unique (usually the id)
+    """
+    single_entity = len(query.column_descriptions) == 1
+    if cursor:
+        query = query.filter(seek_filter(keys, decode_cursor(cursor, len(keys))))
+
+    labels = ["cursor_{}".format(i) for i in range(len(keys))]
+    query = (
+        query.order_by(None)
+        .order_by(*[column.desc() if descending else column.asc() for column, descending in keys])
+        .add_columns(*[column.label(label) for (column, descending), label in zip(keys, labels)])
+        .limit(per_page + 1)
+    )
+    rows = query.all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([getattr(rows[-1], label) for label in labels])
+    if single_entity:
+        rows = [row[0] for row in rows]
+    return rows, next_cursor
+
+
+class explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kwargs)
+
+
+def estimate_count(query):
+    """Row count estimated by the query planner, without running the query"""
+    plan = db.session.execute(explain(query.order_by(None).statement)).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def cursor_paginated_results(query, keys, cursor, per_page=10):
+    items, next_cursor = keyset_page(query, keys, cursor, per_page)
+    return CursorPagination(items, per_page, cursor, next_cursor, estimate_count(query))
+
+
+class CursorPagination:
+    total_estimated = True
+
+    def __init__(self, items, per_page, cursor, next_cursor, total):
+        self.items = items
+        self.per_page = per_page
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.total = total
+
+    @property
+    def has_prev(self):
+        return bool(self.cursor)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
 class CustomPagination:
     def __init__(self, items, page, per_page, total):
         self.items = items
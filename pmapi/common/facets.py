@@ -0,0 +1,181 @@
+"""
+facets.py
+- top artists, tags and regions for a filtered set of event dates,
+  counted in SQL and optionally cached for a short time
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+
+from flask import current_app
+from flask_login import current_user
+from sqlalchemy import Float, String, cast, func, literal, null, select, union_all
+from sqlalchemy.orm import selectinload
+
+from pmapi.event_artist.model import Artist, EventDateArtist
+from pmapi.event_location.model import EventLocation, Region
+from pmapi.event_tag.model import EventTag, Tag
+from pmapi.extensions import cache, db
+
+FACET_LIMITS = {"artists": 10, "tags": 20, "regions": 20}
+
+# facets are counted over this many rows of the (sorted) results
+FACET_SAMPLE_SIZE = 100
+
+# the shapes expected by MinimalEventDateArtistSchema, EventTagSchema
+# and ExtendedRegionSchema
+FacetArtist = namedtuple("FacetArtist", ["artist", "count"])
+FacetTag = namedtuple("FacetTag", ["tag", "count"])
+FacetRegion = namedtuple(
+    "FacetRegion", ["id", "short_name", "long_name", "lat", "lng", "count"]
+)
+Facets = namedtuple("Facets", ["artists", "tags", "regions"])
+
+
+def facet_cache_key(namespace, filters):
+    """Returns a cache key for a normalized set of query filters.
+    Authenticated users can see their own hidden events, so they get
+    their own key."""
+    normalized = json.dumps(filters, sort_keys=True, default=str)
+    if current_user and current_user.is_authenticated:
+        normalized += ":" + str(current_user.id)
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    return "facets:{}:{}".format(namespace, digest)
+
+
+def get_event_date_facets(
+    query, entity, sample_size=FACET_SAMPLE_SIZE, cache_key=None
+):
+    """Returns the top artists, tags and regions of an event date query.
+    :param obj query: a filtered (and sorted) query joined with event dates
+    :param obj entity: the EventDate class or alias used by the query
+    :param int sample_size: only count the first n rows, None for all rows
+    :param str cache_key: cache the counts under this key, see facet_cache_key
+    """
+    timeout = current_app.config.get("FACETS_CACHE_TIMEOUT", 0)
+
+    counts = None
+    if cache_key and timeout:
+        counts = cache.get(cache_key)
+
+    if counts is None:
+        rows = query.with_entities(
+            entity.id.label("event_date_id"),
+            entity.event_id.label("event_id"),
+            entity.location_id.label("location_id"),
+        )
+        if sample_size:
+            rows = rows.limit(sample_size)
+        counts = count_facets(rows.cte("facet_event_dates"))
+        if cache_key and timeout:
+            cache.set(cache_key, counts, timeout=timeout)
+
+    return load_facets(counts)
+
+
+def count_facets(rows):
+    """Counts artists, tags and regions of a CTE of event date rows
+    (event_date_id, event_id, location_id) in a single query.
+    Returns plain lists so that the result can be cached."""
+
+    def top(facet, key, lat, lng, join, where=None):
+        facet_query = (
+            select(
+                [
+                    literal(facet).label("facet"),
+                    cast(key, String).label("key"),
+                    func.count().label("count"),
+                    lat.label("lat"),
+                    lng.label("lng"),
+                ]
+            )
+            .select_from(join)
+            .group_by(key)
+            .order_by(func.count().desc(), key)
+            .limit(FACET_LIMITS[facet])
+        )
+        if where is not None:
+            facet_query = facet_query.where(where)
+        return select([facet_query.subquery()])
+
+    no_coordinate = cast(null(), Float)
+
+    artists = top(
+        "artists",
+        EventDateArtist.artist_id,
+        no_coordinate,
+        no_coordinate,
+        rows.join(EventDateArtist, EventDateArtist.event_date_id == rows.c.event_date_id),
+    )
+    tags = top(
+        "tags",
+        EventTag.tag_id,
+        no_coordinate,
+        no_coordinate,
+        rows.join(EventTag, EventTag.event_id == rows.c.event_id),
+    )
+    regions = top(
+        "regions",
+        EventLocation.region_id,
+        func.avg(EventLocation.lat),
+        func.avg(EventLocation.lng),
+        rows.join(EventLocation, EventLocation.id == rows.c.location_id),
+        where=EventLocation.region_id.isnot(None),
+    )
+
+    counts = {"artists": [], "tags": [], "regions": []}
+    for row in db.session.execute(union_all(artists, tags, regions)):
+        counts[row.facet].append([row.key, row.count, row.lat, row.lng])
+    return counts
+
+
+def load_facets(counts):
+    """Loads the objects for facet counts with one query per facet."""
+    artist_ids = [int(key) for key, *_ in counts["artists"]]
+    artists = {}
+    if artist_ids:
+        artists = {
+            artist.id: artist
+            for artist in db.session.query(Artist)
+            .options(selectinload(Artist.media_items))
+            .filter(Artist.id.in_(artist_ids))
+        }
+
+    tag_ids = [key for key, *_ in counts["tags"]]
+    tags = {}
+    if tag_ids:
+        tags = {tag.tag: tag for tag in Tag.query.filter(Tag.tag.in_(tag_ids))}
+
+    region_ids = [key for key, *_ in counts["regions"]]
+    regions = {}
+    if region_ids:
+        regions = {
+            region.id: region
+            for region in Region.query.filter(Region.id.in_(region_ids))
+        }
+
+    return Facets(
+        artists=[
+            FacetArtist(artists[int(key)], count)
+            for key, count, _, _ in counts["artists"]
+            if int(key) in artists
+        ],
+        tags=[
+            FacetTag(tags[key], count)
+            for key, count, _, _ in counts["tags"]
+            if key in tags
+        ],
+        regions=[
+            FacetRegion(
+                key,
+                regions[key].short_name,
+                regions[key].long_name,
+                lat,
+                lng,
+                count,
+            )
+            for key, count, lat, lng in counts["regions"]
+            if key in regions
+        ],
+    )
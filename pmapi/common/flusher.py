@@ -0,0 +1,41 @@
+"""
+flusher.py
+- the thread writing a buffer of the worker process, e.g. page views,
+  request usage or users' last_active, every few seconds.
+  Threads don't survive the fork of a worker so each process starts its
+  own on the first buffered write.
+"""
+
+import os
+import threading
+import time
+
+
+class Flusher:
+    """Calls `flush` in an app context every `interval_key` seconds of
+    the app config, or whenever `wait` returns"""
+
+    def __init__(self, name, interval_key, flush, wait=time.sleep):
+        self.name = name
+        self.interval_key = interval_key
+        self._flush = flush
+        self._wait = wait
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        """Starts the thread of this process, unless it's running"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self.run, args=(app,), daemon=True).start()
+                    self._pid = os.getpid()
+
+    def run(self, app):
+        while True:
+            self._wait(app.config[self.interval_key])
+            with app.app_context():
+                try:
+                    self._flush()
+                except Exception:
+                    app.logger.exception("Flushing %s failed", self.name)
@@ -0,0 +1,37 @@
+"""
+loaders.py
+- batching for per-row properties of serialized lists.
+  A loader resolves a property for a page of instances with one query
+  and stores the values on the instances, where the model's property
+  returns them instead of querying per row.
+"""
+
+MISSING = object()
+
+
+def get_preloaded(instance, name):
+    """Returns the value a loader stored for a property, or MISSING."""
+    return getattr(instance, "_preloaded", {}).get(name, MISSING)
+
+
+def set_preloaded(instance, name, value):
+    if "_preloaded" not in instance.__dict__:
+        instance._preloaded = {}
+    instance._preloaded[name] = value
+
+
+def preload(schema, data, loaders):
+    """Runs the loaders of the properties a schema is going to dump.
+    Use in a pre_dump(pass_many=True) hook.
+    :param obj schema: the schema being dumped
+    :param data: an instance or a list of instances
+    :param dict loaders: {field name: function(instances)}
+    """
+    instances = data if isinstance(data, (list, tuple)) else [data]
+    instances = [instance for instance in instances if instance is not None]
+    if not instances:
+        return data
+    for name, loader in loaders.items():
+        if name in schema.dump_fields:
+            loader(instances)
+    return data
@@ -0,0 +1,103 @@
+"""
+response_cache.py
+- caches the responses of anonymous GET endpoints.
+  Every response is tagged with the tables it reads from, committing
+  a change to one of these tables invalidates the responses
+  (see event_listeners.py). The tag versions live in the cache shared by
+  the web, celery and CLI processes so a commit in any of them reaches
+  all of them, responses aren't cached when the cache isn't shared.
+"""
+
+import hashlib
+import uuid
+from functools import wraps
+
+from flask import Response, current_app, has_app_context, request
+from flask_login import current_user
+
+from pmapi.extensions import cache
+from pmapi.utils import get_locale
+
+TAG_KEY_PREFIX = "response_cache:tag:"
+
+
+def tag_versions(tags):
+    """Returns the current version of each tag. Invalidating a tag
+    changes its version, so keys built from old versions are never
+    read again (and expire on their own)."""
+    keys = [TAG_KEY_PREFIX + tag for tag in tags]
+    versions = dict(zip(tags, cache.get_many(*keys)))
+
+    # a tag whose version was evicted gets a new one, so entries built
+    # from the evicted version can't come back
+    missing = {tag: uuid.uuid4().hex for tag, version in versions.items() if version is None}
+    if missing:
+        cache.set_many(
+            {TAG_KEY_PREFIX + tag: version for tag, version in missing.items()}, timeout=0
+        )
+        versions.update(missing)
+
+    return [versions[tag] for tag in tags]
+
+
+def invalidate_tags(tags):
+    if not tags or not has_app_context():
+        return
+    cache.set_many({TAG_KEY_PREFIX + tag: uuid.uuid4().hex for tag in tags}, timeout=0)
+
+
+def response_cache_key(tags):
+    """Key for the current request: path, normalized query args,
+    locale and the versions of the tags."""
+    args = sorted((key, sorted(values)) for key, values in request.args.lists())
+    normalized = repr((request.path, args, get_locale(), tag_versions(tags)))
+    return "response_cache:" + hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def cached_response(*tags, timeout=None):
+    """Caches successful responses of a GET view for anonymous users.
+    :param tags: names of the tables the response is built from
+    :param int timeout: seconds to keep a response, defaults to
+        RESPONSE_CACHE_TIMEOUT (0 disables the cache for all endpoints)
+    """
+    tags = sorted(tags)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            default_timeout = current_app.config.get("RESPONSE_CACHE_TIMEOUT", 0)
+            # authenticated users see their own hidden events and
+            # user_going/user_interested, so they always get a fresh response
+            if (
+                request.method != "GET"
+                or not default_timeout
+                or current_user.is_authenticated
+            ):
+                return view(*args, **kwargs)
+
+            key = response_cache_key(tags)
+            cached = cache.get(key)
+            if cached is not None:
+                data, status, headers = cached
+                response = Response(data, status=status, headers=headers)
+                response.headers["X-Cache"] = "HIT"
+                return response.make_conditional(request)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                headers = [
+                    (name, value)
+                    for name, value in response.headers
+                    if name.lower() not in ("set-cookie", "content-length")
+                ]
+                cache.set(
+                    key,
+                    (response.get_data(), response.status_code, headers),
+                    timeout=timeout or default_timeout,
+                )
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
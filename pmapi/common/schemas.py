@@ -12,6 +12,9 @@ class PaginatedSchema(Schema):
     next_num = fields.Int()
     prev_num = fields.Int()
     total = fields.Int()
+    # keyset pagination
+    next_cursor = fields.Str(allow_none=True)
+    total_estimated = fields.Bool()
 
 class PaginatedJsonSchema(Schema):
     has_next = fields.Bool()
@@ -20,6 +23,9 @@ class PaginatedJsonSchema(Schema):
     pages = fields.Int()
     per_page = fields.Int()
     total = fields.Int()
+    # keyset pagination
+    next_cursor = fields.Str(allow_none=True)
+    total_estimated = fields.Bool()
 
 class BlacklistedDict(fields.Dict):
     def __init__(self, blacklist, **kwargs):
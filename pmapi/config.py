@@ -40,14 +40,72 @@ class BaseConfig(object):
     SPOTIFY_API_KEY = os.getenv("SPOTIFY_API_KEY")
     SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
     GMAPS_API_KEY = os.getenv("GMAPS_API_KEY")
+    # google, or fixture to geocode from GEOCODER_FIXTURES (see services/gmaps.py)
+    GEOCODER = os.getenv("GEOCODER", "google")
+    GEOCODER_FIXTURES = os.getenv("GEOCODER_FIXTURES")
+    # seconds geocoder results are cached
+    GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 60 * 60)))
 
     # This indicates that it's OK for Google to return different OAuth scopes than requested; Google does that sometimes.
     OAUTHLIB_RELAX_TOKEN_SCOPE = True
 
+    # country, region, locality and place type ids cached per process (see event_location/gazetteer.py)
+    GAZETTEER_CACHE_SIZE = int(os.getenv("GAZETTEER_CACHE_SIZE", "10000"))
+    GAZETTEER_CACHE_TTL = int(os.getenv("GAZETTEER_CACHE_TTL", "3600"))
+    # timezone lookups cached per process (see services/timezones.py)
+    TIMEZONE_CACHE_SIZE = int(os.getenv("TIMEZONE_CACHE_SIZE", "10000"))
+    # decimals the coordinates are rounded to, 4 is ~11m
+    TIMEZONE_CACHE_PRECISION = int(os.getenv("TIMEZONE_CACHE_PRECISION", "4"))
+    # GeoLite2 City database of the request ip lookups (see services/ip_location.py)
+    GEOIP_DATABASE_PATH = os.getenv(
+        "GEOIP_DATABASE_PATH", "/app/geoip-data/GeoLite2-City.mmdb"
+    )
+    # ip locations cached per process, per /24 network
+    GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "10000"))
+    GEOIP_CACHE_TTL = int(os.getenv("GEOIP_CACHE_TTL", str(24 * 60 * 60)))
+
     MEDIA_UPLOAD_FOLDER = TOP_LEVEL_DIR + "/static/uploaded_media/"
+    # files sent to /media/upload wait here until they're added to an item (see media_item/uploads.py),
+    # outside of the static folder so they aren't served before they're checked
+    MEDIA_UPLOAD_TMP_FOLDER = os.getenv(
+        "MEDIA_UPLOAD_TMP_FOLDER", TOP_LEVEL_DIR + "/tmp/uploads/"
+    )
+    # bytes, large enough for a 20 minute video
+    MEDIA_UPLOAD_MAX_SIZE = int(os.getenv("MEDIA_UPLOAD_MAX_SIZE", 500 * 1024 * 1024))
+    # bytes of a request body, larger requests get a 413 before they're read.
+    # Room for an upload as a base64File, which is 4/3 of the file's size
+    MAX_CONTENT_LENGTH = int(
+        os.getenv("MAX_CONTENT_LENGTH", MEDIA_UPLOAD_MAX_SIZE * 4 // 3 + 1024 * 1024)
+    )
+    # seconds before an upload that was never added to an item is removed
+    MEDIA_UPLOAD_TMP_MAX_AGE = int(os.getenv("MEDIA_UPLOAD_TMP_MAX_AGE", 24 * 60 * 60))
+    # write image renditions in celery instead of the request (see media_item/renditions.py)
+    MEDIA_RENDITIONS_ASYNC = os.getenv("MEDIA_RENDITIONS_ASYNC", "true").lower() == "true"
+    # ffmpeg threads per transcoding job, 0 lets ffmpeg choose (see media_item/transcoding.py)
+    VIDEO_TRANSCODE_THREADS = int(os.getenv("VIDEO_TRANSCODE_THREADS", 0))
+
+    # sitemap shards (see sitemap/controllers.py)
+    SITEMAP_DIR = os.getenv("SITEMAP_DIR", TOP_LEVEL_DIR + "/static/sitemap/")
+    # where the shards are served, listed in the sitemap index
+    SITEMAP_BASE_URL = os.getenv("SITEMAP_BASE_URL", WEBSITE_URL)
+    # ids per shard. Every url has a hreflang link per language (~1.7KB),
+    # 25000 keeps shards under the 50MB limit (the url limit is 50000)
+    SITEMAP_SHARD_SIZE = int(os.getenv("SITEMAP_SHARD_SIZE", "25000"))
+    # changes within this many seconds are written by one update
+    SITEMAP_UPDATE_DELAY = int(os.getenv("SITEMAP_UPDATE_DELAY", "300"))
 
     OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
     ENABLE_TRANSLATIONS = os.getenv("ENABLE_TRANSLATIONS", "false").lower() == "true"
+    # chat completions api asked for translations (see services/translations.py)
+    TRANSLATION_API_URL = os.getenv(
+        "TRANSLATION_API_URL", "https://openrouter.ai/api/v1/chat/completions"
+    )
+    TRANSLATION_MODEL = os.getenv("TRANSLATION_MODEL", "deepseek/deepseek-chat")
+    # languages requested in one completion, a completion that's cut off
+    # is requested again for each half of its languages
+    TRANSLATION_LANGUAGES_PER_REQUEST = int(
+        os.getenv("TRANSLATION_LANGUAGES_PER_REQUEST", "4")
+    )
     ENABLE_EVENT_EMBEDDINGS = (
         os.getenv("ENABLE_EVENT_EMBEDDINGS", "false").lower() == "true"
     )
@@ -57,11 +115,75 @@ class BaseConfig(object):
     )
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
     EVENT_EMBEDDING_DIMENSIONS = int(os.getenv("EVENT_EMBEDDING_DIMENSIONS", "1536"))
+    # batched embedding requests (see services/embeddings.py)
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+    EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "300"))
+    # cache of search query embeddings (see services/query_embeddings.py)
+    QUERY_EMBEDDING_TTL = int(os.getenv("QUERY_EMBEDDING_TTL", str(30 * 24 * 60 * 60)))
+    QUERY_EMBEDDING_MEMORY_SIZE = int(os.getenv("QUERY_EMBEDDING_MEMORY_SIZE", "2000"))
+    QUERY_EMBEDDING_MAX_ROWS = int(os.getenv("QUERY_EMBEDDING_MAX_ROWS", "100000"))
+    # on a miss search by text while the embedding is generated by celery
+    QUERY_EMBEDDING_BACKGROUND_FILL = (
+        os.getenv("QUERY_EMBEDDING_BACKGROUND_FILL", "true").lower() == "true"
+    )
     EVENT_SEARCH_VECTOR_MAX_DISTANCE = float(
         os.getenv("EVENT_SEARCH_VECTOR_MAX_DISTANCE", "0.45")
     )
+    # weights of each ranking in the reciprocal rank fusion (see event/retrieval.py)
     EVENT_SEARCH_TEXT_WEIGHT = float(os.getenv("EVENT_SEARCH_TEXT_WEIGHT", "0.35"))
     EVENT_SEARCH_VECTOR_WEIGHT = float(os.getenv("EVENT_SEARCH_VECTOR_WEIGHT", "0.65"))
+    EVENT_SEARCH_TRIGRAM_WEIGHT = float(os.getenv("EVENT_SEARCH_TRIGRAM_WEIGHT", "0.2"))
+    EVENT_SEARCH_RRF_K = int(os.getenv("EVENT_SEARCH_RRF_K", "60"))
+    # top candidates taken from each stage before fusing them, 0 disables trigrams
+    EVENT_SEARCH_FTS_CANDIDATES = int(os.getenv("EVENT_SEARCH_FTS_CANDIDATES", "200"))
+    EVENT_SEARCH_VECTOR_CANDIDATES = int(os.getenv("EVENT_SEARCH_VECTOR_CANDIDATES", "200"))
+    EVENT_SEARCH_TRIGRAM_CANDIDATES = int(os.getenv("EVENT_SEARCH_TRIGRAM_CANDIDATES", "50"))
+    # recall/latency of the ANN index (see services/vector_index.py)
+    EVENT_SEARCH_HNSW_EF_SEARCH = int(os.getenv("EVENT_SEARCH_HNSW_EF_SEARCH", "200"))
+    EVENT_SEARCH_IVFFLAT_PROBES = int(os.getenv("EVENT_SEARCH_IVFFLAT_PROBES", "10"))
+    # NumPy index snapshot used instead of pgvector ("manage.py vector_index --export")
+    EVENT_SEARCH_VECTOR_INDEX_PATH = os.getenv("EVENT_SEARCH_VECTOR_INDEX_PATH")
+
+    # flask-caching backend. The response, principal, stats and sitemap
+    # caches need one shared by every web, celery and CLI process (redis
+    # or memcached), they're disabled on the others ("simple", "null",
+    # "uwsgi", whose cache2 only the uwsgi workers share)
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+    CACHE_TYPE = os.getenv("CACHE_TYPE", "redis" if CACHE_REDIS_URL else "simple")
+    # whether every process sees the same cache, None derives it from
+    # CACHE_TYPE (see extensions.cache_is_shared)
+    CACHE_SHARED = None
+    CACHE_UWSGI_NAME = "pmapi"
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_THRESHOLD = 5000
+    # seconds to cache responses of anonymous GET endpoints, 0 to disable
+    RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", "300"))
+
+    # seconds to cache the top artists/tags/regions of a query, 0 to disable
+    FACETS_CACHE_TIMEOUT = int(os.getenv("FACETS_CACHE_TIMEOUT", "60"))
+    POINTS_TILE_MAX_AGE = int(os.getenv("POINTS_TILE_MAX_AGE", "60"))
+    # seconds between writes of the buffered event page views, 0 writes
+    # every view immediately
+    PAGE_VIEWS_FLUSH_INTERVAL = int(os.getenv("PAGE_VIEWS_FLUSH_INTERVAL", "30"))
+    # page views buffered per process, the oldest are dropped beyond it
+    PAGE_VIEWS_BUFFER_SIZE = int(os.getenv("PAGE_VIEWS_BUFFER_SIZE", "20000"))
+    # seconds between writes of the buffered request usage, 0 writes every
+    # request immediately (see metrics/usage.py)
+    USAGE_FLUSH_INTERVAL = int(os.getenv("USAGE_FLUSH_INTERVAL", "1"))
+    # buffered records that trigger a write before the interval
+    USAGE_FLUSH_SIZE = int(os.getenv("USAGE_FLUSH_SIZE", "500"))
+    # records buffered per process, the oldest are dropped beyond it
+    USAGE_BUFFER_SIZE = int(os.getenv("USAGE_BUFFER_SIZE", "20000"))
+    # seconds between writes of users' last_active, 0 writes immediately
+    # (see user/activity.py)
+    LAST_ACTIVE_FLUSH_INTERVAL = int(os.getenv("LAST_ACTIVE_FLUSH_INTERVAL", "60"))
+    # seconds last_active may lag behind, fresher values aren't written
+    LAST_ACTIVE_GRANULARITY = int(os.getenv("LAST_ACTIVE_GRANULARITY", "300"))
+    # seconds the authenticated principals of sessions and api keys are
+    # cached, 0 or a cache that isn't shared reads them per request
+    # (see auth/principal.py)
+    PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
 
     ZOHO_CLIENT_ID = os.environ.get("ZOHO_CLIENT_ID")
     ZOHO_CLIENT_SECRET = os.environ.get("ZOHO_CLIENT_SECRET")
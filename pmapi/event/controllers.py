@@ -5,7 +5,7 @@ from dateutil import parser
 from flask.helpers import get_debug_flag
 from flask import current_app
 from flask_login import current_user, login_user
-from sqlalchemy import and_, bindparam, cast, case, func, join, or_, select
+from sqlalchemy import and_, cast, func, join, or_, select
 from sqlalchemy.orm import joinedload, with_expression
 from sqlalchemy_continuum import transaction_class, version_class, versioning_manager
 
@@ -13,7 +13,13 @@ import pmapi.event_location.controllers as event_locations
 import pmapi.event_tag.controllers as event_tags
 import pmapi.media_item.controllers as media_items
 from pmapi import exceptions as exc
-from pmapi.common.controllers import paginated_results
+from pmapi.common.controllers import (
+    CursorPagination,
+    CustomPagination,
+    decode_cursor,
+    encode_cursor,
+    paginated_results,
+)
 from pmapi.common.permissions import (
     current_user_role_is_at_least,
     user_role_is_at_least,
@@ -37,16 +43,15 @@ from pmapi.hcaptcha.controllers import validate_hcaptcha
 from pmapi.mail.controllers import (
     send_new_event_notification,
 )
-from pmapi.media_item.controllers import download_image_as_base64
 from pmapi.services.gmaps import resolve_location_input
-from pmapi.services.embeddings import (
-    generate_embedding,
-    mark_event_embedding_refresh,
-)
+from pmapi.services.embeddings import mark_event_embedding_refresh
+from pmapi.services.query_embeddings import get_query_embedding
 from pmapi.user.model import User
 from pmapi.utils import ROLES
 
 from .model import Event, Rrule, event_page_views_table, user_event_following_table
+from .page_views import record_page_view
+from .retrieval import hydrate_events, retrieve_event_ids
 
 DEV_ENVIRON = get_debug_flag()
 CONFIG = DevConfig if DEV_ENVIRON else ProdConfig
@@ -90,7 +95,7 @@ def get_event(id):
         user_id = None
         if current_user and current_user.is_authenticated:
             user_id = current_user.id
-        event.increment_page_views(user_id)
+        record_page_view(event.id, user_id)
         return event
     else:
         return None
@@ -124,63 +129,60 @@ def get_event_contributors(event_id, **kwargs):
 
 def search_events(created_by_user, **kwargs):
     query = db.session.query(Event)
+    filters = []
+    if created_by_user:
+        filters.append(Event.creator_id == created_by_user.id)
+
+    if "hidden" in kwargs:
+        filters.append(Event.hidden == True)
+
+    query = query.filter(*filters)
+
     if "query" in kwargs:
         query_string = kwargs.pop("query")
-        query_text = ""
-        for word in query_string.split():
-            # this is to formulate a query string like 'twisted:* frequncey:*'
-            if word == query_string.split()[-1]:
-                query_text = query_text + (str(word) + str(":*"))
-            else:
-                query_text = query_text + (str(word) + str(":* & "))
-        ts_query = func.to_tsquery("english", query_text)
-        ts_match = Event.__ts_vector__.match(query_text, postgresql_regconfig="english")
 
+        # cached, None while the embedding of a new query is generated
         query_embedding = None
         try:
-            query_embedding = generate_embedding(query_string)
+            query_embedding = get_query_embedding(query_string)
         except Exception:
             current_app.logger.exception(
                 "Failed to generate query embedding for event search"
             )
 
-        if query_embedding:
-            vector_distance = Event.search_embedding.op("<=>")(
-                bindparam("query_embedding", query_embedding, type_=Event.search_embedding.type)
-            )
-            text_rank = func.ts_rank_cd(Event.__ts_vector__, ts_query)
-            semantic_score = case(
-                [(Event.search_embedding.isnot(None), 1 - vector_distance)],
-                else_=0.0,
-            )
-            combined_score = (
-                text_rank * CONFIG.EVENT_SEARCH_TEXT_WEIGHT
-                + semantic_score * CONFIG.EVENT_SEARCH_VECTOR_WEIGHT
-            )
+        # each stage only returns its top candidates, so the cost of a
+        # search doesn't grow with the number of matching events
+        ids = retrieve_event_ids(query_string, query_embedding, filters)
 
-            query = (
-                query.filter(
-                    or_(
-                        ts_match,
-                        and_(
-                            Event.search_embedding.isnot(None),
-                            vector_distance <= CONFIG.EVENT_SEARCH_VECTOR_MAX_DISTANCE,
-                        ),
-                    )
-                )
-                .order_by(combined_score.desc(), text_rank.desc(), Event.id.desc())
-                .params(query_embedding=query_embedding)
-            )
-        else:
-            query = query.filter(ts_match)
+        if kwargs.get("sort"):
+            return paginated_results(Event, query=query.filter(Event.id.in_(ids)), **kwargs)
+        return fused_page(query, ids, **kwargs)
 
-    if created_by_user:
-        query = query.filter(Event.creator_id == created_by_user.id)
+    return paginated_results(Event, query=query, **kwargs)
 
-    if "hidden" in kwargs:
-        query = query.filter(Event.hidden == True)
 
-    return paginated_results(Event, query=query, **kwargs)
+def fused_page(query, ids, page=1, per_page=10, cursor=None, **kwargs):
+    """Paginates ranked ids, only the events of the page are loaded"""
+    if cursor is not None:
+        offset = decode_cursor(cursor, 1)[0] if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise InvalidAPIRequest("Invalid cursor")
+        next_offset = offset + per_page
+        pagination = CursorPagination(
+            hydrate_events(query, ids[offset:next_offset]),
+            per_page,
+            cursor,
+            encode_cursor([next_offset]) if next_offset < len(ids) else None,
+            len(ids),
+        )
+        pagination.total_estimated = False
+        return pagination
+    if page == 0:
+        return {"items": hydrate_events(query, ids)}
+    offset = (page - 1) * per_page
+    return CustomPagination(
+        hydrate_events(query, ids[offset: offset + per_page]), page, per_page, len(ids)
+    )
 
 
 def featured_events(**kwargs):
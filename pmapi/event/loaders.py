@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy_continuum import transaction_class, version_class
+
+from pmapi.common.loaders import set_preloaded
+from pmapi.event.model import Event, event_page_view_rollups_table
+from pmapi.event_date.model import EventDate
+from pmapi.extensions import db
+
+
+def load_page_views(events):
+    ids = {event.id for event in events}
+    rollups = event_page_view_rollups_table
+    counts = dict(
+        db.session.query(rollups.c.event_id, func.sum(rollups.c.views))
+        .filter(rollups.c.event_id.in_(ids))
+        .group_by(rollups.c.event_id)
+    )
+    for event in events:
+        set_preloaded(event, "page_views", counts.get(event.id, 0))
+
+
+def load_next_event_dates(events):
+    # same criteria as Event.next_event_date
+    now = datetime.utcnow()
+    ids = {event.id for event in events}
+    next_event_dates = {
+        event_date.event_id: event_date
+        for event_date in db.session.query(EventDate)
+        .filter(
+            EventDate.event_id.in_(ids),
+            EventDate.end >= now,
+            EventDate.cancelled != True,  # noqa: E712
+        )
+        .distinct(EventDate.event_id)
+        .order_by(EventDate.event_id, EventDate.start.asc())
+    }
+    for event in events:
+        set_preloaded(event, "next_event_date", next_event_dates.get(event.id))
+
+
+def load_last_transactions(events):
+    Transaction = transaction_class(Event)
+    EventVersion = version_class(Event)
+    ids = {event.id for event in events}
+    last_transactions = dict(
+        db.session.query(EventVersion.id, Transaction)
+        .join(EventVersion, Transaction.id == EventVersion.transaction_id)
+        .filter(EventVersion.id.in_(ids))
+        .distinct(EventVersion.id)
+        .order_by(EventVersion.id, Transaction.id.desc())
+    )
+    for event in events:
+        set_preloaded(event, "last_transaction", last_transactions.get(event.id))
@@ -9,6 +9,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import query_expression
 from sqlalchemy_utils import TranslationHybrid
 from sqlalchemy.ext.mutable import MutableDict
+from pmapi.common.loaders import MISSING, get_preloaded
 from pmapi.config import BaseConfig
 from pmapi.db_types import Vector
 from pmapi.utils import get_locale
@@ -48,6 +49,22 @@ event_page_views_table = db.Table(
     db.Column("event_id", db.Integer, db.ForeignKey("events.id")),
     db.Column("user_id", UUID, db.ForeignKey("users.id", name='fk_event_page_views_user_id')),
     db.Column("time", db.DateTime, default=datetime.utcnow),
+    Index("idx_event_page_views_event_id_time", "event_id", "time"),
+)
+
+# daily page view counts, written by pmapi.event.page_views
+event_page_view_rollups_table = db.Table(
+    "event_page_view_rollups",
+    db.Column(
+        "event_id",
+        db.Integer,
+        db.ForeignKey("events.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("day", db.Date, primary_key=True),
+    db.Column("views", db.Integer, nullable=False, default=0),
+    # distinct logged in users, anonymous views aren't counted
+    db.Column("unique_views", db.Integer, nullable=False, default=0),
 )
 
 
@@ -142,12 +159,22 @@ class Event(db.Model):
     )
     hidden = db.Column(db.Boolean, default=True)
     search_embedding = db.Column(Vector(BaseConfig.EVENT_EMBEDDING_DIMENSIONS))
+    # sha256 of the text search_embedding was generated from
+    search_embedding_hash = db.Column(db.String(64))
 
     __ts_vector__ = create_tsvector(name, description)
     # this is an index for searching events
     # this was causing tests to fail, unsure if needed
     __table_args__ = (
-        Index("idx_events_fts", __ts_vector__, postgresql_using="gin"),)
+        Index("idx_events_fts", __ts_vector__, postgresql_using="gin"),
+        # trigram candidates of the search (see event/retrieval.py)
+        Index(
+            "idx_events_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     @property
     def cover_image(self):
@@ -192,24 +219,26 @@ class Event(db.Model):
         else:
             return None
 
-    def increment_page_views(self, user_id):
-        db.engine.execute(
-            event_page_views_table.insert(),
-            user_id=user_id,
-            event_id=self.id,
-        )
-        db.session.commit()
-
     @hybrid_property
     def page_views(self):
+        # the properties below are batched by pmapi.event.loaders
+        # when serializing lists
+        page_views = get_preloaded(self, "page_views")
+        if page_views is not MISSING:
+            return page_views
         return (
-            db.session.query(event_page_views_table)
-            .filter(event_page_views_table.c.event_id == self.id)
-            .count()
+            db.session.query(
+                func.coalesce(func.sum(event_page_view_rollups_table.c.views), 0)
+            )
+            .filter(event_page_view_rollups_table.c.event_id == self.id)
+            .scalar()
         )
 
     @hybrid_property
     def last_transaction(self):
+        last_transaction = get_preloaded(self, "last_transaction")
+        if last_transaction is not MISSING:
+            return last_transaction
         Transaction = transaction_class(Event)
         EventVersion = version_class(Event)
         return (
@@ -263,6 +292,9 @@ class Event(db.Model):
 
     @hybrid_property
     def next_event_date(self):
+        next_event_date = get_preloaded(self, "next_event_date")
+        if next_event_date is not MISSING:
+            return next_event_date
         now = datetime.utcnow()
         eds = db.session.query(EventDate)
         eds = eds.filter(
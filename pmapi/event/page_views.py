@@ -0,0 +1,145 @@
+"""
+page_views.py
+- buffers event page views in the worker process.
+  Viewing an event only appends to the buffer, a flusher thread writes
+  the views in one transaction every PAGE_VIEWS_FLUSH_INTERVAL seconds:
+  the raw rows go to event_page_views_table and the aggregated
+  increments to the daily event_page_view_rollups, which
+  Event.page_views reads. Views that fail to be written go back to the
+  buffer for the next flush, the oldest are dropped beyond
+  PAGE_VIEWS_BUFFER_SIZE.
+"""
+
+import threading
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from pmapi.common.flusher import Flusher
+from pmapi.config import BaseConfig
+from pmapi.extensions import db
+
+from .model import Event, event_page_view_rollups_table, event_page_views_table
+
+
+class PageViewBuffer:
+    """The page views of a process, the oldest is dropped when it's full"""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._views = deque(maxlen=size)
+        self._dropped = 0
+
+    def __len__(self):
+        return len(self._views)
+
+    def add(self, event_id, user_id):
+        with self._lock:
+            if len(self._views) == self._views.maxlen:
+                self._dropped += 1
+            self._views.append(
+                {"event_id": event_id, "user_id": user_id, "time": datetime.utcnow()}
+            )
+
+    def drain(self):
+        """Returns the buffered views and the number dropped since the last drain"""
+        with self._lock:
+            views = list(self._views)
+            self._views.clear()
+            dropped, self._dropped = self._dropped, 0
+        return views, dropped
+
+    def requeue(self, views):
+        """Puts back views that weren't written, ahead of the newer ones.
+        The oldest are dropped if they no longer fit."""
+        with self._lock:
+            views = list(views) + list(self._views)
+            overflow = max(len(views) - self._views.maxlen, 0)
+            self._dropped += overflow
+            self._views.clear()
+            self._views.extend(views[overflow:])
+
+
+buffer = PageViewBuffer(BaseConfig.PAGE_VIEWS_BUFFER_SIZE)
+
+
+def record_page_view(event_id, user_id=None):
+    buffer.add(event_id, user_id)
+    if current_app.config["PAGE_VIEWS_FLUSH_INTERVAL"] == 0:
+        flush_page_views()
+    else:
+        flusher.start(current_app._get_current_object())
+
+
+def flush_page_views():
+    """Writes the buffered views, returns the number of views written."""
+    views, dropped = buffer.drain()
+    if dropped:
+        current_app.logger.warning(
+            "Dropped %s page views, the buffer was full", dropped
+        )
+    if not views:
+        return 0
+    try:
+        return write_page_views(views)
+    except Exception:
+        buffer.requeue(views)
+        raise
+
+
+flusher = Flusher("page views", "PAGE_VIEWS_FLUSH_INTERVAL", flush_page_views)
+
+
+def write_page_views(views):
+    rollups = event_page_view_rollups_table
+    with db.engine.begin() as conn:
+        # events deleted since they were viewed
+        event_ids = {view["event_id"] for view in views}
+        existing = set(
+            conn.execute(select(Event.id).where(Event.id.in_(event_ids))).scalars()
+        )
+        views = [view for view in views if view["event_id"] in existing]
+        if not views:
+            return 0
+
+        conn.execute(event_page_views_table.insert(), views)
+
+        counts = Counter((view["event_id"], view["time"].date()) for view in views)
+        upsert = insert(rollups).values(
+            [
+                {"event_id": event_id, "day": day, "views": count, "unique_views": 0}
+                for (event_id, day), count in counts.items()
+            ]
+        )
+        conn.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[rollups.c.event_id, rollups.c.day],
+                set_={"views": rollups.c.views + upsert.excluded.views},
+            )
+        )
+
+        # recount the distinct users of the days that got new views
+        unique_views = (
+            select(func.count(func.distinct(event_page_views_table.c.user_id)))
+            .where(
+                event_page_views_table.c.event_id == rollups.c.event_id,
+                event_page_views_table.c.time >= rollups.c.day,
+                event_page_views_table.c.time < rollups.c.day + timedelta(days=1),
+            )
+            .scalar_subquery()
+        )
+        conn.execute(
+            rollups.update()
+            .where(tuple_(rollups.c.event_id, rollups.c.day).in_(list(counts)))
+            .values(unique_views=unique_views)
+        )
+
+    return len(views)
+
+
+def flush_on_exit(app):
+    with app.app_context():
+        flush_page_views()
@@ -8,7 +8,8 @@ from marshmallow import fields
 import pmapi.activity.controllers as activities
 import pmapi.event_review.controllers as event_reviews
 from pmapi.activity.schemas import ActivityListSchema
-from pmapi.common.controllers import paginated_view_args
+from pmapi.common.controllers import cursor_pagination_args, paginated_view_args
+from pmapi.common.response_cache import cached_response
 from pmapi.event_review.schemas import EventReviewListSchema, EventReviewSchema
 from pmapi.exceptions import InvalidUsage
 from pmapi.hcaptcha.controllers import validate_hcaptcha
@@ -49,6 +50,7 @@ class EventsResource(MethodResource):
             "created_by": fields.String(required=False),
             "hidden": fields.Boolean(required=False),
             **paginated_view_args(sort_options=["created_at", "name", "id"]),
+            **cursor_pagination_args,
         },
         location="query",
     )
@@ -129,7 +131,10 @@ class FeaturedEventsResource(MethodResource):
 
 
 events_blueprint.add_url_rule(
-    "/featured/", view_func=FeaturedEventsResource.as_view("FeaturedEventsResource")
+    "/featured/",
+    view_func=cached_response("events", "event_dates", "event_locations", "media_items")(
+        FeaturedEventsResource.as_view("FeaturedEventsResource")
+    ),
 )
 
 
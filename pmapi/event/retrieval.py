@@ -0,0 +1,159 @@
+"""
+retrieval.py
+- two stage event search. Candidate generators each return their top K
+  event ids (full text from the GIN index, vectors from the ANN index,
+  trigram name matches), the rankings are fused with reciprocal rank
+  fusion and only the requested page is loaded.
+  The time of every stage is recorded in the Server-Timing header.
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import current_app, g
+from sqlalchemy import bindparam, func, select
+
+from pmapi.extensions import db
+from pmapi.services.vector_index import get_numpy_index, set_search_params
+
+from .model import Event
+
+
+def prefix_tsquery(query_string):
+    # this is to formulate a query string like 'twisted:* frequncey:*'
+    return " & ".join("{}:*".format(word) for word in query_string.split())
+
+
+@contextmanager
+def timed(stage):
+    """Records the duration of a stage for the Server-Timing header"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = (time.perf_counter() - start) * 1000
+        current_app.logger.debug("event search %s: %.1fms", stage, duration)
+        if not hasattr(g, "server_timing"):
+            g.server_timing = []
+        g.server_timing.append((stage, duration))
+
+
+def fts_candidates(query_string, filters, k):
+    query_text = prefix_tsquery(query_string)
+    ts_query = func.to_tsquery("english", query_text)
+    text_rank = func.ts_rank_cd(Event.__ts_vector__, ts_query)
+    return db.session.execute(
+        select(Event.id)
+        .where(
+            Event.__ts_vector__.match(query_text, postgresql_regconfig="english"),
+            *filters
+        )
+        .order_by(text_rank.desc(), Event.id.desc())
+        .limit(k)
+    ).scalars().all()
+
+
+def vector_candidates(query_embedding, filters, k):
+    max_distance = current_app.config["EVENT_SEARCH_VECTOR_MAX_DISTANCE"]
+
+    numpy_index = get_numpy_index()
+    if numpy_index is not None:
+        # no pgvector, rank in process and keep the ids that pass the filters
+        nearest = [
+            event_id
+            for event_id, distance in numpy_index.search(query_embedding, k)
+            if distance <= max_distance
+        ]
+        if not nearest or not filters:
+            return nearest
+        allowed = set(
+            db.session.execute(
+                select(Event.id).where(Event.id.in_(nearest), *filters)
+            ).scalars()
+        )
+        return [event_id for event_id in nearest if event_id in allowed]
+
+    set_search_params()
+    distance = Event.search_embedding.op("<=>")(
+        bindparam("query_embedding", query_embedding, type_=Event.search_embedding.type)
+    )
+    # ORDER BY distance LIMIT k is what uses the index
+    rows = db.session.execute(
+        select(Event.id, distance.label("distance"))
+        .where(Event.search_embedding.isnot(None), *filters)
+        .order_by(distance)
+        .limit(k)
+    ).all()
+    return [row.id for row in rows if row.distance <= max_distance]
+
+
+def trigram_candidates(query_string, filters, k):
+    """Names similar to the query, catches typos (requires pg_trgm)"""
+    return db.session.execute(
+        select(Event.id)
+        .where(Event.name.op("%")(query_string), *filters)
+        .order_by(func.similarity(Event.name, query_string).desc(), Event.id.desc())
+        .limit(k)
+    ).scalars().all()
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuses rankings of ids into one.
+    :param list rankings: [(weight, [id, ...])], best first
+    :param int k: dampens the weight of the top ranks
+    """
+    scores = defaultdict(float)
+    for weight, ids in rankings:
+        for rank, event_id in enumerate(ids, start=1):
+            scores[event_id] += weight / (k + rank)
+    return sorted(scores, key=lambda event_id: (-scores[event_id], -event_id))
+
+
+def retrieve_event_ids(query_string, query_embedding=None, filters=()):
+    """Returns the ids of the events matching a search, best first.
+    The result has at most the sum of the candidates of each stage."""
+    config = current_app.config
+    rankings = []
+
+    with timed("fts"):
+        rankings.append(
+            (
+                config["EVENT_SEARCH_TEXT_WEIGHT"],
+                fts_candidates(query_string, filters, config["EVENT_SEARCH_FTS_CANDIDATES"]),
+            )
+        )
+
+    if query_embedding:
+        with timed("vector"):
+            rankings.append(
+                (
+                    config["EVENT_SEARCH_VECTOR_WEIGHT"],
+                    vector_candidates(
+                        query_embedding, filters, config["EVENT_SEARCH_VECTOR_CANDIDATES"]
+                    ),
+                )
+            )
+
+    if config["EVENT_SEARCH_TRIGRAM_CANDIDATES"]:
+        with timed("trigram"):
+            rankings.append(
+                (
+                    config["EVENT_SEARCH_TRIGRAM_WEIGHT"],
+                    trigram_candidates(
+                        query_string, filters, config["EVENT_SEARCH_TRIGRAM_CANDIDATES"]
+                    ),
+                )
+            )
+
+    with timed("fusion"):
+        return reciprocal_rank_fusion(rankings, k=config["EVENT_SEARCH_RRF_K"])
+
+
+def hydrate_events(query, ids):
+    """Loads the events of `ids` with `query`, in the order of `ids`"""
+    if not ids:
+        return []
+    with timed("hydrate"):
+        events = {event.id: event for event in query.filter(Event.id.in_(ids))}
+    return [events[event_id] for event_id in ids if event_id in events]
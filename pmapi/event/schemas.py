@@ -2,15 +2,32 @@ from marshmallow import Schema, post_dump, fields, pre_dump
 from pmapi.common.schemas import PaginatedSchema
 from typemallow2 import ts_interface
 from pmapi.common.schemas import TranslationHybridField
+from pmapi.common.loaders import preload
+from pmapi.event.loaders import (
+    load_last_transactions,
+    load_next_event_dates,
+    load_page_views,
+)
 
 # from pmapi.media_item.schemas import MediaItemSchema
 
+# fields that would otherwise run a query per event
+EVENT_LOADERS = {
+    "next_date": load_next_event_dates,
+    "page_views": load_page_views,
+    "last_transaction": load_last_transactions,
+}
+
 
 @ts_interface()
 class FeaturedEventSchema(Schema):
     id = fields.Integer()
     next_date = fields.Nested("MiniEventDateSchema", attribute="next_event_date")
 
+    @pre_dump(pass_many=True)
+    def preload(self, data, many, **kwargs):
+        return preload(self, data, EVENT_LOADERS)
+
 
 @ts_interface()
 class MiniEventSchema(Schema):
@@ -33,6 +50,10 @@ class MiniEventSchema(Schema):
     is_favorited = fields.Boolean()
     page_views = fields.Int()
 
+    @pre_dump(pass_many=True)
+    def preload(self, data, many, **kwargs):
+        return preload(self, data, EVENT_LOADERS)
+
     @post_dump
     def remove_description_if_description_t_exists(self, data, **kwargs):
         if data.get("description_t"):
@@ -71,6 +92,10 @@ class EventSchema(Schema):
     is_favorited = fields.Boolean()
     page_views = fields.Int()
 
+    @pre_dump(pass_many=True)
+    def preload(self, data, many, **kwargs):
+        return preload(self, data, EVENT_LOADERS)
+
 
 @ts_interface()
 class EventVersionSchema(Schema):
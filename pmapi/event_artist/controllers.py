@@ -3,12 +3,11 @@ import pytz
 from datetime import datetime
 from dateutil import parser as date_parser
 from pmapi.media_item.controllers import add_media_to_artist
-from timezonefinder import TimezoneFinder
+from pmapi.services.timezones import location_timezone
 from sqlalchemy import cast, or_, and_, desc
 from geoalchemy2 import func, Geography
 from pmapi import exceptions as exc, user
 import hashlib
-import base64
 import time
 import requests
 from requests.exceptions import RequestException
@@ -130,10 +129,15 @@ def get_artists(**kwargs):
         # ** all is well **
         kwargs.pop("sort")
 
-        if kwargs.pop("desc") is True:
+        descending = kwargs.pop("desc") is True
+        if descending:
             query = query.order_by(desc(Artist.event_count))
         else:
             query = query.order_by(Artist.event_count)
+        kwargs["cursor_keys"] = [
+            (Artist.event_count.scalar_subquery(), descending),
+            (Artist.id, descending),
+        ]
 
     return paginated_results(Artist, query=query, **kwargs)
 
@@ -229,10 +233,7 @@ def update_artists_of_date(event_date, artists):
                 if event_date.tz:
                     tz_obj = pytz.timezone(event_date.tz)
                 else:
-                    tf = TimezoneFinder()
-                    tz = tf.timezone_at(
-                        lng=event_date.location.lng, lat=event_date.location.lat
-                    )
+                    tz = location_timezone(event_date.location)
                     tz_obj = pytz.timezone(tz)
 
                 # parse date string as naive datetime
@@ -325,10 +326,7 @@ def add_artist_to_date(
         if event_date.tz:
             tz_obj = pytz.timezone(event_date.tz)
         else:
-            tf = TimezoneFinder()
-            tz = tf.timezone_at(
-                lng=event_date.location.lng, lat=event_date.location.lat
-            )
+            tz = location_timezone(event_date.location)
             tz_obj = pytz.timezone(tz)
 
         # parse date string as naive datetime
@@ -358,33 +356,9 @@ def add_artist_to_date(
 
 
 def save_artist_image_from_wikimedia_url(url, artist):
-    try:
-        headers = {
-            "Accept": "image/*",
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:95.0) Gecko/20100101 Firefox/95.0",
-        }
-        r = requests.get(url, headers=headers, timeout=TIMEOUT)
-    except RequestException as e:
-        logging.error(
-            "event_artist.save_artist_image_from_wikimedia_url.request_error",
-        )
-
-    try:
-        uri = (
-            "data:"
-            + r.headers["Content-Type"]
-            + ";"
-            + "base64,"
-            + base64.b64encode(r.content).decode("utf-8")
-        )
-    except Exception:
-        logging.error(
-            "event_artist.save_artist_image_from_wikimedia_url.base_64_encode",
-        )
-        print("error encoding artist image as uri")
     items = [
         {
-            "base64File": uri,
+            "url": url,
             "caption": "Artist image from wikimedia under the Creative Commons Attribution 2.0 Generic license. ",
         }
     ]
@@ -595,34 +569,9 @@ def refresh_spotify_data_for_artist(artist, spotify_id=None):
             # sort images by biggest first
             images_sorted = sorted(images, key=lambda d: d.get("height"), reverse=True)
             image_url = images_sorted[0].get("url")
-            try:
-                headers = {
-                    "Accept": "image/*",
-                    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:95.0) Gecko/20100101 Firefox/95.0",
-                }
-                r = requests.get(image_url, headers=headers, timeout=TIMEOUT)
-            except RequestException as e:
-                logging.error(
-                    "event_artist.refresh_spotify_data_for_artist.image_request_error",
-                )
-                print("error getting artist image from spotify")
-            # add to db
-            try:
-                uri = (
-                    "data:"
-                    + r.headers["Content-Type"]
-                    + ";"
-                    + "base64,"
-                    + base64.b64encode(r.content).decode("utf-8")
-                )
-            except Exception:
-                logging.error(
-                    "event_artist.refresh_spotify_data_for_artist.base_64_encode",
-                )
-                print("error encoding spotify artist image as uri")
             items = [
                 {
-                    "base64File": uri,
+                    "url": image_url,
                     "caption": "Artist image from Spotify",
                 }
             ]
@@ -681,35 +630,9 @@ def get_artist_image_from_deezer(artist):
         )
         response = response.json()
         img_url = response.get("picture_xl")
-        try:
-            headers = {
-                "Accept": "image/*",
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:95.0) Gecko/20100101 Firefox/95.0",
-            }
-            r = requests.get(img_url, headers=headers, timeout=TIMEOUT)
-
-        except RequestException as e:
-            logging.error(
-                "event_artist.get_artist_image_from_deezer.artist_request_error",
-            )
-            print("error getting artist image from deezer")
-        # add to db
-        try:
-            uri = (
-                "data:"
-                + r.headers["Content-Type"]
-                + ";"
-                + "base64,"
-                + base64.b64encode(r.content).decode("utf-8")
-            )
-        except Exception:
-            logging.error(
-                "event_artist.get_artist_image_from_deezer.base_64_encode",
-            )
-            print("error encoding deezer artist image as uri")
         items = [
             {
-                "base64File": uri,
+                "url": img_url,
                 "caption": "Artist image from Deezer",
             }
         ]
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import func
+
+from pmapi.common.loaders import set_preloaded
+from pmapi.event_artist.model import EventDateArtist
+from pmapi.event_date.model import EventDate
+from pmapi.extensions import db
+
+
+def load_event_counts(artists):
+    # same criteria as Artist.event_count
+    ids = {artist.id for artist in artists}
+    counts = dict(
+        db.session.query(EventDateArtist.artist_id, func.count(EventDateArtist.id))
+        .join(EventDate, EventDate.id == EventDateArtist.event_date_id)
+        .filter(
+            EventDateArtist.artist_id.in_(ids),
+            EventDate.start > datetime.utcnow(),
+        )
+        .group_by(EventDateArtist.artist_id)
+    )
+    for artist in artists:
+        set_preloaded(artist, "event_count", counts.get(artist.id, 0))
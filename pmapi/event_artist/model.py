@@ -6,6 +6,7 @@ from sqlalchemy import and_, join, event, select, func
 
 from sqlalchemy_utils import TranslationHybrid
 from sqlalchemy.ext.mutable import MutableDict
+from pmapi.common.loaders import MISSING, get_preloaded
 from pmapi.utils import get_locale
 from pmapi.extensions import db
 from pmapi.event_date.model import EventDate
@@ -82,6 +83,10 @@ class Artist(db.Model):
 
     @hybrid_property
     def event_count(self):
+        # batched by pmapi.event_artist.loaders when serializing lists
+        event_count = get_preloaded(self, "event_count")
+        if event_count is not MISSING:
+            return event_count
         query = (
             db.session.query(EventDateArtist)
             .join(EventDate)
@@ -10,7 +10,7 @@ from pmapi.hcaptcha.controllers import validate_hcaptcha
 from pmapi.suggestions.controllers import add_suggested_edit
 from .schemas import ArtistSchema, ArtistListSchema
 import pmapi.event_artist.permissions as artist_permissions
-from pmapi.common.controllers import paginated_view_args
+from pmapi.common.controllers import cursor_pagination_args, paginated_view_args
 from flask_login import login_required
 from flask_login import current_user
 from pmapi.user.controllers import action_as_system_user
@@ -174,6 +174,7 @@ class ArtistsResource(MethodResource):
                 sort_options=["event_count", "created_at",
                               "name", "popularity", "id"]
             ),
+            **cursor_pagination_args,
         },
         location="query"
     )
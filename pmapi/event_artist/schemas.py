@@ -1,6 +1,9 @@
 from marshmallow import fields
+from marshmallow import pre_dump
 from marshmallow import Schema
+from pmapi.common.loaders import preload
 from pmapi.common.schemas import PaginatedSchema
+from pmapi.event_artist.loaders import load_event_counts
 from typemallow2 import ts_interface
 
 
@@ -25,6 +28,10 @@ class ArtistSchema(Schema):
     event_count = fields.Int()
     media_items = fields.Nested("MediaItemSchema", many=True)
 
+    @pre_dump(pass_many=True)
+    def preload(self, data, many, **kwargs):
+        return preload(self, data, {"event_count": load_event_counts})
+
 
 
 class ArtistListSchema(PaginatedSchema):
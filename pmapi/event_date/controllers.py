@@ -7,7 +7,6 @@ from pmapi.event_artist.controllers import (
 )
 from pmapi.event_location.schemas import ExtendedRegionSchema
 from pmapi.event_review.model import EventReview
-from timezonefinder import TimezoneFinder
 from datetime import datetime
 from dateutil import parser as date_parser
 from flask_login import current_user
@@ -24,10 +23,11 @@ from geoalchemy2 import func, Geography
 from sqlalchemy import cast, or_, and_, asc, distinct
 from sqlalchemy.orm import with_expression, aliased
 
-from collections import Counter
-from pmapi.common.controllers import paginated_results
+from pmapi.common.controllers import paginated_results, seek_key
+from pmapi.common.facets import facet_cache_key, get_event_date_facets
 import pmapi.event_location.controllers as event_locations
 import pmapi.user.controllers as users
+from pmapi.services.timezones import location_timezone
 from pmapi.extensions import db, activity_plugin
 from pmapi.event_location.model import EventLocation, Region
 from pmapi.event_tag.model import EventTag
@@ -84,8 +84,7 @@ def replace_event_date_tickets(event_date, tickets):
 
 def get_timezone_for_event_location(event_location):
     try:
-        tf = TimezoneFinder()
-        tz = tf.timezone_at(lng=event_location.lng, lat=event_location.lat)
+        tz = location_timezone(event_location)
         tz_obj = pytz.timezone(tz)
         return tz, tz_obj
     except UnknownTimeZoneError:
@@ -136,6 +135,74 @@ def apply_event_date_datetime_and_location(event_date, date_time=None, event_loc
         event_date.date_confirmed = True
 
 
+# radii (in meters) that a nearby search can snap to
+NEARBY_RADII = [
+    10000,
+    20000,
+    50000,
+    100000,
+    200000,
+    500000,
+    1000000,
+    2000000,
+    5000000,
+    10000000,
+    20000000,
+]
+
+# number of distinct events required within the chosen radius
+NEARBY_MIN_EVENTS = 4
+
+
+def snap_radius(distance):
+    """Returns the smallest radius in NEARBY_RADII that contains distance,
+    or 0 if the distance is beyond the largest radius."""
+    for r in NEARBY_RADII:
+        if distance <= r:
+            return r
+    return 0
+
+
+def get_nearby_radius(query, entity, lat, lng):
+    """Determines the best radius for a nearby search in a single query.
+    Finds the distance to the NEARBY_MIN_EVENTS-th nearest distinct event
+    using KNN (<->) ordering on the indexed geo::geography of event_locations
+    and snaps it to NEARBY_RADII.
+    Returns 0 if there aren't enough events to fill a radius.
+    :param obj query: the filtered event date query, joined with EventLocation
+    :param obj entity: the EventDate alias used by the query
+    """
+    point = cast("SRID=4326;POINT(%f %f)" % (lng, lat), Geography(srid=4326))
+
+    # only consider the first occurance of each event
+    row_number_column = (
+        func.row_number()
+        .over(partition_by=entity.event_id, order_by=entity.start.asc())
+        .label("row_number")
+    )
+    subquery = query.with_entities(
+        entity.location_id.label("nearby_location_id"), row_number_column
+    ).subquery()
+    # geo::geography, the expression of idx_event_locations_geography,
+    # a cast with a typmod wouldn't match the index
+    geo = cast(EventLocation.geo, Geography(geometry_type=None))
+
+    distance = (
+        db.session.query(func.ST_Distance(geo, point))
+        .select_from(EventLocation)
+        .join(subquery, subquery.c.nearby_location_id == EventLocation.id)
+        .filter(subquery.c.row_number == 1)
+        .order_by(geo.op("<->")(point))
+        .offset(NEARBY_MIN_EVENTS - 1)
+        .limit(1)
+        .scalar()
+    )
+
+    if distance is None:
+        return 0
+    return snap_radius(distance)
+
+
 def get_event_date_or_404(id):
     event_date = get_event_date(id)
     if not event_date:
@@ -270,8 +337,7 @@ def add_event_date(
     if tz:
         tz_obj = pytz.timezone(tz)
     else:
-        tf = TimezoneFinder()
-        tz = tf.timezone_at(lng=event_location.lng, lat=event_location.lat)
+        tz = location_timezone(event_location)
         tz_obj = pytz.timezone(tz)
 
     if not start_naive:
@@ -475,8 +541,7 @@ def generate_future_event_dates(
 
         # Find timezone info
         try:
-            tf = TimezoneFinder()
-            tz = tf.timezone_at(lng=event_location.lng, lat=event_location.lat)
+            tz = location_timezone(event_location)
 
         except UnknownTimeZoneError:
             print("TIMEZONE ERROR")
@@ -978,6 +1043,14 @@ def query_event_dates(**kwargs):
     empty_lineup = kwargs.get("empty_lineup", None)
     date_unconfirmed = kwargs.get("date_unconfirmed", None)
 
+    # everything that changes the results, used to cache facets
+    facet_filters = {
+        key: value
+        for key, value in kwargs.items()
+        if key not in ("page", "per_page", "cursor")
+    }
+    descending = kwargs.get("desc", False)
+
     sort_option = kwargs.pop("sort", None)
     if sort_option is None:
         sort_option = kwargs.pop("sort_option", None)  # deprecate this
@@ -1059,63 +1132,7 @@ def query_event_dates(**kwargs):
             # used on the home page of partyman
             # to return a list of events in proximity of point/users location
             # and return the radius in response
-            radii = [
-                10000,
-                20000,
-                50000,
-                100000,
-                200000,
-                500000,
-                1000000,
-                2000000,
-                5000000,
-                10000000,
-                20000000,
-            ]
-
-            # Add row_number for distinct filtering
-            row_number_column = (
-                func.row_number()
-                .over(
-                    partition_by=EventDateAlias.event_id,
-                    order_by=EventDateAlias.start.asc(),
-                )
-                .label("row_number")
-            )
-
-            # Create subquery including all columns from EventDateAlias
-            subquery = query.add_columns(row_number_column).subquery()
-
-            # Create new query from subquery using alias
-            CountEventDateAlias = aliased(EventDate, subquery)
-            count_query = (
-                db.session.query(CountEventDateAlias)
-                .join(
-                    EventLocation, CountEventDateAlias.location_id == EventLocation.id
-                )
-                .filter(subquery.c.row_number == 1)
-            )
-
-            for r in radii:
-                count = (
-                    count_query.filter(
-                        func.ST_DWithin(
-                            cast(EventLocation.geo, Geography(srid=4326)),
-                            cast(
-                                "SRID=4326;POINT(%f %f)" % (lng, lat),
-                                Geography(srid=4326),
-                            ),
-                            r,
-                        )
-                    )
-                    .from_self()
-                    .count()
-                )
-
-                # threshold of events required before trying the next radius
-                if count >= 4:
-                    radius = r
-                    break
+            radius = get_nearby_radius(query, EventDateAlias, lat, lng)
 
         # Apply radius filter
         if radius:
@@ -1248,16 +1265,19 @@ def query_event_dates(**kwargs):
             )
 
     # Sorting logic based on distance or start date
-    if sort_option == "distance" and location_filters:
-        query = query.order_by(
-            func.coalesce(EventDateAlias.distance, 0).asc(), EventDateAlias.start.asc()
-        )
+    if sort_option == "distance" and distance_expression is not None:
+        # EventDateAlias.distance only holds the loaded value,
+        # order by the expression itself
+        distance = func.coalesce(distance_expression, 0)
+        query = query.order_by(distance.asc(), EventDateAlias.start.asc())
+        cursor_keys = [(distance, False), (EventDateAlias.start, False)]
     elif sort_option:
         if sort_option == "date":
             sort_option = "start"  # deprecate this
 
         desc = kwargs.pop("desc", False)
         sort_field = getattr(EventDateAlias, sort_option)
+        cursor_keys = [(seek_key(sort_field), bool(descending))]
         if sort_field and desc:
             from sqlalchemy import desc
 
@@ -1266,52 +1286,34 @@ def query_event_dates(**kwargs):
     else:
         desc = kwargs.pop("desc", False)
         sort_field = getattr(EventDateAlias, "start")
+        cursor_keys = [(seek_key(sort_field), bool(descending))]
         if desc:
             from sqlalchemy import desc
 
             sort_field = desc(sort_field)
         query = query.order_by(sort_field)
+    # ties are broken by id to seek from a cursor
+    cursor_keys.append((EventDateAlias.id, cursor_keys[-1][1]))
 
     # Paginate results
-    results = paginated_results(EventDate, query, **kwargs)
+    results = paginated_results(EventDate, query, cursor_keys=cursor_keys, **kwargs)
 
     results.radius = radius
 
     # Enrich first page with top artists/tags/regions
-    if kwargs.get("page", 1) == 1:
-        enrich_results_with_top_entities(results, query)
+    if not kwargs.get("cursor") and kwargs.get("page", 1) == 1:
+        facets = get_event_date_facets(
+            query,
+            EventDateAlias,
+            cache_key=facet_cache_key("dates", facet_filters),
+        )
+        results.top_artists = facets.artists
+        results.top_tags = facets.tags
+        results.top_regions = facets.regions
 
     return results
 
 
-def enrich_results_with_top_entities(results, query):
-    artists, tags, regions = [], [], []
-
-    for ed in query.slice(0, 100).all():
-        for artist in ed.artists:
-            artists.append(artist)
-        for tag in ed.event.event_tags:
-            tags.append(tag)
-        region = ed.location.region
-        if hasattr(region, "id"):
-            region.lat = ed.location.lat
-            region.lng = ed.location.lng
-            regions.append(region)
-
-    results.top_artists = get_top_entities(artists, "artist_id", 10)
-    results.top_tags = get_top_entities(tags, "tag_id", 20)
-    results.top_regions = get_top_entities(regions, "id", 20)
-
-
-def get_top_entities(entities, id_attr, limit):
-    valid_entities = [e for e in entities if e is not None and hasattr(e, id_attr)]
-    counter = Counter(getattr(e, id_attr) for e in valid_entities)
-    unique_entities = list({getattr(e, id_attr): e for e in valid_entities}.values())
-    return sorted(
-        unique_entities, key=lambda e: counter[getattr(e, id_attr)], reverse=True
-    )[:limit]
-
-
 """
 def query_event_dates(**kwargs):
 
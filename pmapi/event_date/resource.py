@@ -16,7 +16,8 @@ from pmapi.event.schemas import EventSchema
 
 from . import permissions as event_date_permissions
 import pmapi.event_date.controllers as event_dates
-from pmapi.common.controllers import paginated_view_args
+from pmapi.common.controllers import cursor_pagination_args, paginated_view_args
+from pmapi.common.response_cache import cached_response
 from pmapi.extensions import db
 
 per_page = 20
@@ -62,6 +63,7 @@ class DatesResource(MethodResource):
             "empty_lineup": fields.Boolean(),
             "date_unconfirmed": fields.Boolean(),
             **paginated_view_args(sort_options=["created_at", "distance", "start"]),
+            **cursor_pagination_args,
         },
         location="query"
     )
@@ -77,7 +79,16 @@ class DatesResource(MethodResource):
 
 
 event_dates_blueprint.add_url_rule(
-    "/", view_func=DatesResource.as_view("DatesResource")
+    "/",
+    view_func=cached_response(
+        "events",
+        "event_dates",
+        "event_locations",
+        "event_tags",
+        "event_date_artists",
+        "artists",
+        "media_items",
+    )(DatesResource.as_view("DatesResource")),
 )
 
 
@@ -1,8 +1,23 @@
+import itertools
+from collections import defaultdict
+
+from flask import current_app
+
+from pmapi.auth import principal
+from pmapi.auth.principal import PRINCIPAL_COLUMNS
+from pmapi.common.response_cache import invalidate_tags
 from pmapi.event.model import Event
 from pmapi.event_artist.model import Artist
 from pmapi.event_date.model import EventDate
+from pmapi.event_location import clustering, gazetteer
+from pmapi.media_item.model import MediaItem
+from pmapi.media_item.renditions import PROCESSING, schedule_renditions
+from pmapi.media_item.transcoding import schedule_transcoding
+from pmapi.search.controllers import search_term_keys, sync_search_terms
+from pmapi.sitemap.controllers import schedule_sitemap_update, sitemap_shard_keys
+from pmapi.user.model import User
 from sqlalchemy.orm import Session 
-from sqlalchemy import event
+from sqlalchemy import event, inspect
 from flask.helpers import get_debug_flag
 DEV_ENVIRON = get_debug_flag()
 
@@ -29,6 +44,25 @@ def track_objects(session, flush_context, instances):
     session._pending_objects = {obj for obj in session._pending_objects if not should_exclude(obj)}
 
 
+# Track the tables touched by a transaction so the cached responses
+# that read from them can be invalidated once it's committed
+@event.listens_for(Session, "before_flush")
+def track_cache_tags(session, flush_context, instances):
+    if not hasattr(session, '_cache_tags'):
+        session._cache_tags = set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        tablename = getattr(obj, '__tablename__', None)
+        if tablename is not None:
+            session._cache_tags.add(tablename)
+
+
+# Add new locations to their map clusters, and take moved and deleted ones
+# out of theirs, in the transaction of the change
+@event.listens_for(Session, "before_flush")
+def update_location_clusters(session, flush_context, instances):
+    clustering.update_location_clusters(session)
+
+
 def should_exclude(obj):
     # Exclude objects where `obj.after_commit` is set to False
     if (hasattr(obj, 'after_commit') and obj.after_commit == True):
@@ -37,6 +71,161 @@ def should_exclude(obj):
         return False
     return True
 
+@event.listens_for(Session, "after_commit")
+def invalidate_cached_responses(session):
+    if getattr(session, '_cache_tags', None):
+        invalidate_tags(session._cache_tags)
+        session._cache_tags.clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def clear_cache_tags(session):
+    if hasattr(session, '_cache_tags'):
+        session._cache_tags.clear()
+
+
+# Track the tags, artists and events changed by a transaction so their
+# /search suggestions can be rewritten once it's committed
+@event.listens_for(Session, "after_flush")
+def track_search_terms(session, flush_context):
+    if not hasattr(session, '_search_terms'):
+        session._search_terms = defaultdict(set)
+    changed = itertools.chain(session.new, session.dirty, session.deleted)
+    for kind, keys in search_term_keys(changed).items():
+        session._search_terms[kind].update(keys)
+
+
+@event.listens_for(Session, "after_commit")
+def update_search_terms(session):
+    if getattr(session, '_search_terms', None):
+        keys = dict(session._search_terms)
+        session._search_terms.clear()
+        try:
+            sync_search_terms(keys)
+        except Exception:
+            current_app.logger.exception("Updating search terms failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def clear_search_terms(session):
+    if hasattr(session, '_search_terms'):
+        session._search_terms.clear()
+
+
+# Render the images and transcode the videos uploaded in a transaction
+# once it's committed, so the celery worker can find the media items
+@event.listens_for(Session, "after_flush")
+def track_media_renditions(session, flush_context):
+    if not hasattr(session, '_media_renditions'):
+        session._media_renditions = set()
+    session._media_renditions.update(
+        (obj.id, obj.type)
+        for obj in session.new
+        if isinstance(obj, MediaItem) and obj.status == PROCESSING
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def render_media_items(session):
+    if getattr(session, '_media_renditions', None):
+        media_items = list(session._media_renditions)
+        session._media_renditions.clear()
+        try:
+            schedule_renditions([id for id, type in media_items if type == "image"])
+            schedule_transcoding([id for id, type in media_items if type == "video"])
+        except Exception:
+            current_app.logger.exception("Scheduling media renditions failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def clear_media_renditions(session):
+    if hasattr(session, '_media_renditions'):
+        session._media_renditions.clear()
+
+
+# Cache the gazetteer ids seen by a transaction once it's committed,
+# the rows it inserted don't exist if it's rolled back
+@event.listens_for(Session, "after_commit")
+def cache_gazetteer_ids(session):
+    if getattr(session, '_gazetteer', None):
+        ids = session._gazetteer
+        session._gazetteer = {}
+        try:
+            gazetteer.cache_ids(ids)
+        except Exception:
+            current_app.logger.exception("Caching gazetteer ids failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def clear_gazetteer_ids(session):
+    if hasattr(session, '_gazetteer'):
+        session._gazetteer.clear()
+
+
+# Rewrite the sitemap shards listing the events and artists changed
+# by a transaction once it's committed
+@event.listens_for(Session, "after_flush")
+def track_sitemap_shards(session, flush_context):
+    if not hasattr(session, '_sitemap_shards'):
+        session._sitemap_shards = set()
+    changed = itertools.chain(session.new, session.dirty, session.deleted)
+    session._sitemap_shards.update(sitemap_shard_keys(changed))
+
+
+@event.listens_for(Session, "after_commit")
+def update_sitemap_shards(session):
+    if getattr(session, '_sitemap_shards', None):
+        shards = list(session._sitemap_shards)
+        session._sitemap_shards.clear()
+        try:
+            schedule_sitemap_update(shards)
+        except Exception:
+            current_app.logger.exception("Scheduling sitemap update failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def clear_sitemap_shards(session):
+    if hasattr(session, '_sitemap_shards'):
+        session._sitemap_shards.clear()
+
+
+# Invalidate the cached principals of the users whose role, status,
+# locale, last_active or api key a transaction changed once it's committed
+@event.listens_for(Session, "after_flush")
+def track_principals(session, flush_context):
+    if not hasattr(session, '_principals'):
+        session._principals = set()
+    for obj in itertools.chain(session.dirty, session.deleted):
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if obj in session.deleted or any(
+            state.attrs[column].history.has_changes()
+            for column in PRINCIPAL_COLUMNS + ("api_key_hash",)
+        ):
+            session._principals.add(principal.user_key(obj.id))
+            for api_key_hash in state.attrs.api_key_hash.history.deleted or ():
+                if api_key_hash:
+                    session._principals.add(principal.api_key_key(api_key_hash))
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_principals(session):
+    if getattr(session, '_principals', None):
+        keys = list(session._principals)
+        session._principals.clear()
+        try:
+            principal.invalidate(keys)
+        except Exception:
+            current_app.logger.exception("Invalidating principals failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def clear_principals(session):
+    if hasattr(session, '_principals'):
+        session._principals.clear()
+
+
 @event.listens_for(Session, "after_commit")
 def process_objects_after_commit(session):
     if hasattr(session, '_pending_objects'):
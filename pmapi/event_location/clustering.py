@@ -0,0 +1,346 @@
+"""
+clustering.py
+- precomputed map clusters of event locations for zoom levels 2-16.
+  Locations are bucketed into a web mercator grid, each zoom level
+  is built from the one below by merging 2x2 cells. A cluster is unique
+  per cell, so new, moved and deleted locations update their cells'
+  clusters in place as they're flushed. A cluster whose locations are
+  all gone is kept with a count of 0 until the next rebuild.
+"""
+
+import io
+
+import numpy as np
+from sqlalchemy import case, func, inspect, or_, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from pmapi.event_location import model
+from pmapi.event_location.model import EventLocation
+from pmapi.extensions import db
+from pmapi.utils import normalize_bounds
+
+CLUSTER_ZOOM_LEVELS = range(2, 17)
+
+# cluster cells are CLUSTER_CELL_SIZE x CLUSTER_CELL_SIZE screen pixels
+# of a 256px map tile, so there are 2 ** (zoom + 2) cells per axis
+CLUSTER_CELL_SIZE = 64
+TILE_SIZE = 256
+
+# web mercator can't represent the poles
+MAX_LATITUDE = 85.05112878
+
+CLUSTER_MODELS = {
+    zoom: getattr(model, "ClusterZoom{}".format(zoom)) for zoom in CLUSTER_ZOOM_LEVELS
+}
+
+
+def cells_per_axis(zoom):
+    return 2 ** zoom * TILE_SIZE // CLUSTER_CELL_SIZE
+
+
+def grid_cells(lat, lng, zoom):
+    """Returns the x and y grid cell of each lat, lng at a zoom level."""
+    n = cells_per_axis(zoom)
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -MAX_LATITUDE, MAX_LATITUDE))
+    lng = np.asarray(lng, dtype=float)
+    x = np.floor((lng + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n)
+    return (
+        np.clip(x, 0, n - 1).astype(np.int64),
+        np.clip(y, 0, n - 1).astype(np.int64),
+    )
+
+
+def grid_cell_ids(lat, lng, zoom):
+    """Returns the id (x * cells per axis + y) of the grid cell of each lat, lng."""
+    x, y = grid_cells(lat, lng, zoom)
+    return x * cells_per_axis(zoom) + y
+
+
+def grid_bounds(x, y, n):
+    """Returns the (west, south, east, north) bounds of cell x, y
+    of a web mercator grid with n cells per axis."""
+
+    def latitude(y):
+        return float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n)))))
+
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    return west, latitude(y + 1), east, latitude(y)
+
+
+def cell_bounds(x, y, zoom):
+    """Returns the (west, south, east, north) bounds of a grid cell."""
+    return grid_bounds(x, y, cells_per_axis(zoom))
+
+
+def tile_bounds(x, y, zoom):
+    """Returns the (west, south, east, north) bounds of a z/x/y map tile."""
+    return grid_bounds(x, y, 2 ** zoom)
+
+
+def build_cluster_levels(lat, lng, zoom_levels=CLUSTER_ZOOM_LEVELS):
+    """Clusters points for every zoom level in memory.
+    Returns {zoom: (labels, counts, lats, lngs, cells)} where labels[i] is
+    the index of the cluster of point i and counts, lats, lngs and cells
+    describe each cluster (centroids are the mean of the points)."""
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    zoom_levels = sorted(zoom_levels, reverse=True)
+    levels = {}
+    if len(lat) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return {
+            zoom: (empty, empty, empty.astype(float), empty.astype(float), empty)
+            for zoom in zoom_levels
+        }
+
+    # bucket the points at the highest zoom level
+    finest = zoom_levels[0]
+    x, y = grid_cells(lat, lng, finest)
+    cells, labels = np.unique(x * cells_per_axis(finest) + y, return_inverse=True)
+    cell_x, cell_y = np.divmod(cells, cells_per_axis(finest))
+    counts = np.bincount(labels)
+    lat_sums = np.bincount(labels, weights=lat)
+    lng_sums = np.bincount(labels, weights=lng)
+    levels[finest] = (labels, counts, lat_sums / counts, lng_sums / counts, cells)
+
+    # merge the cells of the level below into their parent cells
+    previous = finest
+    for zoom in zoom_levels[1:]:
+        shift = previous - zoom
+        cell_x, cell_y = cell_x >> shift, cell_y >> shift
+        cells, parents = np.unique(cell_x * cells_per_axis(zoom) + cell_y, return_inverse=True)
+        cell_x, cell_y = np.divmod(cells, cells_per_axis(zoom))
+        labels = parents[labels]
+        counts = np.bincount(parents, weights=counts).astype(np.int64)
+        lat_sums = np.bincount(parents, weights=lat_sums)
+        lng_sums = np.bincount(parents, weights=lng_sums)
+        levels[zoom] = (labels, counts, lat_sums / counts, lng_sums / counts, cells)
+        previous = zoom
+
+    return levels
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Bulk loads rows into a table with COPY."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join("\\N" if value is None else str(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY {} ({}) FROM STDIN".format(table, ", ".join(columns)), buffer
+    )
+
+
+def rebuild_clusters(logger=None):
+    """Rebuilds the clusters of every zoom level from scratch.
+    Cluster ids are derived data, so the writes skip the ORM (and versioning)."""
+    rows = (
+        db.session.query(EventLocation.id, EventLocation.lat, EventLocation.lng)
+        .filter(EventLocation.lat.isnot(None), EventLocation.lng.isnot(None))
+        .order_by(EventLocation.id)
+        .all()
+    )
+    location_ids = [row.id for row in rows]
+    levels = build_cluster_levels(
+        [row.lat for row in rows], [row.lng for row in rows]
+    )
+
+    connection = db.session.connection()
+    connection.execute(
+        EventLocation.__table__.update().values(
+            {"cluster_zoom_{}_id".format(zoom): None for zoom in CLUSTER_ZOOM_LEVELS}
+        )
+    )
+
+    cursor = connection.connection.cursor()
+    for zoom in CLUSTER_ZOOM_LEVELS:
+        table = CLUSTER_MODELS[zoom].__table__
+        labels, counts, lats, lngs, cells = levels[zoom]
+        connection.execute(table.delete())
+        copy_rows(
+            cursor,
+            table.name,
+            ("cluster_id", "cell", "count", "centroid"),
+            (
+                (
+                    i + 1,
+                    int(cells[i]),
+                    int(counts[i]),
+                    "SRID=4326;POINT({} {})".format(float(lngs[i]), float(lats[i])),
+                )
+                for i in range(len(counts))
+            ),
+        )
+        # keep the serial in sync for clusters added by add_to_clusters
+        connection.execute(
+            text(
+                "SELECT setval(pg_get_serial_sequence(:table, 'cluster_id'), :value, :is_called)"
+            ),
+            {"table": table.name, "value": max(len(counts), 1), "is_called": len(counts) > 0},
+        )
+        if logger:
+            logger.info("zoom {}: {} clusters".format(zoom, len(counts)))
+
+    columns = ["cluster_zoom_{}_id".format(zoom) for zoom in CLUSTER_ZOOM_LEVELS]
+    connection.execute(
+        text(
+            "CREATE TEMPORARY TABLE cluster_assignments "
+            "(location_id integer PRIMARY KEY, {}) ON COMMIT DROP".format(
+                ", ".join("{} integer".format(column) for column in columns)
+            )
+        )
+    )
+    copy_rows(
+        cursor,
+        "cluster_assignments",
+        ["location_id"] + columns,
+        (
+            [location_id] + [int(levels[zoom][0][i]) + 1 for zoom in CLUSTER_ZOOM_LEVELS]
+            for i, location_id in enumerate(location_ids)
+        ),
+    )
+    connection.execute(
+        text(
+            "UPDATE event_locations SET {} FROM cluster_assignments "
+            "WHERE event_locations.id = cluster_assignments.location_id".format(
+                ", ".join("{0} = cluster_assignments.{0}".format(column) for column in columns)
+            )
+        )
+    )
+    db.session.commit()
+    return len(location_ids)
+
+
+def point(lat, lng):
+    return func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326)
+
+
+def add_to_clusters(location):
+    """Adds a location to the cluster of its grid cell at every zoom
+    level, creating the cluster if the cell has none.
+    A cluster's centroid is the mean of its points."""
+    lat, lng = float(location.lat), float(location.lng)
+    for zoom in CLUSTER_ZOOM_LEVELS:
+        table = CLUSTER_MODELS[zoom].__table__
+        upsert = insert(table).values(
+            cell=int(grid_cell_ids([lat], [lng], zoom)[0]),
+            count=1,
+            centroid=point(lat, lng),
+        )
+        # moves the centroid to the mean of the cluster's points
+        cluster_id = db.session.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[table.c.cell],
+                set_={
+                    "count": table.c.count + 1,
+                    "centroid": point(
+                        (func.ST_Y(table.c.centroid) * table.c.count + lat)
+                        / (table.c.count + 1),
+                        (func.ST_X(table.c.centroid) * table.c.count + lng)
+                        / (table.c.count + 1),
+                    ),
+                },
+            ).returning(table.c.cluster_id)
+        ).scalar()
+        setattr(location, "cluster_zoom_{}_id".format(zoom), cluster_id)
+    return location
+
+
+def remove_from_clusters(location, lat, lng):
+    """Removes a location, last seen at lat, lng, from its clusters."""
+    lat, lng = float(lat), float(lng)
+    for zoom in CLUSTER_ZOOM_LEVELS:
+        cluster_id = getattr(location, "cluster_zoom_{}_id".format(zoom))
+        if cluster_id is None:
+            continue
+        table = CLUSTER_MODELS[zoom].__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.cluster_id == cluster_id, table.c.count > 0)
+            .values(
+                count=table.c.count - 1,
+                centroid=case(
+                    (
+                        table.c.count > 1,
+                        point(
+                            (func.ST_Y(table.c.centroid) * table.c.count - lat)
+                            / (table.c.count - 1),
+                            (func.ST_X(table.c.centroid) * table.c.count - lng)
+                            / (table.c.count - 1),
+                        ),
+                    ),
+                    else_=table.c.centroid,
+                ),
+            )
+        )
+        setattr(location, "cluster_zoom_{}_id".format(zoom), None)
+
+
+def committed_point(location):
+    """The lat, lng of a location in the db, before the flush writes it"""
+    table = EventLocation.__table__
+    row = db.session.execute(
+        select(table.c.lat, table.c.lng).where(table.c.id == location.id)
+    ).one_or_none()
+    return tuple(row) if row is not None else (None, None)
+
+
+def update_location_clusters(session):
+    """Keeps the clusters of the new, moved and deleted locations of
+    a flush in step, in the flush's transaction."""
+    for location in session.new:
+        if isinstance(location, EventLocation) and None not in (location.lat, location.lng):
+            add_to_clusters(location)
+    for location in session.dirty:
+        if not isinstance(location, EventLocation):
+            continue
+        state = inspect(location)
+        if not (state.attrs.lat.history.has_changes() or state.attrs.lng.history.has_changes()):
+            continue
+        lat, lng = committed_point(location)
+        if None not in (lat, lng):
+            remove_from_clusters(location, lat, lng)
+        if None not in (location.lat, location.lng):
+            add_to_clusters(location)
+    for location in session.deleted:
+        if isinstance(location, EventLocation):
+            lat, lng = committed_point(location)
+            if None not in (lat, lng):
+                remove_from_clusters(location, lat, lng)
+
+
+def get_clusters(zoom, bounds=None):
+    """Returns the clusters of a zoom level, optionally within map bounds."""
+    zoom = min(max(int(zoom), CLUSTER_ZOOM_LEVELS[0]), CLUSTER_ZOOM_LEVELS[-1])
+    cluster = CLUSTER_MODELS[zoom]
+    query = db.session.query(
+        cluster.cluster_id.label("id"),
+        cluster.count,
+        func.ST_Y(cluster.centroid).label("lat"),
+        func.ST_X(cluster.centroid).label("lng"),
+    ).filter(cluster.count > 0)
+
+    if bounds:
+        normalized_bounds = normalize_bounds(bounds)
+        north = normalized_bounds["_northEast"]["lat"]
+        east = normalized_bounds["_northEast"]["lng"]
+        south = normalized_bounds["_southWest"]["lat"]
+        west = normalized_bounds["_southWest"]["lng"]
+
+        def within(west, east):
+            return func.ST_Intersects(
+                cluster.centroid, func.ST_MakeEnvelope(west, south, east, north, 4326)
+            )
+
+        if bounds["_northEast"]["lng"] - bounds["_southWest"]["lng"] >= 360:
+            query = query.filter(within(-180, 180))
+        elif west <= east:
+            query = query.filter(within(west, east))
+        else:
+            # bounds cross the antimeridian
+            query = query.filter(or_(within(west, 180), within(-180, east)))
+
+    return query.order_by(cluster.count.desc()).all()
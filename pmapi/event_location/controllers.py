@@ -1,3 +1,5 @@
+import math
+
 import reverse_geocode
 import pygeohash as pgh
 from flask_login import current_user
@@ -8,6 +10,11 @@ from sqlalchemy import select, func, distinct, asc, String, Text, join
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy import or_, and_
 from sqlalchemy.sql.expression import literal
+from pmapi.event_location.clustering import (
+    MAX_LATITUDE,
+    cells_per_axis,
+    tile_bounds,
+)
 from pmapi.event_location.model import (
     EventLocation,
     EventLocationType,
@@ -22,6 +29,12 @@ from pmapi.event_artist.model import EventDateArtist
 from pmapi.event.model import Event
 from pmapi.common.controllers import paginated_results
 from pmapi import exceptions as exc
+from pmapi.services.timezones import timezone_at
+
+from . import gazetteer
+
+# below this zoom level tiles return counts instead of points
+POINTS_TILE_MIN_ZOOM = 9
 
 
 def add_new_event_location(creator=None, **kwargs):
@@ -34,64 +47,36 @@ def add_new_event_location(creator=None, **kwargs):
     address_components = kwargs.get("address_components")
 
     # return location if it already exists
-    if (get_location(place_id)) is not None:
-        return get_location(place_id)
+    location = get_location(place_id)
+    if location is not None:
+        return location
 
-    country = None
-    region = None
-    locality = None
+    country_id = None
+    region_id = None
+    locality_id = None
 
     # get country
     for component in address_components:
         if "country" in component["types"]:
-            short_name = component["short_name"]
-            existing_country = get_country(short_name)
-            if existing_country is not None:
-                country = existing_country
-            else:
-                country = Country(
-                    short_name=component["short_name"], long_name=component["long_name"]
-                )
-                db.session.add(country)
-                db.session.flush()
+            country_id = gazetteer.get_country_id(
+                component["short_name"], component["long_name"]
+            )
 
     # get region
     for component in address_components:
-        if "administrative_area_level_1" in component["types"]:
-            short_name = component["short_name"]
-            existing_region_of_country = get_region_of_country(
-                short_name, country)
-            if existing_region_of_country is not None:
-                region = existing_region_of_country
-            else:
-                region = Region(
-                    short_name=component["short_name"],
-                    long_name=component["long_name"],
-                    country=country,
-                )
-                db.session.add(region)
-                db.session.flush()
+        if "administrative_area_level_1" in component["types"] and country_id:
+            region_id = gazetteer.get_region_id(
+                country_id, component["short_name"], component["long_name"]
+            )
 
     # get locality
     for component in address_components:
-        if "locality" in component["types"]:
-            short_name = component["short_name"]
-            existing_locality_of_region_of_country = get_locality_of_region_of_country(
-                short_name, region, country
+        if "locality" in component["types"] and country_id:
+            locality_id = gazetteer.get_locality_id(
+                country_id, region_id, component["short_name"], component["long_name"]
             )
-            if existing_locality_of_region_of_country is not None:
-                locality = existing_locality_of_region_of_country
-            else:
-                locality = Locality(
-                    short_name=component["short_name"],
-                    long_name=component["long_name"],
-                    region=region,
-                    country=country,
-                )
-                db.session.add(locality)
-                db.session.flush()
 
-    if (region is None and locality is None) or country is None:
+    if (region_id is None and locality_id is None) or country_id is None:
         raise exc.InvalidAPIRequest(
             "A more specific location is required. Please try again."
         )
@@ -102,26 +87,14 @@ def add_new_event_location(creator=None, **kwargs):
     # geocode = reverse_geocode.search([(lat, lng)])[0]
 
     location_type_objects = []
-    db.session.flush()
-
-    for t in types:
-        type = None
-        if (
+    type_ids = gazetteer.get_location_type_ids(types)
+    if type_ids:
+        location_type_objects = (
             db.session.query(EventLocationType)
-            .filter(EventLocationType.type == t)
-            .count()
-        ):
-            type = (
-                db.session.query(EventLocationType)
-                .filter(EventLocationType.type == t)
-                .one()
-            )
-        else:
-            type = EventLocationType(type=t)
-        db.session.add(type)
-        location_type_objects.append(type)
+            .filter(EventLocationType.id.in_(type_ids))
+            .all()
+        )
 
-    db.session.flush()
     creator_id = None
     if creator:
         creator_id = creator.id
@@ -135,9 +108,10 @@ def add_new_event_location(creator=None, **kwargs):
         types=location_type_objects,
         lat=lat,
         lng=lng,
-        country=country,
-        region=region,
-        locality=locality,
+        tz=timezone_at(lat, lng),
+        country_id=country_id,
+        region_id=region_id,
+        locality_id=locality_id,
         # country=geocode["country"],
         # country_code=geocode["country_code"],
         # city=geocode["city"],
@@ -146,6 +120,7 @@ def add_new_event_location(creator=None, **kwargs):
         address_components=address_components,
     )
     db.session.add(location)
+    # the listener adds it to its clusters (see clustering.update_location_clusters)
     db.session.flush()
     return location
 
@@ -279,10 +254,9 @@ def get_country(short_name):
 
 
 def get_region_of_country(short_name, country):
-    for region in country.regions:
-        if region.short_name == short_name:
-            return region
-    return None
+    return Region.query.filter(
+        Region.country_id == country.short_name, Region.short_name == short_name
+    ).first()
 
 
 def get_all_regions_of_country(country_short_name, **kwargs):
@@ -298,13 +272,11 @@ def get_all_localities_of_region_of_country(country_short_name, region_short_nam
 
 
 def get_locality_of_region_of_country(short_name, region, country):
-    for reg in country.regions:
-        if reg is not None:
-            if (reg.short_name == region.short_name) or (reg.long_name == region.long_name):
-                for loc in reg.localities:
-                    if loc.short_name == short_name:
-                        return loc
-    return None
+    return Locality.query.filter(
+        Locality.country_id == country.short_name,
+        Locality.region_id == (region.id if region else None),
+        Locality.short_name == short_name,
+    ).first()
 
 
 def get_location(place_id):
@@ -313,7 +285,9 @@ def get_location(place_id):
     return result
 
 
-def get_all_locations(**kwargs):
+def filter_locations(**kwargs):
+    """Returns a query of locations matching the point filters and the
+    expression that aggregates the events at each location."""
 
     query = db.session.query(EventLocation)
 
@@ -494,6 +468,11 @@ def get_all_locations(**kwargs):
                     )
                 ))
     
+    return query, expression
+
+
+def get_all_locations(**kwargs):
+    query, expression = filter_locations(**kwargs)
     return query.options(
         with_expression(
             EventLocation.events,
@@ -502,6 +481,56 @@ def get_all_locations(**kwargs):
     )
 
 
+def get_tile_points(z, x, y, **kwargs):
+    """Returns the points of a z/x/y map tile. Below POINTS_TILE_MIN_ZOOM
+    the points are counted per cluster grid cell instead.
+    Rows are sorted so that a tile's response is deterministic."""
+    if z < 0 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise exc.InvalidAPIRequest("Tile {}/{}/{} does not exist".format(z, x, y))
+
+    west, south, east, north = tile_bounds(x, y, z)
+    in_tile = and_(
+        EventLocation.lng >= west,
+        EventLocation.lng < east,
+        EventLocation.lat >= south,
+        EventLocation.lat < north,
+    )
+    tile = {"z": z, "x": x, "y": y, "clusters": [], "points": []}
+
+    if z < POINTS_TILE_MIN_ZOOM:
+        query, _ = filter_locations(**kwargs)
+        locations = (
+            query.filter(in_tile)
+            .with_entities(EventLocation.id, EventLocation.lat, EventLocation.lng)
+            .subquery()
+        )
+        # same grid as clustering.grid_cells
+        n = cells_per_axis(z)
+        lat = func.radians(
+            func.least(func.greatest(locations.c.lat, -MAX_LATITUDE), MAX_LATITUDE)
+        )
+        cell_x = func.floor((locations.c.lng + 180) / 360 * n)
+        cell_y = func.floor(
+            (1 - func.ln(func.tan(lat) + 1 / func.cos(lat)) / math.pi) / 2 * n
+        )
+        tile["clusters"] = (
+            db.session.query(
+                func.count().label("count"),
+                func.avg(locations.c.lat).label("lat"),
+                func.avg(locations.c.lng).label("lng"),
+            )
+            .group_by(cell_y, cell_x)
+            .order_by(cell_y, cell_x)
+            .all()
+        )
+    else:
+        tile["points"] = (
+            get_all_locations(**kwargs).filter(in_tile).order_by(EventLocation.id).all()
+        )
+
+    return tile
+
+
 """
         if kwargs.get("favorites", None) is not None:
             if kwargs.get("favorites") is True:
@@ -0,0 +1,158 @@
+"""
+gazetteer.py
+- the countries, regions, localities and place types of event locations.
+  Each is written with INSERT ... ON CONFLICT DO NOTHING RETURNING on its
+  unique index, selected only when it already existed, and its id kept
+  in an in-process cache, so creating a location costs the same few
+  statements however many regions and localities its country has.
+  Ids seen in a transaction are cached once it commits
+  (see event_listeners.py).
+"""
+
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from pmapi.config import BaseConfig
+from pmapi.extensions import db
+from pmapi.extensions.lru_cache import LRUCache
+
+from .model import Country, EventLocationType, Locality, Region
+
+cache = LRUCache(
+    threshold=BaseConfig.GAZETTEER_CACHE_SIZE,
+    default_timeout=BaseConfig.GAZETTEER_CACHE_TTL,
+)
+
+
+def _key(*parts):
+    return "|".join("" if part is None else str(part) for part in parts)
+
+
+def _staged():
+    """The ids seen by the current transaction, cached when it commits"""
+    session = db.session()
+    if not hasattr(session, "_gazetteer"):
+        session._gazetteer = {}
+    return session._gazetteer
+
+
+def _get(key):
+    staged = _staged()
+    if key in staged:
+        return staged[key]
+    return cache.get(key)
+
+
+def cache_ids(ids):
+    cache.set_many(ids)
+
+
+def clear_cache():
+    cache.clear()
+
+
+def get_country_id(short_name, long_name):
+    key = _key("country", short_name)
+    if _get(key) is None:
+        db.session.execute(
+            insert(Country.__table__)
+            .values(short_name=short_name, long_name=long_name)
+            .on_conflict_do_nothing(index_elements=["short_name"])
+        )
+        _staged()[key] = short_name
+    return short_name
+
+
+def get_region_id(country_id, short_name, long_name):
+    key = _key("region", country_id, short_name)
+    region_id = _get(key)
+    if region_id is None:
+        region_id = db.session.execute(
+            insert(Region.__table__)
+            .values(
+                id=str(uuid.uuid4()),
+                country_id=country_id,
+                short_name=short_name,
+                long_name=long_name,
+            )
+            .on_conflict_do_nothing(index_elements=["country_id", "short_name"])
+            .returning(Region.__table__.c.id)
+        ).scalar()
+        if region_id is None:
+            region_id = db.session.execute(
+                select(Region.id).where(
+                    Region.country_id == country_id, Region.short_name == short_name
+                )
+            ).scalar()
+        _staged()[key] = region_id
+    return region_id
+
+
+def get_locality_id(country_id, region_id, short_name, long_name):
+    key = _key("locality", country_id, region_id, short_name)
+    locality_id = _get(key)
+    if locality_id is None:
+        upsert = insert(Locality.__table__).values(
+            id=str(uuid.uuid4()),
+            country_id=country_id,
+            region_id=region_id,
+            short_name=short_name,
+            long_name=long_name,
+        )
+        if region_id is None:
+            upsert = upsert.on_conflict_do_nothing(
+                index_elements=["country_id", "short_name"],
+                index_where=Locality.region_id.is_(None),
+            )
+        else:
+            upsert = upsert.on_conflict_do_nothing(
+                index_elements=["country_id", "region_id", "short_name"]
+            )
+        locality_id = db.session.execute(
+            upsert.returning(Locality.__table__.c.id)
+        ).scalar()
+        if locality_id is None:
+            locality_id = db.session.execute(
+                select(Locality.id).where(
+                    Locality.country_id == country_id,
+                    Locality.region_id.is_(None)
+                    if region_id is None
+                    else Locality.region_id == region_id,
+                    Locality.short_name == short_name,
+                )
+            ).scalar()
+        _staged()[key] = locality_id
+    return locality_id
+
+
+def get_location_type_ids(types):
+    """The ids of the place types, in the order of `types` without duplicates"""
+    types = list(dict.fromkeys(types or []))
+    missing = [t for t in types if _get(_key("type", t)) is None]
+    if missing:
+        found = dict(
+            db.session.execute(
+                insert(EventLocationType.__table__)
+                .values([{"type": t} for t in missing])
+                .on_conflict_do_nothing(index_elements=["type"])
+                .returning(
+                    EventLocationType.__table__.c.type,
+                    EventLocationType.__table__.c.id,
+                )
+            ).all()
+        )
+        existing = [t for t in missing if t not in found]
+        if existing:
+            found.update(
+                db.session.execute(
+                    select(EventLocationType.type, EventLocationType.id).where(
+                        EventLocationType.type.in_(existing)
+                    )
+                ).all()
+            )
+        staged = _staged()
+        for t, type_id in found.items():
+            staged[_key("type", t)] = type_id
+    return [_get(_key("type", t)) for t in types]
@@ -46,6 +46,24 @@ class Locality(db.Model):
 
     locations = db.relationship("EventLocation")
 
+    # the gazetteer upserts on these (see gazetteer.py)
+    __table_args__ = (
+        db.Index(
+            "uq_localities_country_id_region_id_short_name",
+            "country_id",
+            "region_id",
+            "short_name",
+            unique=True,
+        ),
+        db.Index(
+            "uq_localities_country_id_short_name_no_region",
+            "country_id",
+            "short_name",
+            unique=True,
+            postgresql_where=db.text("region_id IS NULL"),
+        ),
+    )
+
     @hybrid_property
     def full_name(self):
         return (
@@ -83,6 +101,12 @@ class Region(db.Model):
     localities = db.relationship("Locality")
     locations = db.relationship("EventLocation")
 
+    __table_args__ = (
+        db.Index(
+            "uq_regions_country_id_short_name", "country_id", "short_name", unique=True
+        ),
+    )
+
     @hybrid_property
     def full_name(self):
         return self.long_name + ", " + self.country.long_name
@@ -113,7 +137,7 @@ class EventLocationType(db.Model):
     __tablename__ = "event_location_types"
     __versioned__ = {}
     id = db.Column(db.Integer, primary_key=True)
-    type = db.Column(db.String)
+    type = db.Column(db.String, unique=True)
     event_locations = db.relationship(
         "EventLocation",
         secondary="event_location_type_association",
@@ -122,7 +146,7 @@ class EventLocationType(db.Model):
 
 
 class EventLocation(db.Model):
-    __versioned__ = {'versioning_relations': ['event_dates']}
+    __versioned__ = {'versioning_relations': ['event_dates'], 'exclude': ['tz']}
     __tablename__ = "event_locations"
     id = db.Column(db.Integer, primary_key=True)
     place_id = db.Column(db.String)
@@ -132,6 +156,8 @@ class EventLocation(db.Model):
     description = db.Column(db.String)
     lat = db.Column(db.Float)
     lng = db.Column(db.Float)
+    # resolved once from lat/lng (see services/timezones.py)
+    tz = db.Column(db.String)
     types = db.relationship(
         "EventLocationType",
         secondary="event_location_type_association",
@@ -148,6 +174,13 @@ class EventLocation(db.Model):
 
     address_components = db.Column(JSONB)
 
+    __table_args__ = (
+        # known addresses, matched before geocoding (see services/gmaps.py)
+        db.Index(
+            "idx_event_locations_lower_description", db.func.lower(description)
+        ),
+    )
+
     events = query_expression()
 
     # event = db.relationship("Event", back_populates="default_location")
@@ -250,6 +283,7 @@ class EventLocation(db.Model):
 class ClusterZoom2(db.Model):
     __tablename__ = "clusters_2"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -259,6 +293,7 @@ class ClusterZoom2(db.Model):
 class ClusterZoom3(db.Model):
     __tablename__ = "clusters_3"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -268,6 +303,7 @@ class ClusterZoom3(db.Model):
 class ClusterZoom4(db.Model):
     __tablename__ = "clusters_4"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -277,6 +313,7 @@ class ClusterZoom4(db.Model):
 class ClusterZoom5(db.Model):
     __tablename__ = "clusters_5"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -286,6 +323,7 @@ class ClusterZoom5(db.Model):
 class ClusterZoom6(db.Model):
     __tablename__ = "clusters_6"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -295,6 +333,7 @@ class ClusterZoom6(db.Model):
 class ClusterZoom7(db.Model):
     __tablename__ = "clusters_7"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -304,6 +343,7 @@ class ClusterZoom7(db.Model):
 class ClusterZoom8(db.Model):
     __tablename__ = "clusters_8"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -313,6 +353,7 @@ class ClusterZoom8(db.Model):
 class ClusterZoom9(db.Model):
     __tablename__ = "clusters_9"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -322,6 +363,7 @@ class ClusterZoom9(db.Model):
 class ClusterZoom10(db.Model):
     __tablename__ = "clusters_10"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -331,6 +373,7 @@ class ClusterZoom10(db.Model):
 class ClusterZoom11(db.Model):
     __tablename__ = "clusters_11"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -340,6 +383,7 @@ class ClusterZoom11(db.Model):
 class ClusterZoom12(db.Model):
     __tablename__ = "clusters_12"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -349,6 +393,7 @@ class ClusterZoom12(db.Model):
 class ClusterZoom13(db.Model):
     __tablename__ = "clusters_13"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -358,6 +403,7 @@ class ClusterZoom13(db.Model):
 class ClusterZoom14(db.Model):
     __tablename__ = "clusters_14"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -367,6 +413,7 @@ class ClusterZoom14(db.Model):
 class ClusterZoom15(db.Model):
     __tablename__ = "clusters_15"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -376,6 +423,7 @@ class ClusterZoom15(db.Model):
 class ClusterZoom16(db.Model):
     __tablename__ = "clusters_16"
     cluster_id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.BigInteger, unique=True)
     count = db.Column(db.Integer)
     centroid = db.Column(Geometry(geometry_type="POINT"))
     locations = db.relationship(
@@ -1,4 +1,7 @@
-from flask import Blueprint
+import json
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user
 
 from marshmallow import fields
 from flask_apispec import doc
@@ -7,12 +10,23 @@ from flask_apispec import MethodResource
 from flask_apispec import use_kwargs
 
 from pmapi.common.controllers import paginated_view_args
+from pmapi.common.response_cache import cached_response
+from pmapi.event_location import clustering
 from pmapi.event_location import controllers as event_locations
-from .schemas import PointSchema, LocationSchema, LocationListSchema, CountrySchema, RegionSchema, LocalitySchema
+from .schemas import ClusterSchema, PointSchema, TilePointsSchema, LocationSchema, LocationListSchema, CountrySchema, RegionSchema, LocalitySchema
 
 
 locations_blueprint = Blueprint("locations", __name__)
 
+# tables that the point filters read from
+POINTS_CACHE_TAGS = (
+    "events",
+    "event_dates",
+    "event_locations",
+    "event_tags",
+    "event_date_artists",
+)
+
 
 @doc(tags=["locations"])
 class LocationsResource(MethodResource):
@@ -60,6 +74,21 @@ locations_blueprint.add_url_rule(
 )
 
 
+points_filter_args = {
+    "date_min": fields.DateTime(required=False),
+    "date_max": fields.DateTime(required=False),
+    "tags": fields.List(fields.Str(), required=False),
+    "artists": fields.List(fields.Int(), required=False),
+    "favorites": fields.Boolean(),
+    "duration_options": fields.List(fields.Integer(), required=False),
+    "size_options": fields.List(fields.String(), required=False),
+    "query": fields.Str(),
+    "distinct": fields.Boolean(),
+    "empty_lineup": fields.Boolean(),
+    "date_unconfirmed": fields.Boolean(),
+}
+
+
 @doc(tags=["locations"])
 class PointsResource(MethodResource):
     @doc(
@@ -72,29 +101,86 @@ class PointsResource(MethodResource):
         eg: 2020-05-23T05:00:00",
         """,
     )
+    @use_kwargs(points_filter_args, location="query")
+    @marshal_with(PointSchema(many=True), code=200)
+    def get(self, **kwargs):
+        return event_locations.get_all_locations(**kwargs)
+
+
+locations_blueprint.add_url_rule(
+    "/points/",
+    view_func=cached_response(*POINTS_CACHE_TAGS)(PointsResource.as_view("PointsResource")),
+)
+
+
+@doc(tags=["locations"])
+class TilePointsResource(MethodResource):
+    @doc(
+        summary="Get the points of a map tile",
+        description="""Returns the locations within a z/x/y map tile for query \
+        criteria. Supports the same filters as /points/. \
+        Below zoom 9 the points are aggregated into counts per grid cell \
+        (clusters), from zoom 9 individual points and their events are returned.
+        Responses have an ETag, send If-None-Match to get a 304 if the tile
+        hasn't changed.
+        """,
+        params={
+            "z": {"description": "zoom level"},
+            "x": {"description": "tile column"},
+            "y": {"description": "tile row"},
+        },
+    )
+    @use_kwargs(points_filter_args, location="query")
+    @marshal_with(TilePointsSchema(), code=200)
+    def get(self, z, x, y, **kwargs):
+        tile = event_locations.get_tile_points(z, x, y, **kwargs)
+        response = jsonify(TilePointsSchema().dump(tile))
+        response.add_etag()
+        response.cache_control.max_age = current_app.config["POINTS_TILE_MAX_AGE"]
+        if current_user.is_authenticated:
+            # hidden events of the user may be included
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+        return response.make_conditional(request)
+
+
+locations_blueprint.add_url_rule(
+    "/points/<int:z>/<int:x>/<int:y>",
+    view_func=cached_response(*POINTS_CACHE_TAGS)(
+        TilePointsResource.as_view("TilePointsResource")
+    ),
+)
+
+
+@doc(tags=["locations"])
+class ClustersResource(MethodResource):
+    @doc(
+        summary="Get location clusters for a zoom level",
+        description="""Returns precomputed clusters of locations for a map \
+        zoom level (2-16), optionally within the map bounds. \
+        Use this instead of /points/ when the map is zoomed out.
+        ### Usage:
+        bounds is a JSON object with _northEast and _southWest lat/lng,
+        eg: {"_northEast": {"lat": -40, "lng": 175}, "_southWest": {"lat": -47, "lng": 166}}
+        """,
+    )
     @use_kwargs(
         {
-            "date_min": fields.DateTime(required=False),
-            "date_max": fields.DateTime(required=False),
-            "tags": fields.List(fields.Str(), required=False),
-            "artists": fields.List(fields.Int(), required=False),
-            "favorites": fields.Boolean(),
-            "duration_options": fields.List(fields.Integer(), required=False),
-            "size_options": fields.List(fields.String(), required=False),
-            "query": fields.Str(),
-            "distinct": fields.Boolean(),
-            "empty_lineup": fields.Boolean(),
-            "date_unconfirmed": fields.Boolean(),
+            "zoom": fields.Float(required=True),
+            "bounds": fields.Str(),
         },
         location="query"
     )
-    @marshal_with(PointSchema(many=True), code=200)
-    def get(self, **kwargs):
-        return event_locations.get_all_locations(**kwargs)
+    @marshal_with(ClusterSchema(many=True), code=200)
+    def get(self, zoom, bounds=None):
+        if bounds:
+            bounds = json.loads(bounds)
+        return clustering.get_clusters(zoom, bounds=bounds)
 
 
 locations_blueprint.add_url_rule(
-    "/points/", view_func=PointsResource.as_view("PointsResource")
+    "/clusters", view_func=ClustersResource.as_view("ClustersResource")
 )
 
 
@@ -113,7 +199,10 @@ class CountriesResource(MethodResource):
 
 
 locations_blueprint.add_url_rule(
-    "/countries", view_func=CountriesResource.as_view("CountriesResource")
+    "/countries",
+    view_func=cached_response("events", "event_dates", "event_locations", "countries")(
+        CountriesResource.as_view("CountriesResource")
+    ),
 )
 
 
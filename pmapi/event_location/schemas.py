@@ -87,3 +87,27 @@ class PointSchema(Schema):
     # events = fields.Nested(
     #    "EventDateSchema", only=["name", "event_id", "id"], many=True
     # )
+
+
+@ts_interface()
+class ClusterSchema(Schema):
+    id = fields.Int()
+    count = fields.Int()
+    lat = fields.Float()
+    lng = fields.Float()
+
+
+@ts_interface()
+class TileClusterSchema(Schema):
+    count = fields.Int()
+    lat = fields.Float()
+    lng = fields.Float()
+
+
+@ts_interface()
+class TilePointsSchema(Schema):
+    z = fields.Int()
+    x = fields.Int()
+    y = fields.Int()
+    clusters = fields.Nested(TileClusterSchema, many=True)
+    points = fields.Nested(PointSchema, many=True)
@@ -11,6 +11,7 @@ from pmapi.exceptions import InvalidPermissions
 import pmapi.event_tag.permissions as tag_permissions
 
 from pmapi.common.controllers import paginated_view_args
+from pmapi.common.response_cache import cached_response
 from .schemas import TagListSchema
 import pmapi.event_tag.controllers as event_tags
 
@@ -40,7 +41,11 @@ class TagsResource(MethodResource):
 
 
 event_tags_blueprint.add_url_rule(
-    "/", view_func=TagsResource.as_view("TagsResource"))
+    "/",
+    view_func=cached_response("tags", "event_tags", "events", "event_dates", "event_locations")(
+        TagsResource.as_view("TagsResource")
+    ),
+)
 
 
 @doc(tags=["tags"])
@@ -48,7 +48,16 @@ allowed_origins = [
     "https://www.partymap.com"
 ] if DEV_ENVIRON else [ "https://partymap.com", "https://www.partymap.com"]
 
-cache = Cache(config={"CACHE_TYPE": "simple"})
+# configured by CACHE_* in config.py
+cache = Cache()
+# the backends every web, celery and CLI process can reach
+SHARED_CACHE_TYPES = (
+    "redis",
+    "redissentinel",
+    "memcached",
+    "saslmemcached",
+    "spreadsaslmemcached",
+)
 admin = Admin(name="PARTYMAP", template_mode="bootstrap3", index_view=SecureAdminIndexView())
 db = CustomSQLAlchemy()
 cors = CORS(resources={r"/api/*": {"origins": allowed_origins, "supports_credentials": True}})
@@ -86,3 +95,11 @@ def get_locale():
     # example.  The best match wins.
     return request.accept_languages.best_match(['de', 'fr', 'en'])
 
+
+def cache_is_shared(app=None):
+    """Whether a write to the cache is seen by every process, what's
+    invalidated in one process must be invalidated in all of them"""
+    config = (app or current_app).config
+    if config.get("CACHE_SHARED") is not None:
+        return config["CACHE_SHARED"]
+    return config["CACHE_TYPE"].rsplit(".", 1)[-1] in SHARED_CACHE_TYPES
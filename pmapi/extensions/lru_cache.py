@@ -0,0 +1,66 @@
+from collections import OrderedDict
+import pickle
+import threading
+from time import time
+
+from flask_caching.backends.base import BaseCache
+
+"""An in-process LRU cache backend for flask-caching, used by the tests and
+single process setups. Set CACHE_TYPE = "pmapi.extensions.lru_cache.lru" """
+
+
+class LRUCache(BaseCache):
+    def __init__(self, threshold=500, default_timeout=300):
+        super().__init__(default_timeout)
+        self._cache = OrderedDict()
+        self._threshold = threshold
+        self._lock = threading.Lock()
+
+    def _normalize_timeout(self, timeout):
+        timeout = BaseCache._normalize_timeout(self, timeout)
+        if timeout > 0:
+            timeout = time() + timeout
+        return timeout
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._cache[key]
+            except KeyError:
+                return None
+            if expires != 0 and expires <= time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        value = (self._normalize_timeout(timeout), pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._threshold:
+                self._cache.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._cache.pop(key, None) is not None
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+        return True
+
+
+def lru(app, config, args, kwargs):
+    kwargs.update(dict(threshold=config["CACHE_THRESHOLD"]))
+    return LRUCache(*args, **kwargs)
@@ -1,5 +1,4 @@
-from flask_login import current_user
-
+from pmapi.auth.principal import current_user_model
 from pmapi.mail.controllers import (
     send_feedback_notification_email,
 )
@@ -9,10 +8,7 @@ from .model import Feedback
 
 
 def create_feedback(**kwargs):
-    if current_user.is_authenticated:
-        creator = current_user
-    else:
-        creator = None
+    creator = current_user_model()
     message = kwargs.pop("message", None)
     contact_email = kwargs.pop("contact_email", None)
 
@@ -1,23 +1,16 @@
 import mimetypes
 import os
-from typing import Optional
+import shutil
 import uuid
-import re
-import subprocess
-import base64
-import json
 from pmapi.media_item.schemas import generate_local_filepath
 from sqlalchemy_continuum import version_class
-from flask import current_app, flash
-from PIL import Image
+from flask import current_app
 from mimetypes import guess_extension
 from flask_login import current_user
-from ffmpy import FFprobe
 from datetime import datetime
-import os, logging
 # import magic
-import requests
 
+from . import renditions, transcoding, uploads
 from .model import MediaItem
 from pmapi.extensions import db, activity_plugin
 from pmapi import exceptions as exc
@@ -102,7 +95,6 @@ def add_media_to_artist(items, artist, creator=None):
 
     for i in items:
 
-        file = i["base64File"]
         path = os.path.join(
             current_app.config["MEDIA_UPLOAD_FOLDER"] +
             str("artist/") + str(artist.id)
@@ -120,7 +112,7 @@ def add_media_to_artist(items, artist, creator=None):
             video_poster_filename,
             duration,
             type,
-        ) = save_media_item(file, path)
+        ) = save_media_item(uploads.resolve_upload(i), path)
         if thumb_filename:
             media_item = MediaItem(
                 artist=artist,
@@ -136,6 +128,7 @@ def add_media_to_artist(items, artist, creator=None):
                 thumb_xs_filename=thumb_xs_filename,
                 thumb_xxs_filename=thumb_xxs_filename,
                 type=type,
+                status=renditions.initial_status(type),
                 creator_id=creator_id,
             )
             db.session.add(media_item)
@@ -152,7 +145,6 @@ def add_media_to_artist(items, artist, creator=None):
 
 
 def upload_user_avatar(item, user, creator=current_user):
-    file = item["base64File"]
     path = os.path.join(
         current_app.config["MEDIA_UPLOAD_FOLDER"] +
         str("user_avatar/") + str(user.username) + '_' + str(user.id)
@@ -170,7 +162,7 @@ def upload_user_avatar(item, user, creator=current_user):
         video_poster_filename,
         duration,
         type,
-    ) = save_media_item(file, path)
+    ) = save_media_item(uploads.resolve_upload(item), path)
 
     if thumb_filename:
         media_item = MediaItem(
@@ -186,6 +178,7 @@ def upload_user_avatar(item, user, creator=current_user):
             thumb_xs_filename=thumb_xs_filename,
             thumb_xxs_filename=thumb_xxs_filename,
             type=type,
+            status=renditions.initial_status(type),
             creator_id=creator.id,
         )
         db.session.add(media_item)
@@ -198,15 +191,8 @@ def upload_user_avatar(item, user, creator=current_user):
     return None
 
 
-def add_media_item(path, file=None, url=None):
-
-    if url and file is None:
-        # get media from url
-        try:
-            file = download_image_as_base64(url)
-        except:
-            raise exc.InvalidAPIRequest("media_item.add_media_to_event: Couldn't fetch image from URL")
-
+def add_media_item(path, item):
+    """Creates a media item from a payload with an uploadId, base64File or url"""
     (
         thumb_xxs_filename,
         thumb_xs_filename,
@@ -219,7 +205,7 @@ def add_media_item(path, file=None, url=None):
         video_poster_filename,
         duration,
         type,
-    ) = save_media_item(file, path)
+    ) = save_media_item(uploads.resolve_upload(item), path)
     media_item = MediaItem(
         image_filename=image_filename,
         image_med_filename=image_med_filename,
@@ -232,6 +218,7 @@ def add_media_item(path, file=None, url=None):
         thumb_xs_filename=thumb_xs_filename,
         thumb_xxs_filename=thumb_xxs_filename,
         type=type,
+        status=renditions.initial_status(type),
     )
     db.session.add(media_item)
     db.session.flush()
@@ -240,14 +227,11 @@ def add_media_item(path, file=None, url=None):
 
 def add_lineup_images_to_event_date(images, event, event_date, creator=current_user):
     for i in images:
-        file = i.get("base64File")
-        url = i.get("url")
         path = os.path.join(
             current_app.config["MEDIA_UPLOAD_FOLDER"] +
             str("event/") + str(event.id)
         )
-        media_item = add_media_item(
-            path, file=file, url=url)
+        media_item = add_media_item(path, i)
 
         media_item.creator_id = creator.id if creator else None
         media_item.attributes = {'isLineupImage': True}
@@ -267,8 +251,6 @@ def add_lineup_images_to_event_date(images, event, event_date, creator=current_u
 
 
 def add_logo_to_event(image, event, creator=current_user):
-    file = image.get("base64File")
-    url = image.get('url')
     path = os.path.join(
         current_app.config["MEDIA_UPLOAD_FOLDER"] +
         str("event/") + str(event.id)
@@ -279,8 +261,7 @@ def add_logo_to_event(image, event, creator=current_user):
         if item.attributes is not None and "isEventLogo" in item.attributes:
             delete_item(item)
 
-    media_item = add_media_item(
-        path, url=url, file=file)
+    media_item = add_media_item(path, image)
 
     media_item.creator_id = creator.id if creator else None
     media_item.attributes = {'isEventLogo': True}
@@ -309,10 +290,7 @@ def add_media_to_event(items, event, event_date=None, creator=current_user):
             str("event/") + str(event.id)
         )
 
-        url = i.get('url')
-        file = i.get('base64File')
-
-        media_item = add_media_item(path, file=file, url=url)
+        media_item = add_media_item(path, i)
         media_item.event = event
         media_item.event_date = event_date
         media_item.creator_id = creator.id if creator else None
@@ -332,9 +310,11 @@ def add_media_to_event(items, event, event_date=None, creator=current_user):
     return media_items
 
 
-def save_media_item(file, path):
-    if not file:
-        raise exc.InvalidAPIRequest("file required")
+def save_media_item(upload, path):
+    """Moves an upload into `path` and creates its renditions.
+    :param tuple upload: (path, mimetype) from uploads.resolve_upload
+    """
+    upload_path, mimetype = upload
 
     # Create the directory if it doesn't exist
     if not os.path.exists(path):
@@ -346,32 +326,20 @@ def save_media_item(file, path):
         finally:
             os.umask(original_umask)
 
-    # Extract mimetype and base64 data
-    mimetype = file[file.find("data:") + 5: file.find(";base64,")]
-    base64_string = re.search(r"base64,(.*)", file).group(1)
-
-    mimetypes.add_type('image/webp', '.webp')  # Ensure WebP is recognized
-
     file_extension = mimetypes.guess_extension(mimetype)
     if file_extension == ".jpeg":
         file_extension = ".jpg"
 
     # Determine media type
     type = None
-    video_mimetypes = {
-        "video/mp4", "video/mpeg", "video/x-msvideo",
-        "video/ogg", "video/webm", "video/3gpp", "video/avi"
-    }
-    image_mimetypes = {
-        "image/png", "image/gif", "image/jpeg",
-        "image/jpg", "image/bmp", "image/webp"
-    }
-
-    if mimetype in video_mimetypes:
+    if mimetype in uploads.VIDEO_MIMETYPES:
         type = "video"
-    elif mimetype in image_mimetypes:
+    elif mimetype in uploads.IMAGE_MIMETYPES:
         type = "image"
         file_extension = ".webp"  # Override to WebP for images
+    else:
+        os.remove(upload_path)
+        raise exc.InvalidAPIRequest("Unsupported file type {}".format(mimetype))
 
     # Generate filenames
     unique_filename = str(uuid.uuid4())
@@ -380,47 +348,33 @@ def save_media_item(file, path):
 
     image_med_filename = None
 
-    video_low_filename = None
-    video_med_filename = None
-    video_high_filename = None
-    duration = None
-
     if type == "image":
-
-        with open(os.path.join(path, filename), "wb") as fh:
-            fh.write(base64.b64decode(base64_string))
-
-        img = Image.open(os.path.join(path, filename))
-
-        # Convert to RGB if necessary
-        if img.mode != "RGB":
-            img = img.convert("RGB")
-        
-        print('save media item', os.path.join(path, filename))
-        # Save original as WebP
-        img.save(os.path.join(path, filename), "WEBP")
+        # only readable images become media items
+        try:
+            renditions.verify_image(upload_path)
+        except Exception:
+            os.remove(upload_path)
+            raise exc.InvalidAPIRequest("Couldn't read image")
 
         # Generate thumbnail filenames
         image_med_filename = unique_filename + "_med" + file_extension
         thumb_xs_filename = unique_filename + "_thumb_xs" + file_extension
         thumb_xxs_filename = unique_filename + "_thumb_xxs" + file_extension
 
-        # Create thumbnails
-        img_copy = img.copy()
-        img_copy.thumbnail((1024, 1024), Image.ANTIALIAS)
-        img_copy.save(os.path.join(path, image_med_filename), "WEBP")
-
-        img_copy = img.copy()
-        img_copy.thumbnail((512, 512), Image.ANTIALIAS)
-        img_copy.save(os.path.join(path, thumb_filename), "WEBP")
-
-        img_copy = img.copy()
-        img_copy.thumbnail((256, 256), Image.ANTIALIAS)
-        img_copy.save(os.path.join(path, thumb_xs_filename), "WEBP")
-
-        img_copy = img.copy()
-        img_copy.thumbnail((64, 64), Image.ANTIALIAS)
-        img_copy.save(os.path.join(path, thumb_xxs_filename), "WEBP")
+        # the renditions are made from the upload as it was sent
+        shutil.move(upload_path, os.path.join(path, renditions.upload_filename(filename)))
+
+        if not current_app.config["MEDIA_RENDITIONS_ASYNC"]:
+            renditions.render_renditions(
+                path,
+                {
+                    "image_filename": filename,
+                    "image_med_filename": image_med_filename,
+                    "thumb_filename": thumb_filename,
+                    "thumb_xs_filename": thumb_xs_filename,
+                    "thumb_xxs_filename": thumb_xxs_filename,
+                },
+            )
 
         return (
             thumb_xxs_filename,
@@ -437,163 +391,38 @@ def save_media_item(file, path):
         )
 
     elif type == "video":
-        thumb_filename = unique_filename + "_thumb" + ".jpeg"
-        video_poster_filename = unique_filename + "_poster" + ".jpeg"
-        file_extension = ".webm"
-        filepath = os.path.join(path, filename)
-        # save a copy to work with
-        with open(filepath, "wb") as fh:
-            fh.write(base64.b64decode(base64_string))
-
-        video_info = FFprobe(
-            executable="/usr/bin/ffprobe",
-            inputs={filepath: None},
-            global_options=[
-                "-v",
-                "quiet",
-                "-print_format",
-                "json",
-                "-show_format",
-                "-show_streams",
-            ],
-        ).run(stdout=subprocess.PIPE)
-        video_info = json.loads(video_info[0].decode("utf-8"))
-
-        duration = int(float(video_info["format"]["duration"]))
-
-        if duration / 60 > 20:  # in minutes
-            raise exc.InvalidAPIRequest(
-                "Video must be shorter than 20 minutes")
+        # transcoded from the upload as it was sent
+        upload_filename = unique_filename + "_upload"
+        shutil.move(upload_path, os.path.join(path, upload_filename))
 
-        width = int(video_info["streams"][0]["width"])
-        height = int(video_info["streams"][0]["height"])
+        try:
+            width, height, duration = transcoding.probe_video(
+                os.path.join(path, upload_filename)
+            )
+        except Exception:
+            os.remove(os.path.join(path, upload_filename))
+            raise exc.InvalidAPIRequest("Couldn't read video")
 
-        # create thumbnails
-        thumb_width, thumb_height = get_new_video_dimensions(
-            width, height, max_width=512, max_height=512
-        )
-        from pmapi.celery_tasks import get_video_thumbnail, run_video_conversion
-
-        get_video_thumbnail(
-            input_filepath=filepath,
-            thumb_out_filepath=os.path.join(path, thumb_filename),
-            poster_out_filepath=os.path.join(path, video_poster_filename),
-            thumb_height=thumb_height,
-            thumb_width=thumb_width,
-        )
+        if duration > transcoding.MAX_DURATION:
+            os.remove(os.path.join(path, upload_filename))
+            raise exc.InvalidAPIRequest(
+                "Video must be shorter than 20 minutes")
 
-        # create lowres webm
-        lowres_width, lowres_height = get_new_video_dimensions(
-            width, height, max_width=854, max_height=480
-        )
-        video_low_filename = unique_filename + "_v_low" + file_extension
-
-        run_video_conversion.delay(
-            input_filepath=filepath,
-            output_filepath=os.path.join(path, video_low_filename),
-            min_bitrate=400,
-            target_bitrate=600,
-            max_bitrate=800,
-            width=lowres_width,
-            height=lowres_height,
-        )
+        filenames = transcoding.video_filenames(unique_filename, width, height)
 
-        if (width >= 1920 and height >= 1080) or (height >= 1920 and width >= 1080):
-            midres_width, midres_height = get_new_video_dimensions(
-                width, height, max_width=1920, max_height=1080
-            )
-            video_med_filename = unique_filename + "_v_med" + file_extension
-
-            run_video_conversion.delay(
-                input_filepath=filepath,
-                output_filepath=os.path.join(path, video_med_filename),
-                min_bitrate=600,
-                target_bitrate=1000,
-                max_bitrate=1200,
-                width=midres_width,
-                height=midres_height,
-            )
-            # save 4k copy
-            if (width >= 3840 and height >= 2160) or (height >= 3840 and width >= 2160):
-                highres_width, highres_height = get_new_video_dimensions(
-                    width, height, max_width=3840, max_height=2160
-                )
-                video_high_filename = unique_filename + "_v_high" + file_extension
-                tasks.run_video_conversion.delay(
-                    input_filepath=filepath,
-                    output_filepath=os.path.join(path, video_high_filename),
-                    min_bitrate=1000,
-                    target_bitrate=1500,
-                    max_bitrate=2000,
-                    width=highres_width,
-                    height=highres_height,
-                )
+        if not current_app.config["MEDIA_RENDITIONS_ASYNC"]:
+            transcoding.transcode_video(path, filenames, width, height, duration)
 
         return (
             None,
             None,
-            thumb_filename,
+            filenames["thumb_filename"],
             None,
             None,
-            video_low_filename,
-            video_med_filename,
-            video_high_filename,
-            video_poster_filename,
-            duration,
+            filenames["video_low_filename"],
+            filenames.get("video_med_filename"),
+            filenames.get("video_high_filename"),
+            filenames["video_poster_filename"],
+            int(duration),
             "video",
         )
-
-    else:
-        flash("No selected file")
-        return None, None, None, None, None, None, None
-
-
-def get_new_video_dimensions(width, height, max_width, max_height):
-    width_ratio = max_width / width
-    height_ratio = max_height / height
-    # is it a portrait video?
-    if height > width:
-        width_ratio = max_height / width
-        height_ratio = max_width / height
-
-    best_ratio = min(width_ratio, height_ratio)
-    new_width = width * best_ratio
-    new_height = height * best_ratio
-
-    return int(new_width), int(new_height)
-
-
-def download_image_as_base64(url: str) -> Optional[str]:
-    """
-    Download an image from a given URL and convert it to a base64-encoded string.
-    
-    :param url: URL of the image to download
-    :return: Base64 encoded image string or None if download fails
-    """
-    try:
-        # Send a GET request to download the image
-        response = requests.get(url, timeout=10)
-        
-        # Raise an exception for bad status codes
-        response.raise_for_status()
-        
-        # Check if the content is an image
-        content_type = response.headers.get('Content-Type', '').lower()
-        if not content_type.startswith('image/'):
-            logging.warning(f"URL did not return an image. Content-Type: {content_type}")
-            return None
-        
-        # Encode the image content to base64
-        base64_image = base64.b64encode(response.content).decode('utf-8')
-        
-        # Create a data URI with the appropriate MIME type
-        data_uri = f"data:{content_type};base64,{base64_image}"
-        
-        return data_uri
-    
-    except requests.RequestException as e:
-        logging.error(f"Error downloading image from {url}: {e}")
-        return None
-    except Exception as e:
-        logging.error(f"Unexpected error processing image from {url}: {e}")
-        return None
\ No newline at end of file
@@ -24,7 +24,10 @@ media_item_downvotes = db.Table(
 
 
 class MediaItem(db.Model):
-    __versioned__ = {'versioning_relations': ['event', 'event_date', 'artist']}
+    __versioned__ = {
+        'versioning_relations': ['event', 'event_date', 'artist'],
+        'exclude': ['status', 'progress'],
+    }
     __tablename__ = "media_items"
     id = db.Column(db.Integer, primary_key=True)
     # can hold flags such as isLineupImage or isEventLogo
@@ -53,6 +56,11 @@ class MediaItem(db.Model):
     video_high_filename = db.Column(db.String, default=None, nullable=True)
     video_poster_filename = db.Column(db.String, default=None, nullable=True)
     duration = db.Column(db.Integer)  # in seconds
+    # processing while the renditions are written (see renditions.py, transcoding.py)
+    status = db.Column(
+        db.String(20), default="ready", server_default="ready", nullable=False)
+    # percent of a video transcoded
+    progress = db.Column(db.SmallInteger, nullable=True)
     
     review_id = db.Column(db.Integer, db.ForeignKey("event_reviews.id", name='fk_media_items_review_id'))
     review = db.relationship(
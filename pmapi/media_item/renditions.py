@@ -0,0 +1,109 @@
+"""
+renditions.py
+- the resized WebP copies of uploaded images.
+  An upload is written as it is and its media item stays "processing"
+  until the process_media_renditions celery task has written every
+  size, so the request doesn't wait for the encodes and the items of
+  one submission are spread over the celery worker processes.
+  Each size is resized from the next larger one, not from the original.
+"""
+
+import logging
+import os
+
+from flask import current_app
+from PIL import Image
+
+from pmapi.extensions import db
+
+from .model import MediaItem
+from .schemas import generate_local_filepath
+
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+
+# (column, max width/height) largest first, None keeps the original size
+IMAGE_RENDITIONS = (
+    ("image_filename", None),
+    ("image_med_filename", 1024),
+    ("thumb_filename", 512),
+    ("thumb_xs_filename", 256),
+    ("thumb_xxs_filename", 64),
+)
+
+
+def upload_filename(image_filename):
+    """The upload an image's renditions are made from"""
+    return os.path.splitext(image_filename)[0] + "_upload"
+
+
+def initial_status(type):
+    if type in ("image", "video") and current_app.config["MEDIA_RENDITIONS_ASYNC"]:
+        return PROCESSING
+    return READY
+
+
+def verify_image(path):
+    """Raises if `path` isn't an image Pillow can read, without decoding it"""
+    with Image.open(path) as img:
+        img.verify()
+
+
+def render_image(upload_path, outputs):
+    """Writes WebP renditions of an image.
+    :param list outputs: [(path, max size)] largest first
+    """
+    with Image.open(upload_path) as img:
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        for path, size in outputs:
+            if size:
+                # in place, the next size starts from this one
+                img.thumbnail((size, size), Image.LANCZOS)
+            img.save(path, "WEBP")
+
+
+def render_renditions(directory, filenames):
+    """Renders the renditions of an upload saved in `directory`.
+    :param dict filenames: {column: filename} of IMAGE_RENDITIONS
+    """
+    upload_path = os.path.join(directory, upload_filename(filenames["image_filename"]))
+    try:
+        render_image(
+            upload_path,
+            [
+                (os.path.join(directory, filenames[column]), size)
+                for column, size in IMAGE_RENDITIONS
+            ],
+        )
+    finally:
+        # a failed item isn't rendered again
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+
+def process_media_item(media_item_id):
+    """Writes the renditions of a processing media item"""
+    item = MediaItem.query.get(media_item_id)
+    if item is None or item.status != PROCESSING:
+        return
+
+    directory = os.path.dirname(generate_local_filepath(item, item.image_filename))
+    try:
+        render_renditions(
+            directory,
+            {column: getattr(item, column) for column, size in IMAGE_RENDITIONS},
+        )
+        item.status = READY
+    except Exception:
+        logging.exception("Rendering media item %s failed", media_item_id)
+        item.status = FAILED
+    db.session.commit()
+
+
+def schedule_renditions(media_item_ids):
+    from pmapi.celery_tasks import process_media_renditions
+
+    for media_item_id in media_item_ids:
+        process_media_renditions.delay(media_item_id)
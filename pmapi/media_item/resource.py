@@ -1,4 +1,4 @@
-from flask import Blueprint
+from flask import Blueprint, request
 
 from marshmallow import fields
 from flask_apispec import doc
@@ -9,6 +9,8 @@ from flask_login import login_required
 from .schemas import MediaItemSchema
 from . import permissions as media_item_permissions
 import pmapi.media_item.controllers as media_items
+from pmapi import exceptions as exc
+from . import uploads
 
 per_page = 20
 
@@ -41,6 +43,54 @@ class MediaItemResource(MethodResource):
         return media_items.delete_item_by_id(id)
 
 
+@doc(tags=["albums"])
+class MediaUploadResource(MethodResource):
+    @doc(
+        summary="Upload a media file.",
+        description="""Streams an image or video to the server. Send it as the
+        multipart field "file", or as the request body with its Content-Type.
+        Returns an uploadId to reference the file in the media items of an event,
+        date, review or artist instead of a base64File.""",
+    )
+    @login_required
+    def post(self):
+        file = request.files.get("file")
+        if file:
+            stream, mimetype = file.stream, file.mimetype
+        elif request.mimetype and not request.mimetype.startswith("multipart/"):
+            stream, mimetype = request.stream, request.mimetype
+        else:
+            raise exc.InvalidAPIRequest("file required")
+
+        uploads.remove_stale_uploads()
+        upload_id, path, mimetype = uploads.save_upload(
+            uploads.read_chunks(stream), mimetype
+        )
+        return {"uploadId": upload_id, "mimeType": mimetype}, 201
+
+
+@doc(tags=["albums"])
+class MediaItemStatusResource(MethodResource):
+    @doc(
+        summary="Get the processing status of an item.",
+        description="""Status is processing while the renditions of an image or
+        video are written, then ready (or failed). progress is the percent of a
+        video transcoded. The urls are listed once the item is ready.""",
+        params={"id": {"description": "media item ID"}},
+    )
+    @marshal_with(MediaItemSchema(), code=200)
+    def get(self, id):
+        return media_items.get_media_item_or_404(id)
+
+
+media_blueprint.add_url_rule(
+    "/<id>/status", view_func=MediaItemStatusResource.as_view("MediaItemStatusResource")
+)
+
+media_blueprint.add_url_rule(
+    "/upload", view_func=MediaUploadResource.as_view("MediaUploadResource")
+)
+
 media_blueprint.add_url_rule(
     "/<id>", view_func=MediaItemResource.as_view("MediaItemResource")
 )
@@ -9,6 +9,7 @@ from pprint import pprint
 @ts_interface
 class MediaItemUploadSchema(Schema):
     caption = fields.Str(required=False, allow_none=True)
+    uploadId = fields.Str(required=False) # file sent to /media/upload
     base64File = fields.Str(required=False) # upload image 
     url = fields.Str(required=False) # or alternatively specify URL to get from
     mimeType = fields.Str(required=False)
@@ -25,6 +26,8 @@ class MediaItemSchema(Schema):
     duration = fields.Int()
     caption = fields.Str()
     type = fields.Str()
+    status = fields.Str()
+    progress = fields.Int()
     image_url = fields.Function(
         lambda obj: generate_filepath(obj, obj.image_filename)
         if obj.image_filename
@@ -73,6 +76,10 @@ class MediaItemSchema(Schema):
 
     @post_dump
     def remove_empty(self, data, **kwargs):
+        if data.get("status") in ("processing", "failed"):
+            # the files aren't written yet, or never will be, clients
+            # show a placeholder
+            data = {key: value for key, value in data.items() if not key.endswith("_url")}
         return {
             key: value for key, value in data.items()
             if value is not None and value != "" and value != []
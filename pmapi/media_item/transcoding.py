@@ -0,0 +1,223 @@
+"""
+transcoding.py
+- uploaded videos are transcoded by the transcode_video celery task,
+  routed to the "transcoding" queue so long ffmpeg runs don't hold up
+  the other tasks; its worker's --concurrency caps the parallel jobs.
+  One ffmpeg run decodes the upload once and writes every WebM
+  rendition, the thumbnail and the poster. Its -progress output is
+  saved on the media item, see GET /media/<id>/status.
+"""
+
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+
+from flask import current_app
+
+from pmapi.extensions import db
+
+from .model import MediaItem
+from .renditions import FAILED, PROCESSING, READY
+from .schemas import generate_local_filepath
+
+FFMPEG = "/usr/bin/ffmpeg"
+FFPROBE = "/usr/bin/ffprobe"
+EXTENSION = ".webm"
+
+# (column, suffix, max width, max height, (min, target, max) kbit/s)
+# a rendition is made when the upload is at least as large as its box,
+# the first one always
+VIDEO_RENDITIONS = (
+    ("video_low_filename", "_v_low", 854, 480, (400, 600, 800)),
+    ("video_med_filename", "_v_med", 1920, 1080, (600, 1000, 1200)),
+    ("video_high_filename", "_v_high", 3840, 2160, (1000, 1500, 2000)),
+)
+THUMBNAIL_SIZE = 512
+# seconds into the video of the thumbnail and poster frame
+STILL_TIME = 1.0
+# seconds between progress updates written to the db
+PROGRESS_INTERVAL = 2
+MAX_DURATION = 20 * 60
+
+
+def upload_filename(video_low_filename):
+    """The upload a video's renditions are made from"""
+    return video_low_filename[: -len(VIDEO_RENDITIONS[0][1] + EXTENSION)] + "_upload"
+
+
+def fit(width, height, max_width, max_height):
+    """The largest even size with the aspect ratio of width x height
+    inside max_width x max_height, never upscaled"""
+    ratio = min(1, max_width / width, max_height / height)
+    return int(width * ratio) // 2 * 2, int(height * ratio) // 2 * 2
+
+
+def probe_video(path):
+    """Returns the width, height and duration (seconds) of a video"""
+    output = subprocess.run(
+        [
+            FFPROBE, "-v", "quiet", "-print_format", "json",
+            "-show_format", "-show_streams", path,
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    info = json.loads(output.decode("utf-8"))
+    stream = next(s for s in info["streams"] if s.get("codec_type") == "video")
+    return (
+        int(stream["width"]),
+        int(stream["height"]),
+        float(info["format"]["duration"]),
+    )
+
+
+def video_filenames(unique_filename, width, height):
+    """{column: filename} of the files transcoded from a width x height video"""
+    filenames = {
+        "thumb_filename": unique_filename + "_thumb.jpeg",
+        "video_poster_filename": unique_filename + "_poster.jpeg",
+    }
+    long_side, short_side = max(width, height), min(width, height)
+    for i, (column, suffix, max_width, max_height, bitrates) in enumerate(
+        VIDEO_RENDITIONS
+    ):
+        if i == 0 or (long_side >= max_width and short_side >= max_height):
+            filenames[column] = unique_filename + suffix + EXTENSION
+    return filenames
+
+
+def ffmpeg_arguments(source, directory, filenames, width, height, duration):
+    """One ffmpeg run writing `filenames` from a single decode of `source`"""
+    renditions = [r for r in VIDEO_RENDITIONS if filenames.get(r[0])]
+    still_time = min(STILL_TIME, duration / 2)
+    thumb_width, thumb_height = fit(width, height, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+
+    graph = ["[0:v]split={}{}".format(
+        len(renditions) + 1, "".join("[s{}]".format(i) for i in range(len(renditions) + 1))
+    )]
+    for i, (column, suffix, max_width, max_height, bitrates) in enumerate(renditions):
+        # portrait videos fit the box turned on its side
+        if height > width:
+            max_width, max_height = max_height, max_width
+        graph.append("[s{}]scale={}:{},setsar=1[v{}]".format(
+            i, *fit(width, height, max_width, max_height), i
+        ))
+    graph.append(
+        "[s{}]trim=start={},split=2[still][poster];[still]scale={}:{}[thumb]".format(
+            len(renditions), still_time, thumb_width, thumb_height
+        )
+    )
+
+    arguments = [
+        FFMPEG, "-hide_banner", "-nostats", "-y",
+        "-threads", str(current_app.config["VIDEO_TRANSCODE_THREADS"]),
+        "-i", source,
+        "-filter_complex", ";".join(graph),
+    ]
+    for i, (column, suffix, max_width, max_height, bitrates) in enumerate(renditions):
+        min_bitrate, target_bitrate, max_bitrate = bitrates
+        arguments += [
+            "-map", "[v{}]".format(i), "-map", "0:a?",
+            "-c:v", "libvpx-vp9",
+            "-b:v", "{}k".format(target_bitrate),
+            "-minrate", "{}k".format(min_bitrate),
+            "-maxrate", "{}k".format(max_bitrate),
+            "-quality", "good", "-speed", "4",
+            "-c:a", "libvorbis",
+            os.path.join(directory, filenames[column]),
+        ]
+    for label, column in (("thumb", "thumb_filename"), ("poster", "video_poster_filename")):
+        arguments += [
+            "-map", "[{}]".format(label), "-frames:v", "1",
+            os.path.join(directory, filenames[column]),
+        ]
+    return arguments + ["-progress", "pipe:1"]
+
+
+def parse_progress(lines, duration):
+    """Yields the percentage done for each block of ffmpeg -progress output"""
+    out_time = 0
+    for line in lines:
+        key, _, value = line.strip().partition("=")
+        # out_time_ms is in microseconds too
+        if key in ("out_time_us", "out_time_ms") and value.isdigit():
+            out_time = int(value) / 1000000
+        elif key == "progress":
+            if value == "end":
+                yield 100
+            elif duration:
+                yield min(99, int(out_time * 100 / duration))
+
+
+def transcode_video(directory, filenames, width, height, duration, on_progress=None):
+    """Writes the files of `filenames` from the upload saved in `directory`,
+    then removes the upload, whether it worked or not.
+    :param dict filenames: {column: filename} from video_filenames
+    :param on_progress: called with the percentage done
+    """
+    source = os.path.join(directory, upload_filename(filenames["video_low_filename"]))
+    arguments = ffmpeg_arguments(source, directory, filenames, width, height, duration)
+    try:
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
+                arguments, stdout=subprocess.PIPE, stderr=stderr, universal_newlines=True
+            )
+            for percent in parse_progress(process.stdout, duration):
+                if on_progress:
+                    on_progress(percent)
+            if process.wait() != 0:
+                stderr.seek(0)
+                raise RuntimeError(
+                    "ffmpeg exited with {}: {}".format(
+                        process.returncode, stderr.read()[-2000:].decode("utf-8", "replace")
+                    )
+                )
+    finally:
+        # a failed item isn't transcoded again
+        if os.path.exists(source):
+            os.remove(source)
+
+
+def transcode_media_item(media_item_id):
+    """Transcodes a processing video media item"""
+    item = MediaItem.query.get(media_item_id)
+    if item is None or item.status != PROCESSING:
+        return
+
+    directory = os.path.dirname(generate_local_filepath(item, item.thumb_filename))
+    filenames = {
+        column: getattr(item, column)
+        for column in ["thumb_filename", "video_poster_filename"]
+        + [r[0] for r in VIDEO_RENDITIONS]
+    }
+    last_update = 0
+
+    def save_progress(percent):
+        nonlocal last_update
+        if time.monotonic() - last_update >= PROGRESS_INTERVAL:
+            last_update = time.monotonic()
+            item.progress = percent
+            db.session.commit()
+
+    source = os.path.join(directory, upload_filename(item.video_low_filename))
+    try:
+        width, height, duration = probe_video(source)
+        transcode_video(directory, filenames, width, height, duration, save_progress)
+        item.status = READY
+        item.progress = 100
+    except Exception:
+        logging.exception("Transcoding media item %s failed", media_item_id)
+        item.status = FAILED
+        if os.path.exists(source):
+            os.remove(source)
+    db.session.commit()
+
+
+def schedule_transcoding(media_item_ids):
+    from pmapi.celery_tasks import transcode_video as transcode_video_task
+
+    for media_item_id in media_item_ids:
+        transcode_video_task.delay(media_item_id)
@@ -0,0 +1,172 @@
+"""
+uploads.py
+- media files are streamed to MEDIA_UPLOAD_TMP_FOLDER in chunks before
+  they're added to an item, so memory doesn't grow with the file.
+  A media item payload references its file with one of:
+  uploadId, a file sent to POST /media/upload
+  url, downloaded by the api
+  base64File, a data uri in the json body (kept for older clients)
+"""
+
+import base64
+import mimetypes
+import os
+import re
+import time
+import uuid
+
+import requests
+from flask import current_app
+
+from pmapi import exceptions as exc
+
+CHUNK_SIZE = 64 * 1024
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}\.[0-9a-z]+$")
+DOWNLOAD_TIMEOUT = 10
+DOWNLOAD_HEADERS = {
+    "Accept": "image/*",
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:95.0) Gecko/20100101 Firefox/95.0",
+}
+
+VIDEO_MIMETYPES = {
+    "video/mp4", "video/mpeg", "video/x-msvideo",
+    "video/ogg", "video/webm", "video/3gpp", "video/avi"
+}
+IMAGE_MIMETYPES = {
+    "image/png", "image/gif", "image/jpeg",
+    "image/jpg", "image/bmp", "image/webp"
+}
+
+mimetypes.add_type("image/webp", ".webp")  # Ensure WebP is recognized
+mimetypes.add_type("video/3gpp", ".3gp")
+# the upload id keeps the extension, aliases get the extension of the type
+MIMETYPE_ALIASES = {"image/jpg": "image/jpeg", "video/avi": "video/x-msvideo"}
+
+
+def upload_path(upload_id):
+    return os.path.join(current_app.config["MEDIA_UPLOAD_TMP_FOLDER"], upload_id)
+
+
+def save_upload(chunks, mimetype):
+    """Writes `chunks` (bytes) to a new upload.
+    Returns the upload id, its path and mimetype."""
+    mimetype = (mimetype or "").split(";")[0].strip().lower()
+    mimetype = MIMETYPE_ALIASES.get(mimetype, mimetype)
+    if mimetype not in IMAGE_MIMETYPES | VIDEO_MIMETYPES:
+        raise exc.InvalidAPIRequest("Unsupported file type {}".format(mimetype))
+
+    extension = mimetypes.guess_extension(mimetype)
+    upload_id = uuid.uuid4().hex + extension
+    path = upload_path(upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    max_size = current_app.config["MEDIA_UPLOAD_MAX_SIZE"]
+    size = 0
+    try:
+        with open(path, "wb") as fh:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise exc.InvalidAPIRequest("File is too large")
+                fh.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    if size == 0:
+        os.remove(path)
+        raise exc.InvalidAPIRequest("file required")
+    return upload_id, path, mimetype
+
+
+def read_chunks(stream):
+    return iter(lambda: stream.read(CHUNK_SIZE), b"")
+
+
+def get_upload(upload_id):
+    """Returns the path and mimetype of an upload"""
+    if not upload_id or not UPLOAD_ID_PATTERN.match(upload_id):
+        raise exc.InvalidAPIRequest("Invalid uploadId")
+    path = upload_path(upload_id)
+    if not os.path.exists(path):
+        raise exc.InvalidAPIRequest("Upload {} not found".format(upload_id))
+    return path, mimetypes.guess_type(upload_id)[0]
+
+
+def download_upload(url):
+    """Streams a remote image to a new upload"""
+    try:
+        with requests.get(
+            url, headers=DOWNLOAD_HEADERS, timeout=DOWNLOAD_TIMEOUT, stream=True
+        ) as response:
+            response.raise_for_status()
+            mimetype = response.headers.get("Content-Type", "").lower()
+            if not mimetype.startswith("image/"):
+                raise exc.InvalidAPIRequest(
+                    "URL did not return an image. Content-Type: {}".format(mimetype)
+                )
+            upload_id, path, mimetype = save_upload(
+                response.iter_content(CHUNK_SIZE), mimetype
+            )
+    except requests.RequestException:
+        raise exc.InvalidAPIRequest("Couldn't fetch image from URL")
+    return path, mimetype
+
+
+def decode_base64_upload(data_uri):
+    """Decodes a data uri to a new upload, a chunk at a time"""
+    start = data_uri.find(";base64,")
+    if not data_uri.startswith("data:") or start == -1:
+        raise exc.InvalidAPIRequest("Invalid base64File")
+    mimetype = data_uri[5:start]
+    start += len(";base64,")
+    step = CHUNK_SIZE // 3 * 4
+
+    def chunks():
+        # line wrapped base64 is accepted, the characters left over from
+        # a multiple of 4 (which decodes to whole bytes) carry over
+        leftover = ""
+        for offset in range(start, len(data_uri), step):
+            encoded = leftover + "".join(data_uri[offset: offset + step].split())
+            whole = len(encoded) - len(encoded) % 4
+            encoded, leftover = encoded[:whole], encoded[whole:]
+            if encoded:
+                yield decode(encoded)
+        if leftover:
+            yield decode(leftover)
+
+    def decode(encoded):
+        try:
+            return base64.b64decode(encoded)
+        except ValueError:
+            raise exc.InvalidAPIRequest("Invalid base64File")
+
+    upload_id, path, mimetype = save_upload(chunks(), mimetype)
+    return path, mimetype
+
+
+def resolve_upload(item):
+    """Returns the path and mimetype of the file of a media item payload"""
+    if item.get("uploadId"):
+        return get_upload(item["uploadId"])
+    if item.get("base64File"):
+        return decode_base64_upload(item["base64File"])
+    if item.get("url"):
+        return download_upload(item["url"])
+    raise exc.InvalidAPIRequest("file required")
+
+
+def remove_stale_uploads():
+    """Removes the uploads that were never added to an item"""
+    folder = current_app.config["MEDIA_UPLOAD_TMP_FOLDER"]
+    expires = time.time() - current_app.config["MEDIA_UPLOAD_TMP_MAX_AGE"]
+    if not os.path.isdir(folder):
+        return 0
+    removed = 0
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.stat().st_mtime < expires:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
@@ -31,3 +31,29 @@ class FlaskUsage(db.Model):
     datetime = db.Column(db.DateTime) # timestamp without time zone maps to DateTime
     username = db.Column(db.String(128))
     track_var = db.Column(db.String(128))
+
+
+def _usage_summary_table(name, key, length):
+    return db.Table(
+        "flask_usage_{}".format(name),
+        db.Column("date", db.DateTime, primary_key=True),
+        db.Column(key, db.String(length)),
+        db.Column("hits", db.Integer),
+        db.Column("transfer", db.Integer),
+    )
+
+
+# hits and bytes sent per hour, day and month, written by pmapi.metrics.usage
+USAGE_SUMMARY_KEYS = (
+    ("url", 512),
+    ("remote", 128),
+    ("useragent", 512),
+    ("language", 128),
+    ("server", 128),
+)
+USAGE_SUMMARY_PERIODS = ("hourly", "daily", "monthly")
+usage_summary_tables = {
+    (key, period): _usage_summary_table("{}_{}".format(key, period), key, length)
+    for key, length in USAGE_SUMMARY_KEYS
+    for period in USAGE_SUMMARY_PERIODS
+}
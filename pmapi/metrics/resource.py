@@ -7,9 +7,16 @@ from flask_apispec import MethodResource
 from flask_apispec import use_kwargs
 from flask_login import login_required
 from pmapi.common.controllers import paginated_view_args
-from .schemas import UrlSummarySortableSchema, CountryVisitorSummarySchema
+from .schemas import (
+    UrlSummarySortableSchema,
+    CountryVisitorSummarySchema,
+    QueryEmbeddingCacheSchema,
+    UsageBufferSchema,
+)
 from . import permissions as metrics_permissions
 import pmapi.metrics.controllers as metrics
+from pmapi.metrics.usage import get_usage_stats
+from pmapi.services.query_embeddings import get_query_embedding_stats
 
 from pmapi.extensions import tracker
 
@@ -64,4 +71,40 @@ class CountryMetricResource(MethodResource):
 
 metrics_blueprint.add_url_rule(
     "/countries", view_func=CountryMetricResource.as_view("CountryMetricResource")
-)
\ No newline at end of file
+)
+
+
+@doc(tags=["metrics"])
+class QueryEmbeddingCacheMetricResource(MethodResource):
+    @doc(
+        summary="Get the hit rate of the search query embedding cache",
+    )
+    @marshal_with(QueryEmbeddingCacheSchema(), code=200)
+    @login_required
+    @metrics_permissions.view_metrics
+    def get(self):
+        return get_query_embedding_stats()
+
+
+metrics_blueprint.add_url_rule(
+    "/query_embeddings",
+    view_func=QueryEmbeddingCacheMetricResource.as_view("QueryEmbeddingCacheMetricResource"),
+)
+
+
+@doc(tags=["metrics"])
+class UsageBufferMetricResource(MethodResource):
+    @doc(
+        summary="Get the records written and dropped by the buffered usage logging",
+    )
+    @marshal_with(UsageBufferSchema(), code=200)
+    @login_required
+    @metrics_permissions.view_metrics
+    def get(self):
+        return get_usage_stats()
+
+
+metrics_blueprint.add_url_rule(
+    "/usage",
+    view_func=UsageBufferMetricResource.as_view("UsageBufferMetricResource"),
+)
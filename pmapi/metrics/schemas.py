@@ -50,3 +50,26 @@ class CountryVisitorSummarySchema(Schema):
     )
     start_time = fields.DateTime(required=True, description="The start of the time period for the summary (ISO 8601 format).")
     end_time = fields.DateTime(required=True, description="The end of the time period for the summary (ISO 8601 format).")
+
+
+class QueryEmbeddingCacheSchema(Schema):
+    """
+    Marshmallow schema for the lookups of the search query embedding cache.
+    """
+    memory_hits = fields.Int(required=True, description="Lookups answered by the in-process cache of a worker.")
+    table_hits = fields.Int(required=True, description="Lookups answered by the query_embeddings table.")
+    misses = fields.Int(required=True, description="Lookups that had to generate the embedding.")
+    hit_rate = fields.Float(allow_none=True, description="The share of lookups that were hits, null before the first lookup.")
+    cached_queries = fields.Int(required=True, description="The number of queries in the query_embeddings table.")
+    per_process = fields.Bool(required=True, description="True when the counts are only those of the worker that answered, the cache isn't shared.")
+
+
+class UsageBufferSchema(Schema):
+    """
+    Marshmallow schema for the buffered request usage logging.
+    """
+    written = fields.Int(required=True, description="Usage records written to flask_usage.")
+    dropped = fields.Int(required=True, description="Usage records dropped because a worker's buffer was full.")
+    failed = fields.Int(required=True, description="Usage records whose write failed, they're put back in the buffer.")
+    buffered = fields.Int(required=True, description="Usage records waiting in the buffer of the worker that answered.")
+    per_process = fields.Bool(required=True, description="True when the counts are only those of the worker that answered, the cache isn't shared.")
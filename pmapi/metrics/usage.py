@@ -0,0 +1,283 @@
+"""
+usage.py
+- buffers the request usage recorded by the tracker in the worker
+  process. A tracked request only appends a compact record to a bounded
+  buffer, a flusher thread writes the buffered records every
+  USAGE_FLUSH_INTERVAL seconds, or once USAGE_FLUSH_SIZE are waiting, in
+  one transaction: one executemany INSERT into flask_usage and one upsert
+  per summary table (the hourly, daily and monthly url, remote, user
+  agent, language and server hits the summarization hooks wrote on every
+  request). Records that fail to be written go back to the buffer. When
+  the buffer is full the oldest records are dropped and counted, see
+  GET /metrics/usage: the counts are kept in the cache when it's shared,
+  otherwise per process.
+"""
+
+import json
+import threading
+from collections import Counter, deque, namedtuple
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import String, func
+from sqlalchemy.dialects.postgresql import insert
+
+from pmapi.common.flusher import Flusher
+from pmapi.config import BaseConfig
+from pmapi.extensions import cache, cache_is_shared, db
+
+from .model import FlaskUsage, usage_summary_tables
+
+STATS_KEY_PREFIX = "usage:stats:"
+STATS = ("written", "dropped", "failed")
+
+UsageRecord = namedtuple(
+    "UsageRecord",
+    [
+        "url", "user_agent", "ua_browser", "ua_language", "ua_platform",
+        "ua_version", "blueprint", "view_args", "status", "remote_addr",
+        "xforwardedfor", "authorization", "ip_info", "path", "speed", "date",
+        "username", "track_var", "server_name", "content_length",
+    ],
+)
+
+# the record field each summary counts hits of
+SUMMARY_FIELDS = {
+    "url": "url",
+    "remote": "remote_addr",
+    "useragent": "user_agent",
+    "language": "ua_language",
+    "server": "server_name",
+}
+
+
+class UsageBuffer:
+    """The usage records of a process, the oldest is dropped when it's full"""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=size)
+        self._ready = threading.Event()
+        self._dropped = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, record, flush_size):
+        with self._lock:
+            if len(self._records) == self._records.maxlen:
+                self._dropped += 1
+            self._records.append(record)
+            if len(self._records) >= flush_size:
+                self._ready.set()
+
+    def wait(self, timeout):
+        """Waits until a flush is due"""
+        self._ready.wait(timeout)
+        self._ready.clear()
+
+    def drain(self):
+        """Returns the buffered records and the number dropped since the last drain"""
+        with self._lock:
+            records = list(self._records)
+            self._records.clear()
+            dropped, self._dropped = self._dropped, 0
+        return records, dropped
+
+    def requeue(self, records):
+        """Puts back records that weren't written, ahead of the newer ones.
+        The oldest are dropped if they no longer fit."""
+        with self._lock:
+            records = list(records) + list(self._records)
+            overflow = max(len(records) - self._records.maxlen, 0)
+            self._dropped += overflow
+            self._records.clear()
+            self._records.extend(records[overflow:])
+
+
+buffer = UsageBuffer(BaseConfig.USAGE_BUFFER_SIZE)
+
+# the stats of this process, when the cache isn't shared
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def store_usage(data):
+    """The tracker storage, buffers the usage of a request"""
+    user_agent = data["user_agent"]
+    buffer.add(
+        UsageRecord(
+            url=data["url"],
+            user_agent=user_agent.string,
+            ua_browser=user_agent.browser,
+            ua_language=user_agent.language,
+            ua_platform=user_agent.platform,
+            ua_version=user_agent.version,
+            blueprint=data["blueprint"],
+            view_args=data["view_args"],
+            status=data["status"],
+            remote_addr=data["remote_addr"],
+            xforwardedfor=data["xforwardedfor"],
+            authorization=data["authorization"],
+            ip_info=data["ip_info"],
+            path=data["path"],
+            speed=data["speed"],
+            date=data["date"],
+            username=data["username"],
+            track_var=data["track_var"],
+            server_name=data["server_name"],
+            content_length=data["content_length"],
+        ),
+        current_app.config["USAGE_FLUSH_SIZE"],
+    )
+    if current_app.config["USAGE_FLUSH_INTERVAL"] == 0:
+        flush_usage()
+    else:
+        flusher.start(current_app._get_current_object())
+    return data
+
+
+def _record(stat, count):
+    if cache_is_shared():
+        cache.inc(STATS_KEY_PREFIX + stat, count)
+    else:
+        with _stats_lock:
+            _stats[stat] += count
+
+
+def get_usage_stats():
+    per_process = not cache_is_shared()
+    if per_process:
+        with _stats_lock:
+            counts = [_stats[stat] for stat in STATS]
+    else:
+        counts = cache.get_many(*[STATS_KEY_PREFIX + stat for stat in STATS])
+    stats = {stat: count or 0 for stat, count in zip(STATS, counts)}
+    stats["buffered"] = len(buffer)
+    stats["per_process"] = per_process
+    return stats
+
+
+def flush_usage():
+    """Writes the buffered usage, returns the number of records written."""
+    records, dropped = buffer.drain()
+    if dropped:
+        current_app.logger.warning(
+            "Dropped %s usage records, the buffer was full", dropped
+        )
+        _record("dropped", dropped)
+    if not records:
+        return 0
+    try:
+        write_usage(records)
+    except Exception:
+        _record("failed", len(records))
+        buffer.requeue(records)
+        raise
+    _record("written", len(records))
+    return len(records)
+
+
+flusher = Flusher("usage", "USAGE_FLUSH_INTERVAL", flush_usage, wait=buffer.wait)
+
+
+def _string_lengths(table):
+    return {
+        column.name: column.type.length
+        for column in table.columns
+        if isinstance(column.type, String) and column.type.length
+    }
+
+
+def _fit(row, lengths):
+    """Truncates the strings of a row to their columns, one long url
+    shouldn't fail the batch"""
+    for name, length in lengths.items():
+        if isinstance(row.get(name), str):
+            row[name] = row[name][:length]
+    return row
+
+
+def trim_time(time, period):
+    time = time.replace(minute=0, second=0, microsecond=0)
+    if period == "hourly":
+        return time
+    time = time.replace(hour=0)
+    if period == "daily":
+        return time
+    return time.replace(day=1)
+
+
+def usage_row(record, time):
+    return {
+        "url": record.url,
+        "ua_browser": record.ua_browser,
+        "ua_language": record.ua_language,
+        "ua_platform": record.ua_platform,
+        "ua_version": record.ua_version,
+        "blueprint": record.blueprint,
+        "view_args": json.dumps(record.view_args, ensure_ascii=False, default=str),
+        "status": record.status,
+        "remote_addr": record.remote_addr,
+        "xforwardedfor": record.xforwardedfor,
+        "authorization": record.authorization,
+        "ip_info": record.ip_info or None,
+        "path": record.path,
+        "speed": record.speed,
+        "datetime": time,
+        "username": record.username,
+        "track_var": json.dumps(record.track_var, ensure_ascii=False, default=str),
+    }
+
+
+def summarize(records, times, key, period):
+    """{date: [value, hits, transfer]} of a summary table.
+    The tables are keyed by date only, the value is the first seen."""
+    summary = {}
+    for record, time in zip(records, times):
+        date = trim_time(time, period)
+        if date not in summary:
+            summary[date] = [getattr(record, SUMMARY_FIELDS[key]), 0, 0]
+        summary[date][1] += 1
+        summary[date][2] += record.content_length or 0
+    return summary
+
+
+def write_usage(records):
+    times = [datetime.fromtimestamp(record.date) for record in records]
+    usage = FlaskUsage.__table__
+    lengths = _string_lengths(usage)
+    rows = [
+        _fit(usage_row(record, time), lengths) for record, time in zip(records, times)
+    ]
+
+    with db.engine.begin() as conn:
+        conn.execute(usage.insert(), rows)
+
+        for (key, period), table in usage_summary_tables.items():
+            lengths = _string_lengths(table)
+            summary = summarize(records, times, key, period)
+            upsert = insert(table).values(
+                [
+                    _fit(
+                        {"date": date, key: value, "hits": hits, "transfer": transfer},
+                        lengths,
+                    )
+                    for date, (value, hits, transfer) in summary.items()
+                ]
+            )
+            conn.execute(
+                upsert.on_conflict_do_update(
+                    index_elements=[table.c.date],
+                    set_={
+                        "hits": func.coalesce(table.c.hits, 0) + upsert.excluded.hits,
+                        "transfer": func.coalesce(table.c.transfer, 0)
+                        + upsert.excluded.transfer,
+                    },
+                )
+            )
+
+
+def flush_on_exit(app):
+    with app.app_context():
+        flush_usage()
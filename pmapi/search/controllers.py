@@ -3,62 +3,187 @@ from pmapi.extensions import db, activity_plugin
 from datetime import datetime
 from flask_login import current_user, login_user
 from sqlalchemy_continuum import version_class, transaction_class
-from sqlalchemy import cast, or_, and_, func, select, join
+from collections import defaultdict
+from sqlalchemy import String, cast, or_, and_, func, insert, literal, select, join, union_all
 from sqlalchemy.orm import with_expression
 from pmapi.event_date.model import EventDate
 from pmapi.event.model import Event
-from pmapi.event_tag.model import Tag
+from pmapi.event_tag.model import EventTag, Tag
 from pmapi.event_artist.model import Artist
-from pmapi.event_location.model import Country, Region, Locality
 import pmapi.user.controllers as users
 
+from .model import SearchTerm
+
 
 Activity = activity_plugin.activity_cls
 
 
+# suggestions returned per kind, in the order of the results
+SUGGESTION_LIMITS = (("tag", 3), ("artist", 3), ("event", 3))
+# shorter queries only match the start of terms
+MIN_SUBSTRING_LENGTH = 3
+
+
 def search(query):
-    """
-    experiment with this later
-    query_text = ""
-    for word in query_string.split():
-        # this is to formulate a query string like 'twisted:* frequncey:*'
-        if word == query_string.split()[-1]:
-            query_text = query_text + (str(word) + str(":*"))
-        else:
-            query_text = query_text + (str(word) + str(":* & "))
-    """
-    search = "%{}%".format(query)
-
-    tags = db.session.query(Tag).filter(Tag.tag.ilike(search)).all()[:3]
-    artists = db.session.query(Artist).filter(Artist.name.ilike(search)).all()[:3]
-    events = db.session.query(Event).filter(Event.name.ilike(search)).filter(Event.hidden == False).all()[:3]
-    countries = (
-        db.session.query(Country).filter(Country.long_name.ilike(search)).all()[:1]
-    )
-    regions = db.session.query(Region).filter(Region.full_name.ilike(search)).all()[:3]
-    localities = (
-        db.session.query(Locality).filter(Locality.full_name.ilike(search)).all()
-    )[:3]
+    """Suggestions for `query`, the most popular first.
+    All kinds are answered in one round trip from search_terms."""
+    query = (query or "").strip().lower()
+    if not query:
+        return {"results": []}
 
-    results = []
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    prefix_match = SearchTerm.normalized.like(escaped + "%")
+    if len(query) < MIN_SUBSTRING_LENGTH:
+        match = prefix_match
+    else:
+        match = SearchTerm.normalized.like("%" + escaped + "%")
 
-    for tag in tags:
-        results.append({"type": "tag", "result": tag.tag})
-    for artist in artists:
-        results.append({"type": "artist", "result": artist.name, "id": artist.id})
-    for event in events:
-        results.append({"type": "event", "result": event.name, "id": event.id})
-    """
-    for country in countries:
-        results.append(
-            {
-                "type": "country",
-                "result": country.long_name,
-            }
+    order = [prefix_match.desc(), SearchTerm.popularity.desc(), SearchTerm.normalized]
+    suggestions = union_all(
+        *[
+            select(
+                literal(position).label("position"),
+                prefix_match.label("prefix"),
+                SearchTerm.kind,
+                SearchTerm.key,
+                SearchTerm.term,
+                SearchTerm.popularity,
+                SearchTerm.normalized,
+            )
+            .where(SearchTerm.kind == kind, match)
+            .order_by(*order)
+            .limit(limit)
+            for position, (kind, limit) in enumerate(SUGGESTION_LIMITS)
+        ]
+    ).subquery()
+    rows = db.session.execute(
+        select(suggestions).order_by(
+            suggestions.c.position,
+            suggestions.c.prefix.desc(),
+            suggestions.c.popularity.desc(),
+            suggestions.c.normalized,
         )
-    for region in regions:
-        results.append({"type": "region", "result": region.full_name})
-    for locality in localities:
-        results.append({"type": "locality", "result": locality.full_name})
-    """
+    ).all()
+
+    results = []
+    for row in rows:
+        if row.kind == "tag":
+            results.append({"type": "tag", "result": row.term})
+        else:
+            results.append({"type": row.kind, "result": row.term, "id": int(row.key)})
     return {"results": results}
+
+
+def search_term_sources(keys=None):
+    """Selects of the (kind, key, term, normalized, popularity) rows
+    of search_terms, of all sources or only of `keys`"""
+    now = datetime.utcnow()
+    tags = (
+        select(
+            literal("tag"),
+            Tag.tag,
+            Tag.tag,
+            func.lower(Tag.tag),
+            func.count(EventTag.id),
+        )
+        .outerjoin(EventTag, EventTag.tag_id == Tag.tag)
+        .group_by(Tag.tag)
+    )
+    artists = select(
+        literal("artist"),
+        cast(Artist.id, String),
+        Artist.name,
+        func.lower(Artist.name),
+        func.coalesce(Artist.popularity, 0),
+    )
+    events = (
+        select(
+            literal("event"),
+            cast(Event.id, String),
+            Event.name,
+            func.lower(Event.name),
+            func.count(EventDate.id),
+        )
+        .outerjoin(
+            EventDate,
+            and_(
+                EventDate.event_id == Event.id,
+                EventDate.end >= now,
+                EventDate.cancelled != True,  # noqa: E712
+            ),
+        )
+        .where(Event.hidden == False)  # noqa: E712
+        .group_by(Event.id)
+    )
+    if keys is not None:
+        tags = tags.where(Tag.tag.in_(keys.get("tag", [])))
+        artists = artists.where(Artist.id.in_(keys.get("artist", [])))
+        events = events.where(Event.id.in_(keys.get("event", [])))
+    return {"tag": tags, "artist": artists, "event": events}
+
+
+def sync_search_terms(keys=None):
+    """Rewrites the search_terms rows of `keys` ({kind: [key]}),
+    or all of them. Returns the number of rows written."""
+    if keys is not None:
+        keys = {kind: list(values) for kind, values in keys.items() if values}
+    columns = [
+        SearchTerm.kind,
+        SearchTerm.key,
+        SearchTerm.term,
+        SearchTerm.normalized,
+        SearchTerm.popularity,
+    ]
+    written = 0
+    with db.engine.begin() as conn:
+        for kind, source in search_term_sources(keys).items():
+            if keys is not None and kind not in keys:
+                continue
+            delete = SearchTerm.__table__.delete().where(SearchTerm.kind == kind)
+            if keys is not None:
+                delete = delete.where(SearchTerm.key.in_([str(key) for key in keys[kind]]))
+            conn.execute(delete)
+            written += conn.execute(
+                insert(SearchTerm).from_select(columns, source)
+            ).rowcount
+    return written
+
+
+def refresh_search_term_popularity():
+    """Updates the popularity of the search_terms that are out of date,
+    an event's upcoming dates drop as they pass without a write.
+    Returns the number of rows updated."""
+    search_terms = SearchTerm.__table__
+    updated = 0
+    with db.engine.begin() as conn:
+        for kind, source in search_term_sources().items():
+            _, key, _, _, popularity = source.subquery().c
+            updated += conn.execute(
+                search_terms.update()
+                .where(
+                    search_terms.c.kind == kind,
+                    search_terms.c.key == key,
+                    search_terms.c.popularity != popularity,
+                )
+                .values(popularity=popularity)
+            ).rowcount
+    return updated
+
+
+def search_term_keys(instances):
+    """The {kind: {key}} of search_terms changed by `instances`"""
+    keys = defaultdict(set)
+    for instance in instances:
+        if isinstance(instance, Tag):
+            keys["tag"].add(instance.tag)
+        elif isinstance(instance, EventTag):
+            keys["tag"].add(instance.tag_id)
+        elif isinstance(instance, Artist):
+            keys["artist"].add(instance.id)
+        elif isinstance(instance, Event):
+            keys["event"].add(instance.id)
+        elif isinstance(instance, EventDate):
+            keys["event"].add(instance.event_id)
+    for values in keys.values():
+        values.discard(None)
+    return keys
@@ -0,0 +1,34 @@
+from sqlalchemy import Index
+
+from pmapi.extensions import db
+
+
+class SearchTerm(db.Model):
+    """Denormalized suggestions of /search, one row per tag, artist and
+    visible event (see search/controllers.py)"""
+
+    __tablename__ = "search_terms"
+    kind = db.Column(db.String(20), primary_key=True)
+    # tag name or artist/event id
+    key = db.Column(db.String, primary_key=True)
+    term = db.Column(db.String, nullable=False)
+    normalized = db.Column(db.String, nullable=False)
+    # tagged events, artist popularity or upcoming dates of the event
+    popularity = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        # substring matches
+        Index(
+            "idx_search_terms_normalized_trgm",
+            "normalized",
+            postgresql_using="gin",
+            postgresql_ops={"normalized": "gin_trgm_ops"},
+        ),
+        # prefix matches of short queries
+        Index(
+            "idx_search_terms_kind_normalized",
+            "kind",
+            "normalized",
+            postgresql_ops={"normalized": "text_pattern_ops"},
+        ),
+    )
@@ -29,7 +29,7 @@ class SearchResource(MethodResource):
     )
     @marshal_with(SearchSchema(), code=200)
     def get(self, **kwargs):
-        return search.search(kwargs.pop("query"))
+        return search.search(kwargs.pop("query", None))
 
 
 search_blueprint.add_url_rule(
@@ -1,7 +1,13 @@
+import asyncio
+import hashlib
+import time
+
+import aiohttp
 import requests
 from flask import current_app
 
 from pmapi.config import BaseConfig
+from pmapi.extensions import db
 
 
 def embeddings_enabled():
@@ -71,13 +77,41 @@ def build_event_embedding_text(name, description, tags_text=None, location_text=
     return "\n\n".join([part for part in parts if part])
 
 
-def _embedding_headers():
+def event_embedding_text(event):
+    return build_event_embedding_text(
+        event.name,
+        event.description,
+        tags_text=_event_tag_text(event),
+        location_text=_next_event_location_text(event),
+    )
+
+
+def embedding_text_hash(text, model=None):
+    """Hash of a text and the model embedding it, an embedding is stale
+    when either changes"""
+    model = model or BaseConfig.EMBEDDING_MODEL
+    return hashlib.sha256("{}\n{}".format(model, text).encode("utf-8")).hexdigest()
+
+
+def _embedding_headers(api_key=None):
     return {
-        "Authorization": "Bearer {}".format(BaseConfig.EMBEDDING_API_KEY),
+        "Authorization": "Bearer {}".format(api_key or BaseConfig.EMBEDDING_API_KEY),
         "Content-Type": "application/json",
     }
 
 
+def _check_dimensions(data):
+    if (
+        BaseConfig.EVENT_EMBEDDING_DIMENSIONS
+        and len(data) != BaseConfig.EVENT_EMBEDDING_DIMENSIONS
+    ):
+        raise ValueError(
+            "Embedding dimension mismatch. Expected {}, got {}.".format(
+                BaseConfig.EVENT_EMBEDDING_DIMENSIONS, len(data)
+            )
+        )
+
+
 def generate_embedding(text):
     if not embeddings_enabled() or not text or not text.strip():
         return None
@@ -96,37 +130,173 @@ def generate_embedding(text):
     )
     response.raise_for_status()
     data = response.json()["data"][0]["embedding"]
+    _check_dimensions(data)
 
-    if (
-        BaseConfig.EVENT_EMBEDDING_DIMENSIONS
-        and len(data) != BaseConfig.EVENT_EMBEDDING_DIMENSIONS
-    ):
-        raise ValueError(
-            "Embedding dimension mismatch. Expected {}, got {}.".format(
-                BaseConfig.EVENT_EMBEDDING_DIMENSIONS, len(data)
+    return data
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second, with bursts of `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def _post_embeddings(session, limiter, url, inputs, retries=3):
+    payload = {
+        "input": inputs,
+        "model": BaseConfig.EMBEDDING_MODEL,
+        "encoding_format": "float",
+    }
+    for attempt in range(retries + 1):
+        await limiter.acquire()
+        async with session.post(url, json=payload) as response:
+            if response.status == 429 or response.status >= 500:
+                if attempt == retries:
+                    response.raise_for_status()
+                retry_after = response.headers.get("Retry-After")
+                await asyncio.sleep(
+                    float(retry_after) if retry_after else 2 ** attempt
+                )
+                continue
+            response.raise_for_status()
+            data = (await response.json())["data"]
+            break
+
+    # the api returns the embeddings with the index of their input
+    embeddings = [None] * len(inputs)
+    for item in data:
+        _check_dimensions(item["embedding"])
+        embeddings[item["index"]] = item["embedding"]
+    return embeddings
+
+
+async def embed_texts(
+    texts,
+    url=None,
+    api_key=None,
+    batch_size=None,
+    concurrency=None,
+    requests_per_minute=None,
+):
+    """Embeds `texts` in batches over concurrent requests.
+    Identical texts are only sent once.
+    Returns {text: embedding}, texts of failed batches are missing.
+    """
+    url = url or BaseConfig.EMBEDDING_API_URL
+    batch_size = batch_size or BaseConfig.EMBEDDING_BATCH_SIZE
+    limiter = TokenBucket(
+        (requests_per_minute or BaseConfig.EMBEDDING_REQUESTS_PER_MINUTE) / 60.0,
+        capacity=concurrency or BaseConfig.EMBEDDING_CONCURRENCY,
+    )
+    semaphore = asyncio.Semaphore(concurrency or BaseConfig.EMBEDDING_CONCURRENCY)
+
+    unique_texts = list(dict.fromkeys(text for text in texts if text and text.strip()))
+    batches = [
+        unique_texts[i : i + batch_size]
+        for i in range(0, len(unique_texts), batch_size)
+    ]
+
+    async with aiohttp.ClientSession(
+        headers=_embedding_headers(api_key), timeout=aiohttp.ClientTimeout(total=60)
+    ) as session:
+
+        async def embed_batch(batch):
+            async with semaphore:
+                return await _post_embeddings(session, limiter, url, batch)
+
+        results = await asyncio.gather(
+            *[embed_batch(batch) for batch in batches], return_exceptions=True
+        )
+
+    embeddings = {}
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            current_app.logger.error(
+                "Failed to embed a batch of %s texts: %s", len(batch), result
             )
+            continue
+        embeddings.update(
+            (text, embedding)
+            for text, embedding in zip(batch, result)
+            if embedding is not None
         )
+    return embeddings
+
+
+def refresh_event_embeddings(events, force=False, **kwargs):
+    """Embeds a list of events and writes the vectors back in bulk.
+    Events whose embedding text hasn't changed since their embedding
+    was generated are skipped, unless `force`.
+    Returns (updated, skipped, failed) counts.
+    :param kwargs: passed to embed_texts
+    """
+    texts = {}
+    skipped = 0
+    for event in events:
+        text = event_embedding_text(event)
+        if (
+            not force
+            and event.search_embedding is not None
+            and event.search_embedding_hash == embedding_text_hash(text)
+        ):
+            skipped += 1
+            continue
+        texts[event.id] = text
+
+    if not texts or not embeddings_enabled():
+        return 0, skipped, len(texts)
+
+    embeddings = asyncio.run(embed_texts(list(texts.values()), **kwargs))
+
+    # bulk update, the embedding isn't versioned content
+    mappings = [
+        {
+            "id": event_id,
+            "search_embedding": embeddings[text],
+            "search_embedding_hash": embedding_text_hash(text),
+        }
+        for event_id, text in texts.items()
+        if text in embeddings
+    ]
+    if mappings:
+        from pmapi.event.model import Event
 
-    return data
+        db.session.bulk_update_mappings(Event, mappings)
+
+    return len(mappings), skipped, len(texts) - len(mappings)
 
 
 def refresh_event_embedding(event, raise_on_error=False):
-    text = build_event_embedding_text(
-        event.name,
-        event.description,
-        tags_text=_event_tag_text(event),
-        location_text=_next_event_location_text(event),
-    )
-    print(
-        "Generated event embedding text for event {}:\n{}\n".format(
-            getattr(event, "id", None), text
-        )
-    )
+    text = event_embedding_text(event)
+    text_hash = embedding_text_hash(text)
+    if event.search_embedding is not None and event.search_embedding_hash == text_hash:
+        # unchanged since the embedding was generated
+        return event.search_embedding
 
     try:
         event.search_embedding = generate_embedding(text)
+        event.search_embedding_hash = text_hash if event.search_embedding else None
     except Exception:
         event.search_embedding = None
+        event.search_embedding_hash = None
         if raise_on_error:
             raise
         current_app.logger.exception(
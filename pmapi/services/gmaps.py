@@ -1,5 +1,144 @@
+"""
+gmaps.py
+- free-text locations are resolved to a place result: first from an
+  EventLocation with that address, then from the geocode_cache table,
+  and only then from the geocoder.
+  A geocoded place_id that's already an EventLocation skips the place
+  details request. The geocoder is pluggable (GEOCODER), "fixture"
+  answers from a json file for tests and offline runs.
+"""
+
+import json
+import threading
+from datetime import datetime, timedelta
+
 import googlemaps
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
 from pmapi.config import BaseConfig
+from pmapi.event_location.model import EventLocation
+from pmapi.extensions import db
+
+from .model import GeocodeResult
+
+QUERY = "query"
+PLACE = "place"
+
+
+class GoogleGeocoder:
+    """One googlemaps client per process"""
+
+    def __init__(self):
+        self.client = googlemaps.Client(key=BaseConfig.GMAPS_API_KEY)
+
+    def geocode(self, query):
+        return self.client.geocode(query)
+
+    def place(self, place_id):
+        return self.client.place(place_id).get("result")
+
+
+class FixtureGeocoder:
+    """Answers from GEOCODER_FIXTURES, a json file of
+    {"geocode": {normalized query: [results]}, "places": {place_id: result}}"""
+
+    def __init__(self):
+        with open(BaseConfig.GEOCODER_FIXTURES) as fh:
+            fixtures = json.load(fh)
+        self.geocodes = fixtures.get("geocode", {})
+        self.places = fixtures.get("places", {})
+
+    def geocode(self, query):
+        return self.geocodes.get(normalize_location(query), [])
+
+    def place(self, place_id):
+        return self.places.get(place_id)
+
+
+GEOCODERS = {"google": GoogleGeocoder, "fixture": FixtureGeocoder}
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None or not isinstance(_geocoder, GEOCODERS[BaseConfig.GEOCODER]):
+        with _geocoder_lock:
+            _geocoder = GEOCODERS[BaseConfig.GEOCODER]()
+    return _geocoder
+
+
+def normalize_location(location):
+    return " ".join((location or "").lower().replace(",", ", ").split())
+
+
+def location_place(event_location):
+    """The place result an EventLocation was created from"""
+    return {
+        "place_id": event_location.place_id,
+        "name": event_location.name,
+        "description": event_location.description,
+        "types": [t.type for t in event_location.types],
+        "geometry": {
+            "location": {"lat": event_location.lat, "lng": event_location.lng}
+        },
+        "address_components": event_location.address_components,
+    }
+
+
+def find_event_location(query):
+    """The EventLocation with the address `query`. A name alone isn't
+    matched, unrelated venues share names, the geocoder's place_id is."""
+    return EventLocation.query.filter(
+        func.lower(EventLocation.description) == query
+    ).first()
+
+
+def get_cached(kind, key):
+    expires = datetime.utcnow() - timedelta(seconds=BaseConfig.GEOCODE_CACHE_TTL)
+    return db.session.execute(
+        select(GeocodeResult.result).where(
+            GeocodeResult.kind == kind,
+            GeocodeResult.key == key,
+            GeocodeResult.created_at >= expires,
+        )
+    ).scalar()
+
+
+def set_cached(kind, key, result):
+    now = datetime.utcnow()
+    upsert = insert(GeocodeResult.__table__).values(
+        kind=kind, key=key, result=result, created_at=now
+    )
+    # own transaction, the caller may roll back
+    with db.engine.begin() as conn:
+        conn.execute(
+            upsert.on_conflict_do_update(
+                constraint="uq_geocode_cache_kind_key",
+                set_={"result": upsert.excluded.result, "created_at": now},
+            )
+        )
+
+
+def get_place(place_id):
+    """The details of a place, from an EventLocation, the cache or the geocoder"""
+    event_location = EventLocation.query.filter(
+        EventLocation.place_id == place_id
+    ).first()
+    if event_location is not None:
+        return location_place(event_location)
+
+    result = get_cached(PLACE, place_id)
+    if result is None:
+        result = get_geocoder().place(place_id)
+        if result is None:
+            return None
+        result["place_id"] = place_id
+        result["description"] = get_full_address_from_place(result)
+        set_cached(PLACE, place_id, result)
+    return result
 
 
 def resolve_location_input(location, invalid_usage_cls):
@@ -17,7 +156,7 @@ def resolve_location_input(location, invalid_usage_cls):
 
 def get_best_location_result(location):
     """
-    Looks up a location string using the Google Maps API and returns the best result.
+    Looks up a location string and returns the best result.
     
     Args:
         location (str): The location string to search for.
@@ -26,36 +165,31 @@ def get_best_location_result(location):
         dict: The best result containing location details (e.g., formatted address, coordinates).
               Returns None if no results are found.
     """
-    # Initialize the Google Maps client
-    gmaps = googlemaps.Client(key=BaseConfig.GMAPS_API_KEY)
-    
-    # Perform a geocode lookup
+    query = normalize_location(location)
+    if not query:
+        return None
+
+    event_location = find_event_location(query)
+    if event_location is not None:
+        return location_place(event_location)
+
     try:
-        results = gmaps.geocode(location)
-        # Check if results are returned
-        if results:
+        place_id = get_cached(QUERY, query)
+        if place_id is None:
+            results = get_geocoder().geocode(location)
+            if not results:
+                return None  # No results found from geocoding
             # Get the best match (first result)
-            best_result = results[0]
-            place_id = best_result['place_id']
-            
-            # Use the place_id to get more detailed information about the place
-            place_details = gmaps.place(place_id)
-            
-            result = None
-            # Return the detailed information if available
-            if 'result' in place_details:
-                result = place_details['result']
-                result['place_id'] = place_id
-                result['description'] = get_full_address_from_place(result)
-
-            return result  
-        
-        return None  # No results found from geocoding
-    
+            place_id = results[0]["place_id"]
+            set_cached(QUERY, query, place_id)
+
+        return get_place(place_id)
+
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
 
+
 def get_full_address_from_place(place):
     """
     Extracts the full address from a Google Places API result object.
@@ -1,33 +1,122 @@
+"""
+ip_location.py
+- the location of request ips, looked up by the tracker on every tracked
+  request. The GeoLite2 database is opened on the first lookup and
+  memory-mapped (by libmaxminddb when the C extension is built), so CLI
+  and celery processes never open it and the uwsgi workers share its
+  pages. Locations are cached per /24 network (/48 for IPv6) for
+  GEOIP_CACHE_TTL seconds with their names in every language, the
+  request's locale picks one when the location is serialized.
+"""
+
+import ipaddress
+import logging
+import threading
+
+import geoip2.database
+import geoip2.errors
+import maxminddb
 from flask import request
 from flask.helpers import get_debug_flag
-from pmapi.config import BaseConfig as CONFIG
 
-from pmapi import exceptions as exc
-import geoip2.database
+from pmapi.config import BaseConfig
+from pmapi.extensions.lru_cache import LRUCache
 from pmapi.utils import get_locale
 
 DEV_ENVIRON = get_debug_flag()
+DEV_IP_ADDRESS = "49.224.108.78"
+DEFAULT_LOCALE = "en"
+# prefix length of the networks sharing a cached location
+IPV4_PREFIX = 24
+IPV6_PREFIX = 48
 
-reader = geoip2.database.Reader('/app/geoip-data/GeoLite2-City.mmdb')
+cache = LRUCache(
+    threshold=BaseConfig.GEOIP_CACHE_SIZE,
+    default_timeout=BaseConfig.GEOIP_CACHE_TTL,
+)
 
-def get_location_from_ip(ip_address=None):
+try:
+    import maxminddb.extension  # noqa: F401
+
+    READER_MODE = maxminddb.MODE_MMAP_EXT
+except ImportError:
+    READER_MODE = maxminddb.MODE_MMAP
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def get_reader():
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                _reader = geoip2.database.Reader(
+                    BaseConfig.GEOIP_DATABASE_PATH, mode=READER_MODE
+                )
+    return _reader
+
+
+def network_key(ip_address):
+    """The network an ip's location is cached for, raises ValueError if
+    `ip_address` isn't an ip"""
+    address = ipaddress.ip_address(ip_address)
+    prefix = IPV4_PREFIX if address.version == 4 else IPV6_PREFIX
+    # the network number, cheaper than building an ip_network
+    return "{}/{}".format(int(address) >> (address.max_prefixlen - prefix), prefix)
 
 
+def read_location(ip_address):
+    """The location of an ip with the names in every language,
+    {} if the database doesn't have it"""
+    try:
+        response = get_reader().city(ip_address)
+    except geoip2.errors.AddressNotFoundError:
+        return {}
+    return {
+        "country": response.country.names,
+        "region": response.subdivisions.most_specific.names,
+        "city": response.city.names,
+        "lat": response.location.latitude,
+        "lon": response.location.longitude,
+    }
+
+
+def lookup(ip_address):
+    """read_location, cached for the ip's network"""
+    key = network_key(ip_address)
+    location = cache.get(key)
+    if location is None:
+        location = read_location(ip_address)
+        cache.set(key, location)
+    return location
+
+
+def serialize_location(location, locale):
+    """A location from lookup with its names in `locale`"""
+    if not location:
+        return {}
+
+    def name(names):
+        return names.get(locale, names.get(DEFAULT_LOCALE))
+
+    return {
+        "country": name(location["country"]),
+        "region": name(location["region"]),
+        "city": name(location["city"]),
+        "lat": location["lat"],
+        "lon": location["lon"],
+    }
+
+
+def get_location_from_ip(ip_address=None):
     if DEV_ENVIRON:
-        ip_address = "49.224.108.78"
+        ip_address = DEV_IP_ADDRESS
     elif ip_address is None:
         ip_address = request.remote_addr
 
     try:
-        response = reader.city(ip_address)
-        print('locale', get_locale())
-        return {
-            "country": response.country.names.get(get_locale(), response.country.name),
-            "region": response.subdivisions.most_specific.names.get(get_locale(), response.subdivisions.most_specific.name),
-            "city": response.city.names.get(get_locale(), response.city.name),
-            "lat": response.location.latitude,
-            "lon": response.location.longitude,
-        }
+        return serialize_location(lookup(ip_address), get_locale())
     except Exception as e:
-        print(f"Error fetching geolocation: {e}")
-    return {}
\ No newline at end of file
+        logging.warning("Error fetching geolocation of %s: %s", ip_address, e)
+    return {}
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import JSONB
+
+from pmapi.config import BaseConfig
+from pmapi.db_types import Vector
+from pmapi.extensions import db
+
+
+class QueryEmbedding(db.Model):
+    """Embeddings of normalized search queries (see query_embeddings.py)"""
+
+    __tablename__ = "query_embeddings"
+    id = db.Column(db.Integer, primary_key=True)
+    model = db.Column(db.String, nullable=False)
+    query = db.Column(db.Text, nullable=False)
+    embedding = db.Column(Vector(BaseConfig.EVENT_EMBEDDING_DIMENSIONS), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("model", "query", name="uq_query_embeddings_model_query"),
+        db.Index("idx_query_embeddings_created_at", "created_at"),
+    )
+
+
+class TranslationMemory(db.Model):
+    """Translations by (hash of the source text, language), see translations.py.
+    translation is null when the text shouldn't be translated to lang."""
+
+    __tablename__ = "translation_memory"
+    id = db.Column(db.Integer, primary_key=True)
+    source_hash = db.Column(db.String(64), nullable=False)
+    lang = db.Column(db.String(10), nullable=False)
+    translation = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "source_hash", "lang", name="uq_translation_memory_source_hash_lang"
+        ),
+    )
+
+
+class GeocodeResult(db.Model):
+    """Geocoder answers (see gmaps.py): the place_id of a normalized
+    location query, or the details of a place_id"""
+
+    __tablename__ = "geocode_cache"
+    id = db.Column(db.Integer, primary_key=True)
+    # query or place
+    kind = db.Column(db.String(10), nullable=False)
+    key = db.Column(db.Text, nullable=False)
+    result = db.Column(JSONB, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("kind", "key", name="uq_geocode_cache_kind_key"),
+    )
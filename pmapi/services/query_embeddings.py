@@ -0,0 +1,152 @@
+"""
+query_embeddings.py
+- caches the embeddings of search queries, so repeated searches and
+  searches typed a keystroke at a time don't wait for the embedding api.
+  Lookups go through an in-process LRU, then the query_embeddings table.
+  On a miss the embedding is generated in the background and the search
+  falls back to text ranking until it's cached. Expired rows are ignored,
+  and deleted with the oldest beyond QUERY_EMBEDDING_MAX_ROWS by the
+  periodic prune_query_embeddings task (see celeryconfig.py).
+"""
+
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from pmapi.config import BaseConfig
+from pmapi.extensions import cache, cache_is_shared, db
+from pmapi.extensions.lru_cache import LRUCache
+
+from .embeddings import embeddings_enabled, generate_embedding
+from .model import QueryEmbedding
+
+STATS_KEY_PREFIX = "query_embeddings:stats:"
+STATS = ("memory_hits", "table_hits", "misses")
+PENDING_KEY_PREFIX = "query_embeddings:pending:"
+
+memory_cache = LRUCache(
+    threshold=BaseConfig.QUERY_EMBEDDING_MEMORY_SIZE,
+    default_timeout=BaseConfig.QUERY_EMBEDDING_TTL,
+)
+
+# the stats of this process, when the cache isn't shared
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def normalize_query(query_string):
+    return " ".join((query_string or "").lower().split())
+
+
+def _memory_key(query):
+    return "{}:{}".format(BaseConfig.EMBEDDING_MODEL, query)
+
+
+def _record(stat):
+    if cache_is_shared():
+        cache.inc(STATS_KEY_PREFIX + stat)
+    else:
+        with _stats_lock:
+            _stats[stat] += 1
+
+
+def get_query_embedding(query_string, background=None):
+    """Returns the cached embedding of a search query.
+    :param bool background: on a miss, return None and generate the
+        embedding in the background (defaults to QUERY_EMBEDDING_BACKGROUND_FILL),
+        otherwise generate it now
+    """
+    query = normalize_query(query_string)
+    if not embeddings_enabled() or not query:
+        return None
+
+    embedding = memory_cache.get(_memory_key(query))
+    if embedding is not None:
+        _record("memory_hits")
+        return embedding
+
+    expires = datetime.utcnow() - timedelta(seconds=BaseConfig.QUERY_EMBEDDING_TTL)
+    embedding = db.session.execute(
+        select(QueryEmbedding.embedding).where(
+            QueryEmbedding.model == BaseConfig.EMBEDDING_MODEL,
+            QueryEmbedding.query == query,
+            QueryEmbedding.created_at >= expires,
+        )
+    ).scalar()
+    if embedding is not None:
+        _record("table_hits")
+        memory_cache.set(_memory_key(query), embedding)
+        return embedding
+
+    _record("misses")
+    if background is None:
+        background = current_app.config.get("QUERY_EMBEDDING_BACKGROUND_FILL", True)
+    if not background:
+        return fill_query_embedding(query)
+
+    # queue each query once while its embedding is being generated
+    if cache.add(PENDING_KEY_PREFIX + _memory_key(query), True, timeout=60):
+        from pmapi.celery_tasks import cache_query_embedding
+
+        cache_query_embedding.delay(query)
+    return None
+
+
+def fill_query_embedding(query):
+    """Generates and stores the embedding of a normalized query."""
+    embedding = generate_embedding(query)
+    if embedding is None:
+        return None
+
+    now = datetime.utcnow()
+    upsert = insert(QueryEmbedding.__table__).values(
+        model=BaseConfig.EMBEDDING_MODEL, query=query, embedding=embedding, created_at=now
+    )
+    # own transaction, this may run inside a request
+    with db.engine.begin() as conn:
+        conn.execute(
+            upsert.on_conflict_do_update(
+                constraint="uq_query_embeddings_model_query",
+                set_={"embedding": upsert.excluded.embedding, "created_at": now},
+            )
+        )
+
+    memory_cache.set(_memory_key(query), embedding)
+    return embedding
+
+
+def prune_query_embeddings():
+    """Deletes expired embeddings and the oldest beyond QUERY_EMBEDDING_MAX_ROWS,
+    returns the number deleted."""
+    expires = datetime.utcnow() - timedelta(seconds=BaseConfig.QUERY_EMBEDDING_TTL)
+    oldest = (
+        select(QueryEmbedding.id)
+        .order_by(QueryEmbedding.created_at.desc())
+        .offset(BaseConfig.QUERY_EMBEDDING_MAX_ROWS)
+    )
+    with db.engine.begin() as conn:
+        return conn.execute(
+            delete(QueryEmbedding.__table__).where(
+                (QueryEmbedding.created_at < expires) | QueryEmbedding.id.in_(oldest)
+            )
+        ).rowcount
+
+
+def get_query_embedding_stats():
+    per_process = not cache_is_shared()
+    if per_process:
+        with _stats_lock:
+            counts = [_stats[stat] for stat in STATS]
+    else:
+        counts = cache.get_many(*[STATS_KEY_PREFIX + stat for stat in STATS])
+    stats = {stat: count or 0 for stat, count in zip(STATS, counts)}
+    lookups = sum(stats.values())
+    hits = stats["memory_hits"] + stats["table_hits"]
+    stats["hit_rate"] = hits / lookups if lookups else None
+    stats["cached_queries"] = db.session.query(QueryEmbedding).count()
+    stats["per_process"] = per_process
+    return stats
@@ -0,0 +1,55 @@
+"""
+timezones.py
+- one TimezoneFinder per process, created on first use, instead of one
+  per lookup. Lookups are cached by coordinates rounded to
+  TIMEZONE_CACHE_PRECISION decimals (4 is ~11m), event locations keep
+  theirs in EventLocation.tz.
+"""
+
+import threading
+from functools import lru_cache
+
+from timezonefinder import TimezoneFinder
+
+from pmapi.config import BaseConfig
+
+_finder = None
+_finder_lock = threading.Lock()
+
+
+def get_finder():
+    global _finder
+    if _finder is None:
+        with _finder_lock:
+            if _finder is None:
+                _finder = TimezoneFinder()
+    return _finder
+
+
+@lru_cache(maxsize=BaseConfig.TIMEZONE_CACHE_SIZE)
+def _timezone_at(lat, lng):
+    return get_finder().timezone_at(lng=lng, lat=lat)
+
+
+def timezone_at(lat, lng):
+    """The tz database name at a point, None if there isn't one"""
+    precision = BaseConfig.TIMEZONE_CACHE_PRECISION
+    return _timezone_at(round(float(lat), precision), round(float(lng), precision))
+
+
+def timezones_at(points):
+    """Resolves [(lat, lng)] in one call, for backfills.
+    Returns the tz names in the order of `points`."""
+    resolved = {}
+    return [
+        resolved[point] if point in resolved
+        else resolved.setdefault(point, timezone_at(*point))
+        for point in points
+    ]
+
+
+def location_timezone(event_location):
+    """The timezone of an EventLocation, resolved once and kept on it"""
+    if not event_location.tz:
+        event_location.tz = timezone_at(event_location.lat, event_location.lng)
+    return event_location.tz
@@ -3,90 +3,183 @@ from pmapi.event.model import Event
 from sqlalchemy import and_, not_, or_, func
 from pmapi.utils import SUPPORTED_LANGUAGES
 from datetime import datetime
+from flask import current_app
 from pmapi.event_date.model import EventDate
 from pmapi.event_tag.model import Tag
 from pmapi.event_artist.model import Artist
-from pmapi.config import BaseConfig
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+import hashlib
+import json
 import requests
 
 import time
 
-from flask.helpers import get_debug_flag
-from pmapi.config import DevConfig, ProdConfig
+from .model import TranslationMemory
 
-DEV_ENVIRON = get_debug_flag()
-CONFIG = DevConfig if DEV_ENVIRON else ProdConfig
 
+# the api is asked for every language of a text in one completion
+LANGUAGE_NAMES = {
+    "en": "English",
+    "zh-tw": "Traditional Chinese",
+    "zh-cn": "Simplified Chinese",
+    "ru": "Russian",
+    "ja": "Japanese",
+    "fr": "French",
+    "es": "Spanish",
+    "it": "Italian",
+    "de": "German",
+    "pt": "Portuguese",
+    "nl": "Dutch",
+    "pl": "Polish",
+    "hi": "Hindi",
+    "cz": "Czech",
+}
+NO_TRANSLATION = "TRANSLATION_ERROR"
 
-def deepseek_translate(text, target_lang, attempt=1, max_attempts=5):
-    url = "https://openrouter.ai/api/v1/chat/completions"
 
+def translation_hash(text):
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class TruncatedCompletion(ValueError):
+    """The completion hit the output limit"""
+
+
+def parse_completion(response):
+    """The {lang: translation} object of a completion, raises ValueError
+    if it was cut off or isn't a json object"""
+    try:
+        choice = response.json()["choices"][0]
+        content = choice["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError("Unexpected completion: {}".format(e))
+    if choice.get("finish_reason") == "length":
+        raise TruncatedCompletion("The completion was cut off")
+    # some models fence json in a code block
+    content = content.removeprefix("```json").removeprefix("```").removesuffix("```")
+    translations = json.loads(content)
+    if not isinstance(translations, dict):
+        raise ValueError("The completion isn't a json object")
+    return translations
+
+
+def request_translations(text, langs, attempt=1, max_attempts=5):
+    """Translates `text` to every language of `langs` in one completion.
+    Returns {lang: translation}, None for the languages it shouldn't be
+    translated to. Languages that couldn't be translated are left out.
+    A completion that is cut off or malformed is requested again for
+    each half of `langs`, a shorter answer is more likely to fit."""
+    config = current_app.config
     headers = {
-        "Authorization": f"Bearer {CONFIG.OPENROUTER_API_KEY}",
+        "Authorization": f"Bearer {config['OPENROUTER_API_KEY']}",
         "Content-Type": "application/json",
     }
+    targets = "\n".join(
+        f'- "{lang}": {LANGUAGE_NAMES.get(lang, lang)}' for lang in langs
+    )
+    prompt = f"""Translate the following text to each of these languages:
+{targets}
 
-    prompt = f"""Translate the following text to {target_lang}.
-
-IMPORTANT: 
-- Return ONLY the translation, nothing else
-- If the text is already in the target language or contains no meaningful content, return exactly: TRANSLATION_ERROR
-- Do not include quotes, explanations, or any other text
+IMPORTANT:
+- Return ONLY a JSON object with the language codes above as keys and the translations as values
+- If the text is already in a language or contains no meaningful content, use exactly {NO_TRANSLATION} as its value
+- Do not include explanations or any other text
 
 Text to translate:
 {text}"""
 
     data = {
-        "model": "deepseek/deepseek-chat",
+        "model": config["TRANSLATION_MODEL"],
         "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_object"},
     }
 
     try:
-        response = requests.post(url, json=data, headers=headers, timeout=60)
+        response = requests.post(
+            config["TRANSLATION_API_URL"], json=data, headers=headers, timeout=120
+        )
         response.raise_for_status()
-        json_response = response.json()
-
-        translation = json_response["choices"][0]["message"]["content"].strip()
-
-        if translation == "TRANSLATION_ERROR":
-            print(
-                f"TRANSLATION_ERROR (already in target lang or do not translate) for: ({target_lang}) {text[:50]}..."
-            )
-            return None
-
-        return translation
-
-    except Exception as e:
-        print(f"Attempt {attempt} failed: {e}")
+    except requests.RequestException as e:
+        # unavailable or rate limited, the same request can succeed later
+        current_app.logger.warning("Translation attempt %s failed: %s", attempt, e)
         if attempt < max_attempts:
-            time.sleep(1.5)
-            return deepseek_translate(
-                text, target_lang, attempt=attempt + 1, max_attempts=max_attempts
+            time.sleep(1.5 * attempt)
+            return request_translations(
+                text, langs, attempt=attempt + 1, max_attempts=max_attempts
             )
-        else:
-            print("Max attempts reached. Failing.")
-            return None
-
+        return {}
 
-def get_description_translation(text, target_lang):
-    if not CONFIG.ENABLE_TRANSLATIONS:
-        return None
+    try:
+        translations = parse_completion(response)
+    except ValueError as e:
+        if len(langs) == 1:
+            current_app.logger.warning(
+                "Translating to %s failed: %s", langs[0], e
+            )
+            return {}
+        half = len(langs) // 2
+        return {
+            **request_translations(text, langs[:half], max_attempts=max_attempts),
+            **request_translations(text, langs[half:], max_attempts=max_attempts),
+        }
+
+    result = {}
+    for lang in langs:
+        translation = translations.get(lang)
+        if isinstance(translation, str) and translation.strip():
+            translation = translation.strip()
+            result[lang] = None if NO_TRANSLATION in translation else translation
+    return result
 
-    result = deepseek_translate(text, target_lang)
 
-    if result and "TRANSLATION_ERROR" in result:
-        print(
-            "TRANSLATION_ERROR (already in target lang or do not translate) for: ("
-            + target_lang
-            + ") "
-            + text
+def get_translations(text, langs=SUPPORTED_LANGUAGES):
+    """Returns {lang: translation} of `text`, None where it shouldn't be
+    translated. The languages that failed are left out, so they're
+    requested again next time.
+    Translations are kept in the translation memory by (text hash, lang),
+    so a text is only sent to the api for the languages it was never
+    translated to."""
+    config = current_app.config
+    if not config["ENABLE_TRANSLATIONS"] or not langs or not text or not text.strip():
+        return {}
+
+    source_hash = translation_hash(text)
+    translations = {
+        row.lang: row.translation
+        for row in db.session.execute(
+            select(TranslationMemory.lang, TranslationMemory.translation).where(
+                TranslationMemory.source_hash == source_hash,
+                TranslationMemory.lang.in_(langs),
+            )
         )
-        return None
+    }
+    missing = [lang for lang in langs if lang not in translations]
+
+    size = config["TRANSLATION_LANGUAGES_PER_REQUEST"]
+    for i in range(0, len(missing), size):
+        translated = request_translations(text, missing[i: i + size])
+        if translated:
+            upsert = insert(TranslationMemory.__table__).values(
+                [
+                    {"source_hash": source_hash, "lang": lang, "translation": translation}
+                    for lang, translation in translated.items()
+                ]
+            )
+            # own transaction, the caller may roll back
+            with db.engine.begin() as conn:
+                conn.execute(
+                    upsert.on_conflict_do_nothing(
+                        constraint="uq_translation_memory_source_hash_lang"
+                    )
+                )
+        translations.update(translated)
 
-    if result:
-        print(target_lang + " description: " + result)
+    return {lang: translations[lang] for lang in langs if lang in translations}
 
-    return result
+
+def get_description_translation(text, target_lang):
+    return get_translations(text, [target_lang]).get(target_lang)
 
 
 def update_translations():
@@ -149,40 +242,37 @@ def update_translations():
         DESCRIPTION_AS_SUMMARY = (
             event.description[:20] == event.description[:20]
         )  # save tokens when the description as the summary
-        for lang in SUPPORTED_LANGUAGES:
-            if event.description_translations is None:
-                event.description_translations = {}
-
-            if (
-                not DESCRIPTION_AS_SUMMARY
-                and lang not in event.description_translations
-            ):
-                event.description_translations[lang] = get_description_translation(
-                    event.description, lang
-                )
+        if event.description_translations is None:
+            event.description_translations = {}
+        if event.full_description_translations is None:
+            event.full_description_translations = {}
+
+        if not DESCRIPTION_AS_SUMMARY:
+            missing = [
+                lang for lang in SUPPORTED_LANGUAGES
+                if lang not in event.description_translations
+            ]
+            for lang, translation in get_translations(event.description, missing).items():
+                event.description_translations[lang] = translation
                 event.updated_at = datetime.now()
-                time.sleep(1.5)
 
-            if event.full_description_translations is None:
-                event.full_description_translations = {}
-
-            if (
-                lang not in event.full_description_translations
-                and event.full_description
-                and len(event.full_description) > 0
-            ):
-                event.full_description_translations[lang] = get_description_translation(
-                    event.full_description, lang
-                )
-
-                if DESCRIPTION_AS_SUMMARY and event.full_description_translations[lang]:
-                    summary = event.full_description_translations[lang][0:297]
+        if event.full_description and len(event.full_description) > 0:
+            missing = [
+                lang for lang in SUPPORTED_LANGUAGES
+                if lang not in event.full_description_translations
+            ]
+            for lang, translation in get_translations(
+                event.full_description, missing
+            ).items():
+                event.full_description_translations[lang] = translation
+
+                if DESCRIPTION_AS_SUMMARY and translation:
+                    summary = translation[0:297]
                     if len(summary) > 297:
                         summary += "..."
                     event.description_translations[lang] = summary
 
                 event.updated_at = datetime.now()
-                time.sleep(1.5)
 
         print("translated " + event.name)
         db.session.commit()
@@ -0,0 +1,128 @@
+"""
+vector_index.py
+- approximate nearest neighbour search over Event.search_embedding.
+  With pgvector the candidates come from an HNSW or IVFFlat index on
+  events, tuned per transaction with hnsw.ef_search / ivfflat.probes.
+  Without it, a NumPy index loaded from a snapshot file
+  (EVENT_SEARCH_VECTOR_INDEX_PATH) finds them in process.
+"""
+
+import threading
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import text
+
+from pmapi.extensions import db
+
+INDEX_NAME = "idx_events_search_embedding_ann"
+INDEX_METHODS = ("hnsw", "ivfflat")
+
+
+def build_index(method="hnsw", m=16, ef_construction=64, lists=None):
+    """(Re)creates the ANN index on events.search_embedding.
+    :param int m: hnsw, max connections per node
+    :param int ef_construction: hnsw, candidate list size while building
+    :param int lists: ivfflat, number of lists, defaults to rows / 1000
+    """
+    if method not in INDEX_METHODS:
+        raise ValueError("method must be one of {}".format(", ".join(INDEX_METHODS)))
+
+    if method == "hnsw":
+        options = "m = {:d}, ef_construction = {:d}".format(m, ef_construction)
+    else:
+        if not lists:
+            rows = db.session.execute(
+                text("SELECT count(*) FROM events WHERE search_embedding IS NOT NULL")
+            ).scalar()
+            lists = max(rows // 1000, 1)
+        options = "lists = {:d}".format(lists)
+
+    db.session.execute(text("DROP INDEX IF EXISTS {}".format(INDEX_NAME)))
+    db.session.execute(
+        text(
+            "CREATE INDEX {} ON events USING {} "
+            "(search_embedding vector_cosine_ops) WITH ({})".format(
+                INDEX_NAME, method, options
+            )
+        )
+    )
+    db.session.commit()
+    return options
+
+
+def set_search_params(ef_search=None, probes=None):
+    """Sets the index search parameters for the current transaction.
+    Higher values trade latency for recall."""
+    ef_search = ef_search or current_app.config.get("EVENT_SEARCH_HNSW_EF_SEARCH")
+    probes = probes or current_app.config.get("EVENT_SEARCH_IVFFLAT_PROBES")
+    if ef_search:
+        db.session.execute(text("SET LOCAL hnsw.ef_search = {:d}".format(ef_search)))
+    if probes:
+        db.session.execute(text("SET LOCAL ivfflat.probes = {:d}".format(probes)))
+
+
+class NumpyVectorIndex:
+    """Exact cosine search over a normalized float32 matrix."""
+
+    def __init__(self, ids, vectors):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.vectors = vectors / norms
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k):
+        """Returns [(id, cosine distance)] of the k nearest vectors."""
+        if not len(self.ids):
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        distances = 1 - self.vectors @ query
+        k = min(k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(int(self.ids[i]), float(distances[i])) for i in nearest]
+
+    def save(self, path):
+        np.savez(path, ids=self.ids, vectors=self.vectors)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["ids"], data["vectors"])
+
+    @classmethod
+    def from_events(cls, batch_size=10000):
+        """Builds the index from the embeddings in the events table."""
+        from pmapi.event.model import Event
+
+        ids, vectors = [], []
+        rows = (
+            db.session.query(Event.id, Event.search_embedding)
+            .filter(Event.search_embedding.isnot(None))
+            .yield_per(batch_size)
+        )
+        for event_id, embedding in rows:
+            ids.append(event_id)
+            vectors.append(embedding)
+        return cls(ids, np.array(vectors, dtype=np.float32).reshape(len(ids), -1))
+
+
+_numpy_index = None
+_numpy_index_lock = threading.Lock()
+
+
+def get_numpy_index():
+    """Returns the in-process index if EVENT_SEARCH_VECTOR_INDEX_PATH is set"""
+    global _numpy_index
+    path = current_app.config.get("EVENT_SEARCH_VECTOR_INDEX_PATH")
+    if not path:
+        return None
+    with _numpy_index_lock:
+        if _numpy_index is None:
+            _numpy_index = NumpyVectorIndex.load(path)
+    return _numpy_index
@@ -0,0 +1,233 @@
+"""
+controllers.py
+- the sitemap is an index of gzipped shards written to SITEMAP_DIR.
+  Events and artists are sharded by id range (SITEMAP_SHARD_SIZE ids
+  per shard), so a change only rewrites the shard of the changed row.
+  Shards are streamed from the (id, name, updated_at) columns, the
+  ORM objects are never loaded. The shards with an update queued are
+  marked in the sitemap_shards table, which the web and celery
+  processes all see.
+"""
+
+import gzip
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+
+import pycountry
+from flask import current_app
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from pmapi.event.model import Event
+from pmapi.event_artist.model import Artist
+from pmapi.extensions import db
+from pmapi.utils import SUPPORTED_LANGUAGES
+
+from .model import SitemapShard
+
+INDEX_FILENAME = "sitemap.xml"
+PAGES_SHARD = "pages"
+SHARD_KINDS = {"events": Event, "artists": Artist}
+SHARD_PATTERN = re.compile(r"^(?:pages|(events|artists)-(\d+))$")
+STREAM_BATCH_SIZE = 1000
+
+STATIC_PAGES = [
+    "/browse",
+    "/browse/all",
+    *["/browse/{}".format(country.alpha_2) for country in pycountry.countries],
+    "/?view=nearby",
+    "/?view=explore",
+    "/privacy_policy",
+    "/support",
+    "/terms_and_conditions",
+    "/login",
+    "/register",
+    "/forgot",
+    "/add/public_event/",
+]
+
+
+def shard_filename(shard):
+    return "sitemap-{}.xml.gz".format(shard)
+
+
+def shard_path(shard):
+    return os.path.join(current_app.config["SITEMAP_DIR"], shard_filename(shard))
+
+
+def index_path():
+    return os.path.join(current_app.config["SITEMAP_DIR"], INDEX_FILENAME)
+
+
+def shard_of(kind, id):
+    return "{}-{}".format(kind, id // current_app.config["SITEMAP_SHARD_SIZE"])
+
+
+def all_shards():
+    shard_size = current_app.config["SITEMAP_SHARD_SIZE"]
+    shards = [PAGES_SHARD]
+    for kind, model in SHARD_KINDS.items():
+        max_id = db.session.query(func.max(model.id)).scalar()
+        if max_id is not None:
+            shards += ["{}-{}".format(kind, n) for n in range(max_id // shard_size + 1)]
+    return shards
+
+
+def shard_urls(shard):
+    if shard == PAGES_SHARD:
+        for loc in STATIC_PAGES:
+            yield {"loc": loc}
+        return
+
+    kind, number = SHARD_PATTERN.match(shard).groups()
+    shard_size = current_app.config["SITEMAP_SHARD_SIZE"]
+    first_id = int(number) * shard_size
+    if kind == "events":
+        rows = db.session.query(Event.id, Event.name, Event.updated_at).filter(
+            Event.id >= first_id, Event.id < first_id + shard_size
+        )
+    else:
+        rows = db.session.query(Artist.id, Artist.name).filter(
+            Artist.id >= first_id, Artist.id < first_id + shard_size
+        )
+
+    for row in rows.order_by("id").yield_per(STREAM_BATCH_SIZE):
+        url = {"loc": "/{}/{}?name={}".format(kind[:-1], row.id, row.name)}
+        if kind == "events" and row.updated_at:
+            url["lastmod"] = row.updated_at.strftime("%Y-%m-%d")
+        yield url
+
+
+def write_atomically(path, chunks, compress=False):
+    """Writes to a temporary file then renames it, so a file being
+    served is never partially written."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            out = gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) if compress else raw
+            for chunk in chunks:
+                out.write(chunk.encode("utf-8"))
+            if compress:
+                out.close()
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_shard(shard):
+    template = current_app.jinja_env.get_template("sitemap.xml")
+    write_atomically(
+        shard_path(shard),
+        template.generate(
+            urls=shard_urls(shard),
+            base_url=current_app.config["WEBSITE_URL"],
+            supported_languages=SUPPORTED_LANGUAGES,
+        ),
+        compress=True,
+    )
+
+
+def write_index(shards=None):
+    shards = shards or all_shards()
+    sitemaps = []
+    for shard in shards:
+        path = shard_path(shard)
+        if os.path.exists(path):
+            sitemaps.append(
+                {
+                    "loc": "/" + shard_filename(shard),
+                    "lastmod": datetime.utcfromtimestamp(os.path.getmtime(path)),
+                }
+            )
+    template = current_app.jinja_env.get_template("sitemap_index.xml")
+    write_atomically(
+        index_path(),
+        template.generate(
+            sitemaps=sitemaps, base_url=current_app.config["SITEMAP_BASE_URL"]
+        ),
+    )
+
+
+def regenerate_sitemap(shards=None):
+    """Rewrites `shards` (all if None) and the index.
+    Returns the number of shards written."""
+    every_shard = all_shards()
+    if shards is None:
+        shards = every_shard
+    # cleared before the shards are read, a change committed from now on
+    # queues another update
+    clear_pending(shards)
+    # shards past the last id would stay empty, don't list them
+    shards = [shard for shard in shards if shard in every_shard]
+    for shard in shards:
+        write_shard(shard)
+    write_index(every_shard)
+    return len(shards)
+
+
+def is_valid_shard(shard):
+    return SHARD_PATTERN.match(shard) is not None
+
+
+def sitemap_shard_keys(instances):
+    """The shards that list `instances`"""
+    shards = set()
+    for instance in instances:
+        if isinstance(instance, Event) and instance.id is not None:
+            shards.add(shard_of("events", instance.id))
+        elif isinstance(instance, Artist) and instance.id is not None:
+            shards.add(shard_of("artists", instance.id))
+    return shards
+
+
+def mark_pending(shards, expires):
+    """Marks `shards` pending, returns the ones that weren't. A mark older
+    than `expires` seconds is taken over, its update was lost."""
+    table = SitemapShard.__table__
+    now = datetime.utcnow()
+    # own transaction, it runs after the caller's commit
+    with db.engine.begin() as conn:
+        conn.execute(
+            insert(table)
+            .values([{"shard": shard} for shard in shards])
+            .on_conflict_do_nothing(index_elements=[table.c.shard])
+        )
+        return conn.execute(
+            table.update()
+            .where(
+                table.c.shard.in_(shards),
+                or_(
+                    table.c.pending_since.is_(None),
+                    table.c.pending_since < now - timedelta(seconds=expires),
+                ),
+            )
+            .values(pending_since=now)
+            .returning(table.c.shard)
+        ).scalars().all()
+
+
+def clear_pending(shards):
+    table = SitemapShard.__table__
+    with db.engine.begin() as conn:
+        conn.execute(
+            table.update().where(table.c.shard.in_(shards)).values(pending_since=None)
+        )
+
+
+def schedule_sitemap_update(shards):
+    """Queues a rewrite of `shards`. Changes made while a shard's update
+    is pending are written by that update."""
+    if not shards:
+        return
+    delay = current_app.config["SITEMAP_UPDATE_DELAY"]
+    shards = mark_pending(sorted(shards), expires=delay * 2 + 60)
+    if shards:
+        from pmapi.celery_tasks import update_sitemap
+
+        update_sitemap.apply_async(args=(shards,), countdown=delay)
@@ -0,0 +1,10 @@
+from pmapi.extensions import db
+
+
+class SitemapShard(db.Model):
+    """The shards with an update queued (see controllers.py).
+    pending_since is null once the shard is written."""
+
+    __tablename__ = "sitemap_shards"
+    shard = db.Column(db.String(32), primary_key=True)
+    pending_since = db.Column(db.DateTime, nullable=True)
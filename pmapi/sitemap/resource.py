@@ -1,56 +1,65 @@
-from flask import Blueprint, make_response, render_template, current_app
+import os
+
+from flask import Blueprint, send_file
 
 from flask_apispec import doc
 from flask_apispec import MethodResource
 
-from pmapi.event.model import Event
-from pmapi.event_artist.model import Artist
-from pmapi.extensions import db
-from pmapi.utils import SUPPORTED_LANGUAGES 
-import pycountry
+from pmapi import exceptions as exc
+
+from . import controllers as sitemaps
 
 sitemap_blueprint = Blueprint("sitemap", __name__)
 
+SITEMAP_CACHE_TIMEOUT = 60 * 60
+
+
 @doc(tags=["sitemap"])
 class SiteMapResource(MethodResource):
     @doc(
-        summary="Sitemap for SEO purposes",
+        summary="Sitemap index for SEO purposes",
+        description="""Lists the gzipped sitemap shards of the pages, events and artists.
+        """,
     )
     def get(self, **kwargs):
+        path = sitemaps.index_path()
+        if not os.path.exists(path):
+            sitemaps.regenerate_sitemap()
+        return send_file(
+            path,
+            mimetype="application/xml",
+            conditional=True,
+            cache_timeout=SITEMAP_CACHE_TIMEOUT,
+        )
+
+
+@doc(tags=["sitemap"])
+class SiteMapShardResource(MethodResource):
+    @doc(
+        summary="Sitemap shard",
+        params={"shard": {"description": "pages, events-<n> or artists-<n>"}},
+    )
+    def get(self, shard, **kwargs):
+        if not sitemaps.is_valid_shard(shard):
+            raise exc.RecordNotFound("Sitemap not found")
+        path = sitemaps.shard_path(shard)
+        if not os.path.exists(path):
+            if shard not in sitemaps.all_shards():
+                raise exc.RecordNotFound("Sitemap not found")
+            sitemaps.write_shard(shard)
+        return send_file(
+            path,
+            mimetype="application/x-gzip",
+            conditional=True,
+            cache_timeout=SITEMAP_CACHE_TIMEOUT,
+        )
 
-        urls = []
-
-        events = db.session.query(Event).all()
-        artists = db.session.query(Artist).all()
-
-        urls.append({"loc": '/browse'})
-        urls.append({"loc": '/browse/all'})
-        for country in pycountry.countries:
-            urls.append({"loc": f"/browse/{country.alpha_2}"})
-        urls.append({"loc": '/?view=nearby'})
-        urls.append({"loc": '/?view=explore'})
-        urls.append({"loc": '/privacy_policy'})
-        urls.append({"loc": '/support'})
-        urls.append({"loc": '/terms_and_conditions'})
-        urls.append({"loc": '/login'})
-        urls.append({"loc": '/register'})
-        urls.append({"loc": '/forgot'})
-        urls.append({"loc": '/add/public_event/'})
-    
-        for event in events:
-            urls.append({"loc": '/event/' + str(event.id) +  '?name=' + event.name,
-                        "lastmod": event.updated_at.strftime("%Y-%m-%d")})
-        for artist in artists:
-            urls.append({"loc": '/artist/' + str(artist.id) +  '?name=' + artist.name})
-        
-        base_url = current_app.config["WEBSITE_URL"]
-
-        sitemap_xml = render_template("sitemap.xml", urls=urls, base_url=base_url, supported_languages=SUPPORTED_LANGUAGES)
-        response = make_response(sitemap_xml)
-        response.headers["Content-Type"] = "application/xml"
-        
-        return response
 
 sitemap_blueprint.add_url_rule(
-    "", view_func=SiteMapResource.as_view("SiteMapResource")
+    "/sitemap.xml", view_func=SiteMapResource.as_view("SiteMapResource")
+)
+
+sitemap_blueprint.add_url_rule(
+    "/sitemap-<shard>.xml.gz",
+    view_func=SiteMapShardResource.as_view("SiteMapShardResource"),
 )
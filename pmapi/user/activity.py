@@ -0,0 +1,107 @@
+"""
+activity.py
+- when users were last active, noted in the worker process.
+  An authenticated request only notes the time in memory, and only when
+  the user's last_active is LAST_ACTIVE_GRANULARITY seconds old or more.
+  A flusher thread writes the noted times every
+  LAST_ACTIVE_FLUSH_INTERVAL seconds with one
+  UPDATE users ... FROM (VALUES ...).
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import DateTime, String, cast, column, or_, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm.attributes import set_committed_value
+
+from pmapi.auth.principal import Principal, cache_principal
+from pmapi.common.flusher import Flusher
+from pmapi.extensions import db
+
+from .model import User
+
+
+class ActivityBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_active = {}
+
+    def add(self, user_id, last_active):
+        with self._lock:
+            self._last_active[user_id] = last_active
+
+    def drain(self):
+        with self._lock:
+            last_active, self._last_active = self._last_active, {}
+        return last_active
+
+    def requeue(self, last_active):
+        """Puts back times that weren't written, unless newer ones were noted"""
+        with self._lock:
+            self._last_active = {**last_active, **self._last_active}
+
+
+buffer = ActivityBuffer()
+
+
+def record_activity(user):
+    """Notes that `user` is active now, if its last_active is stale"""
+    interval = current_app.config["LAST_ACTIVE_FLUSH_INTERVAL"]
+    if interval:
+        flusher.start(current_app._get_current_object())
+    granularity = timedelta(seconds=current_app.config["LAST_ACTIVE_GRANULARITY"])
+    now = datetime.utcnow()
+    if user.last_active is not None and now - user.last_active < granularity:
+        return
+    buffer.add(str(user.id), now)
+    if isinstance(user, Principal):
+        # later requests see the noted time
+        cache_principal(user._replace(last_active=now))
+    else:
+        # the loaded user is up to date without making it dirty
+        set_committed_value(user, "last_active", now)
+    if interval == 0:
+        flush_activity()
+
+
+def flush_activity():
+    """Writes the noted times, returns the number of users updated."""
+    last_active = buffer.drain()
+    if not last_active:
+        return 0
+    try:
+        return write_activity(last_active)
+    except Exception:
+        buffer.requeue(last_active)
+        raise
+
+
+flusher = Flusher("user activity", "LAST_ACTIVE_FLUSH_INTERVAL", flush_activity)
+
+
+def write_activity(last_active):
+    noted = values(
+        column("id", String), column("last_active", DateTime), name="noted"
+    ).data(list(last_active.items()))
+    users = User.__table__
+    granularity = timedelta(seconds=current_app.config["LAST_ACTIVE_GRANULARITY"])
+    with db.engine.begin() as conn:
+        # skips the users another worker wrote within the granularity
+        return conn.execute(
+            users.update()
+            .where(
+                users.c.id == cast(noted.c.id, UUID),
+                or_(
+                    users.c.last_active.is_(None),
+                    users.c.last_active <= noted.c.last_active - granularity,
+                ),
+            )
+            .values(last_active=noted.c.last_active)
+        ).rowcount
+
+
+def flush_on_exit(app):
+    with app.app_context():
+        flush_activity()
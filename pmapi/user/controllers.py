@@ -375,6 +375,8 @@ def delete_user(user_id):
     user.password = None
     user.alias = None
     user.description = None
+    # revokes the api key, the cached principals go with it
+    user.api_key_hash = None
 
     """
     need to fix this but for now, whatever
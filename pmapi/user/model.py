@@ -1,3 +1,4 @@
+import hashlib
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask import Flask
@@ -50,7 +51,8 @@ class User(db.Model):
     description = db.Column(db.String(1000))
     oauth = db.Column(db.Boolean, unique=False, default=False)
     one_off_auth_token = db.Column(UUID)
-    api_key = db.Column(db.String(255), unique=True, nullable=True, index=True)
+    # sha256 of the api key, the key itself isn't stored
+    api_key_hash = db.Column(db.String(64), unique=True, nullable=True, index=True)
     locale = db.Column(db.String(16))
     status = db.Column(
         ENUM("active", "disabled", "pending", name="user_status"), default="pending"
@@ -187,12 +189,18 @@ class User(db.Model):
     def get_id(self):
         return str(self.id).encode("utf-8").decode("utf-8")
 
+    @staticmethod
+    def hash_api_key(api_key):
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
     def generate_api_key(self):
-        """Generate a new API key for the user."""
+        """Generate a new API key for the user.
+        Only its hash is stored, the key can't be shown again."""
         import secrets
 
-        self.api_key = secrets.token_urlsafe(32)
-        return self.api_key
+        api_key = secrets.token_urlsafe(32)
+        self.api_key_hash = self.hash_api_key(api_key)
+        return api_key
 
 
 """
@@ -8,11 +8,15 @@ ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+
 from pmapi.application import create_app
 from pmapi.config import DevConfig, ProdConfig
+from pmapi.event.loaders import load_next_event_dates
 from pmapi.event.model import Event
 from pmapi.extensions import db
-from pmapi.services.embeddings import refresh_event_embedding
+from pmapi.services.embeddings import refresh_event_embeddings
 
 
 CONFIG = DevConfig if get_debug_flag() else ProdConfig
@@ -20,67 +24,88 @@ CONFIG = DevConfig if get_debug_flag() else ProdConfig
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Backfill event search embeddings.")
-    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=1000)
     parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument(
+        "--stale",
+        action="store_true",
+        help=(
+            "Check events that already have an embedding, the ones whose "
+            "text or EMBEDDING_MODEL changed are recomputed."
+        ),
+    )
     parser.add_argument(
         "--force",
         action="store_true",
-        help="Recompute embeddings for events that already have one.",
+        help="Recompute every embedding, even the unchanged ones.",
     )
     return parser.parse_args()
 
 
-def run_backfill(batch_size=100, limit=None, force=False, logger=None):
+def run_backfill(batch_size=1000, limit=None, stale=False, force=False, logger=None):
+    """Embeds events in batches of batch_size, each batch is sent to
+    the embedding api as concurrent requests of EMBEDDING_BATCH_SIZE
+    inputs and written back with one bulk update.
+    Only events without an embedding are embedded, unless `stale` (the
+    ones whose text or model changed too) or `force` (all of them)."""
     processed = 0
+    skipped = 0
     failed = 0
     last_id = 0
 
     while True:
         query = (
             db.session.query(Event)
+            .options(selectinload(Event.event_tags))
             .filter(Event.id > last_id)
             .order_by(Event.id.asc())
-            .limit(batch_size)
         )
 
-        if not force:
-            query = query.filter(Event.search_embedding.is_(None))
+        if not stale and not force:
+            query = query.filter(
+                or_(
+                    Event.search_embedding.is_(None),
+                    Event.search_embedding_hash.is_(None),
+                )
+            )
+
+        if limit:
+            batch_size = min(batch_size, limit - (processed + skipped + failed))
+        query = query.limit(batch_size)
 
         batch = query.all()
         if not batch:
             break
-
-        for event in batch:
-            if limit and (processed + failed) >= limit:
-                batch = []
-                break
-
-            try:
-                refresh_event_embedding(event, raise_on_error=True)
-                processed += 1
-            except Exception as exc:
-                failed += 1
-                if logger is not None:
-                    logger.exception(
-                        "Failed to backfill embedding for event %s: %s", event.id, exc
-                    )
-                else:
-                    print(
-                        "Failed to backfill embedding for event {}: {}".format(
-                            event.id, exc
-                        )
-                    )
-            finally:
-                last_id = event.id
+        last_id = batch[-1].id
+
+        # the location text is built from the next event date
+        load_next_event_dates(batch)
+        try:
+            updated, unchanged, errors = refresh_event_embeddings(batch, force=force)
+        except Exception as exc:
+            updated, unchanged, errors = 0, 0, len(batch)
+            if logger is not None:
+                logger.exception("Failed to backfill embeddings: %s", exc)
+            else:
+                print("Failed to backfill embeddings: {}".format(exc))
+        processed += updated
+        skipped += unchanged
+        failed += errors
 
         db.session.commit()
-        print("Processed {}, failed {}...".format(processed, failed))
+        print(
+            "Processed {}, skipped {}, failed {}...".format(processed, skipped, failed)
+        )
 
-        if limit and (processed + failed) >= limit:
+        if limit and (processed + skipped + failed) >= limit:
             break
 
     db.session.commit()
-    print("Finished. Processed {}, failed {}.".format(processed, failed))
+    print(
+        "Finished. Processed {}, skipped {}, failed {}.".format(
+            processed, skipped, failed
+        )
+    )
 
 
 def main():
@@ -91,6 +116,7 @@ def main():
         run_backfill(
             batch_size=args.batch_size,
             limit=args.limit,
+            stale=args.stale,
             force=args.force,
             logger=app.logger,
         )
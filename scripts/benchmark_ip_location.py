@@ -0,0 +1,101 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import geoip2.database
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from pmapi.config import BaseConfig
+from pmapi.services import ip_location
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Lookups per second of the request ip geolocation: the reader "
+            "opened in the default mode with names picked per lookup as "
+            "before, the memory-mapped reader, and the /24 cache in front of it."
+        )
+    )
+    parser.add_argument("--database", default=BaseConfig.GEOIP_DATABASE_PATH)
+    parser.add_argument("--lookups", type=int, default=100000)
+    # distinct /24 networks the requests come from
+    parser.add_argument("--networks", type=int, default=2000)
+    parser.add_argument("--locale", default="en")
+    return parser.parse_args()
+
+
+def request_ips(lookups, networks, seed=0):
+    rng = random.Random(seed)
+    prefixes = [
+        "{}.{}.{}".format(rng.randint(1, 223), rng.randint(0, 255), rng.randint(0, 255))
+        for _ in range(networks)
+    ]
+    return [
+        "{}.{}".format(rng.choice(prefixes), rng.randint(1, 254)) for _ in range(lookups)
+    ]
+
+
+def per_lookup(reader, ip, locale):
+    """How get_location_from_ip used to look up"""
+    try:
+        response = reader.city(ip)
+        return {
+            "country": response.country.names.get(locale, response.country.name),
+            "region": response.subdivisions.most_specific.names.get(
+                locale, response.subdivisions.most_specific.name
+            ),
+            "city": response.city.names.get(locale, response.city.name),
+            "lat": response.location.latitude,
+            "lon": response.location.longitude,
+        }
+    except Exception:
+        return {}
+
+
+def mmap_uncached(ip, locale):
+    ip_location.network_key(ip)
+    return ip_location.serialize_location(ip_location.read_location(ip), locale)
+
+
+def mmap_cached(ip, locale):
+    return ip_location.serialize_location(ip_location.lookup(ip), locale)
+
+
+def run(lookup, ips, locale):
+    start = time.perf_counter()
+    for ip in ips:
+        lookup(ip, locale)
+    return len(ips) / (time.perf_counter() - start)
+
+
+def main():
+    args = parse_args()
+    BaseConfig.GEOIP_DATABASE_PATH = args.database
+    ips = request_ips(args.lookups, args.networks)
+
+    default_reader = geoip2.database.Reader(args.database)
+    variants = (
+        ("default mode", lambda ip, locale: per_lookup(default_reader, ip, locale)),
+        ("mmap", mmap_uncached),
+        ("mmap + /24 cache", mmap_cached),
+    )
+
+    print(
+        "{} lookups from {} /24 networks, {}".format(
+            args.lookups, args.networks, args.database
+        )
+    )
+    print("{:<18} {:>14}".format("lookup", "lookups/s"))
+    for name, lookup in variants:
+        ip_location.cache.clear()
+        print("{:<18} {:>14,.0f}".format(name, run(lookup, ips, args.locale)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import base64
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from pmapi.media_item.renditions import IMAGE_RENDITIONS, render_image
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Request latency and peak RSS of a multi-image event submission: "
+            "renditions in the request (the previous copy per size, and the "
+            "cascade) against renditions deferred to worker processes."
+        )
+    )
+    parser.add_argument("--images", type=int, default=5)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    return parser.parse_args()
+
+
+def synthetic_upload(width, height, seed):
+    """A base64 JPEG data uri, noisy enough to compress like a photo."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    pixels = gradient + rng.normal(scale=40, size=(height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(
+        buffer, "JPEG", quality=90
+    )
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def write_upload(directory, name, upload):
+    path = os.path.join(directory, name + "_upload")
+    with open(path, "wb") as fh:
+        fh.write(base64.b64decode(upload.split("base64,", 1)[1]))
+    return path
+
+
+def outputs(directory, name):
+    return [
+        (os.path.join(directory, "{}_{}.webp".format(name, column)), size)
+        for column, size in IMAGE_RENDITIONS
+    ]
+
+
+def copy_per_size(upload_path, outputs):
+    """How save_media_item used to render: every size from the original."""
+    img = Image.open(upload_path)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    for path, size in outputs:
+        img_copy = img.copy()
+        if size:
+            img_copy.thumbnail((size, size), Image.LANCZOS)
+        img_copy.save(path, "WEBP")
+
+
+def reset_peak_rss():
+    """Starts measuring the peak RSS from now (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def in_request(uploads, render):
+    directory = tempfile.mkdtemp()
+    reset_peak_rss()
+    start = time.perf_counter()
+    for i, upload in enumerate(uploads):
+        name = "image{}".format(i)
+        render(write_upload(directory, name, upload), outputs(directory, name))
+    return (time.perf_counter() - start) * 1000, peak_rss_mb(), None
+
+
+def render_job(job):
+    reset_peak_rss()
+    render_image(*job)
+    return peak_rss_mb()
+
+
+def warm_up(i):
+    return i
+
+
+def deferred(uploads, workers):
+    directory = tempfile.mkdtemp()
+    # the celery worker processes, one task per media item
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        pool.map(warm_up, range(workers))
+
+        reset_peak_rss()
+        start = time.perf_counter()
+        jobs = []
+        for i, upload in enumerate(uploads):
+            name = "image{}".format(i)
+            jobs.append((write_upload(directory, name, upload), outputs(directory, name)))
+        latency = (time.perf_counter() - start) * 1000
+        rss = peak_rss_mb()
+
+        start = time.perf_counter()
+        worker_rss = max(pool.map(render_job, jobs, chunksize=1))
+        background = (time.perf_counter() - start) * 1000
+    return latency, rss, (background, worker_rss)
+
+
+def run_variant(queue, variant, uploads, workers):
+    if variant == "copy per size":
+        queue.put(in_request(uploads, copy_per_size))
+    elif variant == "cascade":
+        queue.put(in_request(uploads, render_image))
+    else:
+        queue.put(deferred(uploads, workers))
+
+
+def run_in_process(variant, uploads, workers):
+    """Runs a variant in a fresh process, peak RSS only grows"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_variant, args=(queue, variant, uploads, workers))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    args = parse_args()
+    uploads = [synthetic_upload(args.width, args.height, seed) for seed in range(args.images)]
+
+    print(
+        "{} images of {}x{} per submission".format(args.images, args.width, args.height)
+    )
+    print(
+        "{:<16} {:>12} {:>12} {:>14} {:>14}".format(
+            "renditions", "request ms", "request MB", "background ms", "worker MB"
+        )
+    )
+    for variant in ("copy per size", "cascade", "deferred"):
+        latency, rss, background = run_in_process(variant, uploads, args.workers)
+        background_ms, worker_rss = background or (None, None)
+        print(
+            "{:<16} {:>12.0f} {:>12.0f} {:>14} {:>14}".format(
+                variant,
+                latency,
+                rss,
+                "-" if background_ms is None else "{:.0f}".format(background_ms),
+                "-" if worker_rss is None else "{:.0f}".format(worker_rss),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
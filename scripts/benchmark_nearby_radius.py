@@ -0,0 +1,136 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from flask.helpers import get_debug_flag
+from geoalchemy2 import func, Geography
+from sqlalchemy import cast, event
+from sqlalchemy.orm import aliased
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from pmapi.application import create_app
+from pmapi.config import DevConfig, ProdConfig
+from pmapi.event_date.model import EventDate
+from pmapi.event_location.model import EventLocation
+from pmapi.extensions import db
+import pmapi.event_date.controllers as event_dates
+
+
+CONFIG = DevConfig if get_debug_flag() else ProdConfig
+
+LOCATIONS = {
+    "dense-city (Berlin)": {"lat": 52.520008, "lng": 13.404954},
+    "remote-ocean (Point Nemo)": {"lat": -48.876667, "lng": -123.393333},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the nearby radius planner against the legacy radius loop."
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    return parser.parse_args()
+
+
+def legacy_nearby_radius(query, entity, lat, lng):
+    """The previous implementation: one COUNT query per radius until
+    NEARBY_MIN_EVENTS distinct events are found."""
+    row_number_column = (
+        func.row_number()
+        .over(partition_by=entity.event_id, order_by=entity.start.asc())
+        .label("row_number")
+    )
+    subquery = query.add_columns(row_number_column).subquery()
+    CountEventDateAlias = aliased(EventDate, subquery)
+    count_query = (
+        db.session.query(CountEventDateAlias)
+        .join(EventLocation, CountEventDateAlias.location_id == EventLocation.id)
+        .filter(subquery.c.row_number == 1)
+    )
+
+    for r in event_dates.NEARBY_RADII:
+        count = (
+            count_query.filter(
+                func.ST_DWithin(
+                    cast(EventLocation.geo, Geography(srid=4326)),
+                    cast("SRID=4326;POINT(%f %f)" % (lng, lat), Geography(srid=4326)),
+                    r,
+                )
+            )
+            .from_self()
+            .count()
+        )
+        if count >= event_dates.NEARBY_MIN_EVENTS:
+            return r
+    return 0
+
+
+@contextmanager
+def count_queries():
+    counter = {"queries": 0}
+
+    def before_cursor_execute(*args, **kwargs):
+        counter["queries"] += 1
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def measure(location, runs):
+    timings = []
+    queries = 0
+    radius = None
+    for _ in range(runs):
+        with count_queries() as counter:
+            start = time.perf_counter()
+            # page 2 skips the first page facets, so only the radius
+            # and page queries are measured
+            results = event_dates.query_event_dates(
+                location=location, radius=0, page=2, per_page=20
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = counter["queries"]
+        radius = results.radius
+        db.session.rollback()
+    return radius, queries, statistics.median(timings)
+
+
+def run_benchmark(runs=10):
+    rows = []
+    for name, location in LOCATIONS.items():
+        radius, queries, latency = measure(location, runs)
+        with patch.object(event_dates, "get_nearby_radius", legacy_nearby_radius):
+            legacy_radius, legacy_queries, legacy_latency = measure(location, runs)
+        rows.append(
+            (name, legacy_radius, radius, legacy_queries, queries, legacy_latency, latency)
+        )
+
+    print(
+        "{:<28} {:>10} {:>10} {:>8} {:>8} {:>12} {:>12}".format(
+            "location", "old radius", "new radius", "old qs", "new qs", "old ms", "new ms"
+        )
+    )
+    for row in rows:
+        print("{:<28} {:>10} {:>10} {:>8} {:>8} {:>12.1f} {:>12.1f}".format(*row))
+
+
+def main():
+    args = parse_args()
+    app = create_app(CONFIG)
+
+    with app.test_request_context():
+        run_benchmark(runs=args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import datetime
+
+from flask.helpers import get_debug_flag
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from pmapi.application import create_app
+from pmapi.config import DevConfig, ProdConfig
+from pmapi.event_location.clustering import grid_cells
+
+
+CONFIG = DevConfig if get_debug_flag() else ProdConfig
+
+# (name, zoom, viewport bounds as west, south, east, north)
+VIEWPORTS = [
+    ("world", 2, (-180, -60, 180, 75)),
+    ("europe", 5, (-10, 35, 30, 60)),
+    ("berlin", 11, (13.2, 52.4, 13.6, 52.6)),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the tiled points endpoint against the global points dump."
+    )
+    parser.add_argument("--runs", type=int, default=20)
+    return parser.parse_args()
+
+
+def viewport_tiles(zoom, bounds):
+    """Returns the z/x/y tiles covering a viewport."""
+    west, south, east, north = bounds
+    # grid_cells uses 4 cells per tile axis
+    xs, ys = grid_cells([north, south], [west, east], zoom)
+    return [
+        (zoom, x, y)
+        for x in range(xs[0] >> 2, (xs[1] >> 2) + 1)
+        for y in range(ys[0] >> 2, (ys[1] >> 2) + 1)
+    ]
+
+
+def p95(timings):
+    timings = sorted(timings)
+    return timings[max(0, math.ceil(len(timings) * 0.95) - 1)]
+
+
+def measure(client, requests, runs):
+    """Fetches all (url, headers) requests once per run,
+    returns (bytes per run, p95 ms per run)."""
+    timings = []
+    size = 0
+    for _ in range(runs):
+        size = 0
+        start = time.perf_counter()
+        for url, headers in requests:
+            rv = client.get(url, headers=headers)
+            size += len(rv.data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return size, p95(timings)
+
+
+def run_benchmark(client, runs=20):
+    date_min = datetime.utcnow().isoformat()
+    rows = []
+
+    size, latency = measure(
+        client, [("/api/location/points/?date_min={}".format(date_min), None)], runs
+    )
+    rows.append(("global dump", 1, size, latency))
+
+    for name, zoom, bounds in VIEWPORTS:
+        urls = [
+            "/api/location/points/{}/{}/{}?date_min={}".format(z, x, y, date_min)
+            for z, x, y in viewport_tiles(zoom, bounds)
+        ]
+        size, latency = measure(client, [(url, None) for url in urls], runs)
+        rows.append(("tiles {} (z{})".format(name, zoom), len(urls), size, latency))
+
+        # a client revalidating its cached tiles
+        revalidations = [
+            (url, {"If-None-Match": client.get(url).headers.get("ETag")}) for url in urls
+        ]
+        size, latency = measure(client, revalidations, runs)
+        rows.append(("  revalidated", len(urls), size, latency))
+
+    print("{:<24} {:>8} {:>12} {:>10}".format("request", "requests", "bytes", "p95 ms"))
+    for row in rows:
+        print("{:<24} {:>8} {:>12} {:>10.1f}".format(*row))
+
+
+def main():
+    args = parse_args()
+    app = create_app(CONFIG)
+
+    with app.app_context():
+        run_benchmark(app.test_client(), runs=args.runs)
+
+
+if __name__ == "__main__":
+    main()
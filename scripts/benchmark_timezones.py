@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+import time
+
+import pytz
+from timezonefinder import TimezoneFinder
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from pmapi.services import timezones
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Timezone lookups of adding a weekly recurring event (the first "
+            "date and its generated dates): a TimezoneFinder per lookup as "
+            "before, against the shared resolver."
+        )
+    )
+    parser.add_argument("--dates", type=int, default=10)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--lat", type=float, default=-44.3903881)
+    parser.add_argument("--lng", type=float, default=171.2372756)
+    return parser.parse_args()
+
+
+def finder_per_lookup(lat, lng):
+    tf = TimezoneFinder()
+    return pytz.timezone(tf.timezone_at(lng=lng, lat=lat))
+
+
+def shared_resolver(lat, lng):
+    return pytz.timezone(timezones.timezone_at(lat, lng))
+
+
+def add_recurring_event(resolve, lat, lng, dates):
+    # the location's timezone, then one lookup per date as add_event_date does
+    for _ in range(dates + 1):
+        resolve(lat, lng)
+
+
+def run(resolve, args):
+    start = time.perf_counter()
+    first = None
+    for i in range(args.events):
+        add_recurring_event(resolve, args.lat, args.lng, args.dates)
+        if i == 0:
+            first = (time.perf_counter() - start) * 1000
+    total = (time.perf_counter() - start) * 1000
+    return first, total / args.events
+
+
+def main():
+    args = parse_args()
+    print(
+        "{} events, {} dates each, timezone lookups per event".format(
+            args.events, args.dates
+        )
+    )
+    print("{:<20} {:>16} {:>16}".format("resolver", "first event ms", "mean event ms"))
+    for name, resolve in (
+        ("finder per lookup", finder_per_lookup),
+        ("shared resolver", shared_resolver),
+    ):
+        first, mean = run(resolve, args)
+        print("{:<20} {:>16.3f} {:>16.3f}".format(name, first, mean))
+
+
+if __name__ == "__main__":
+    main()
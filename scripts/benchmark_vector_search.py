@@ -0,0 +1,180 @@
+import argparse
+import io
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from flask.helpers import get_debug_flag
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from pmapi.services.vector_index import NumpyVectorIndex
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Recall/latency of vector search over a synthetic event corpus: "
+            "the NumPy fallback index, and with --database the pgvector indexes."
+        )
+    )
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--database", action="store_true")
+    parser.add_argument("--ef-search", default="40,100,200,400")
+    parser.add_argument("--probes", default="1,5,10,20")
+    return parser.parse_args()
+
+
+def synthetic_corpus(events, dimensions, queries, seed=0):
+    """Clustered vectors, roughly like embeddings of similar events."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(events // 200, 1), dimensions)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=events)]
+    vectors += rng.normal(scale=0.5, size=vectors.shape).astype(np.float32)
+    query_vectors = centers[rng.integers(len(centers), size=queries)]
+    query_vectors += rng.normal(scale=0.5, size=query_vectors.shape).astype(np.float32)
+    return vectors, query_vectors
+
+
+def percentile(timings, p):
+    timings = sorted(timings)
+    return timings[max(0, math.ceil(len(timings) * p) - 1)]
+
+
+def run_queries(search, query_vectors, truth, k):
+    """Returns (recall@k, p50 ms, p95 ms)"""
+    timings = []
+    found = 0
+    for query, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        ids = search(query)
+        timings.append((time.perf_counter() - start) * 1000)
+        found += len(set(ids) & expected)
+    return found / (len(truth) * k), percentile(timings, 0.5), percentile(timings, 0.95)
+
+
+def vector_literal(vector):
+    return "[{}]".format(",".join("{:.6f}".format(value) for value in vector))
+
+
+def benchmark_database(vectors, query_vectors, truth, k, ef_searches, probes):
+    from pmapi.application import create_app
+    from pmapi.config import DevConfig, ProdConfig
+    from pmapi.extensions import db
+
+    app = create_app(DevConfig if get_debug_flag() else ProdConfig)
+    rows = []
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        cursor = connection.cursor()
+        cursor.execute("DROP TABLE IF EXISTS vector_benchmark")
+        cursor.execute(
+            "CREATE TABLE vector_benchmark (id integer PRIMARY KEY, "
+            "embedding vector({}))".format(vectors.shape[1])
+        )
+        data = io.StringIO(
+            "".join(
+                "{}\t{}\n".format(i, vector_literal(vector))
+                for i, vector in enumerate(vectors)
+            )
+        )
+        cursor.copy_expert("COPY vector_benchmark (id, embedding) FROM STDIN", data)
+        connection.commit()
+
+        def search(query):
+            cursor.execute(
+                "SELECT id FROM vector_benchmark "
+                "ORDER BY embedding <=> %s::vector LIMIT %s",
+                (vector_literal(query), k),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+        try:
+            rows.append(("postgres exact",) + run_queries(search, query_vectors, truth, k))
+
+            start = time.perf_counter()
+            cursor.execute(
+                "CREATE INDEX ON vector_benchmark USING hnsw "
+                "(embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+            )
+            connection.commit()
+            print("hnsw build: {:.1f}s".format(time.perf_counter() - start))
+            for ef_search in ef_searches:
+                cursor.execute("SET hnsw.ef_search = {:d}".format(ef_search))
+                rows.append(
+                    ("hnsw ef_search={}".format(ef_search),)
+                    + run_queries(search, query_vectors, truth, k)
+                )
+
+            cursor.execute("DROP INDEX vector_benchmark_embedding_idx")
+            start = time.perf_counter()
+            cursor.execute(
+                "CREATE INDEX ON vector_benchmark USING ivfflat "
+                "(embedding vector_cosine_ops) WITH (lists = {:d})".format(
+                    max(len(vectors) // 1000, 1)
+                )
+            )
+            connection.commit()
+            print("ivfflat build: {:.1f}s".format(time.perf_counter() - start))
+            for probe in probes:
+                cursor.execute("SET ivfflat.probes = {:d}".format(probe))
+                rows.append(
+                    ("ivfflat probes={}".format(probe),)
+                    + run_queries(search, query_vectors, truth, k)
+                )
+        finally:
+            connection.rollback()
+            cursor.execute("DROP TABLE IF EXISTS vector_benchmark")
+            connection.commit()
+            connection.close()
+    return rows
+
+
+def main():
+    args = parse_args()
+    vectors, query_vectors = synthetic_corpus(args.events, args.dimensions, args.queries)
+
+    index = NumpyVectorIndex(np.arange(len(vectors)), vectors)
+    truth = [
+        {event_id for event_id, distance in index.search(query, args.k)}
+        for query in query_vectors
+    ]
+    rows = [
+        ("numpy exact",)
+        + run_queries(
+            lambda query: [event_id for event_id, distance in index.search(query, args.k)],
+            query_vectors,
+            truth,
+            args.k,
+        )
+    ]
+
+    if args.database:
+        rows += benchmark_database(
+            vectors,
+            query_vectors,
+            truth,
+            args.k,
+            [int(value) for value in args.ef_search.split(",")],
+            [int(value) for value in args.probes.split(",")],
+        )
+
+    print(
+        "{} events, {} dimensions, recall@{}".format(
+            args.events, args.dimensions, args.k
+        )
+    )
+    print("{:<24} {:>8} {:>10} {:>10}".format("search", "recall", "p50 ms", "p95 ms"))
+    for row in rows:
+        print("{:<24} {:>8.3f} {:>10.2f} {:>10.2f}".format(*row))
+
+
+if __name__ == "__main__":
+    main()
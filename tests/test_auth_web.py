@@ -1,5 +1,6 @@
 import pytest
 from flask import url_for
+from flask_login import current_user
 
 
 # ---------------------------------------------------------------------------
@@ -87,3 +88,62 @@ def test_activate_user_with_token(anon_user, db):
 def test_confirm_email_with_token(anon_user, db):
     """POST /user/confirm_email/<token> should confirm the new email address."""
     pass
+
+
+
+# ---------------------------------------------------------------------------
+# API keys
+# ---------------------------------------------------------------------------
+
+
+def test_api_key_principal_is_cached(app, regular_user, db, sql_statements):
+    """X-API-Key requests resolve the user's cached principal without
+    querying users, until a change to the user invalidates it."""
+    api_key = regular_user.generate_api_key()
+    db.session.commit()
+    assert regular_user.api_key_hash != api_key
+
+    def request_user(api_key):
+        with app.test_request_context(headers={"X-API-Key": api_key}):
+            return current_user._get_current_object()
+
+    def user_queries():
+        return [s for s in sql_statements if "FROM users" in s]
+
+    del sql_statements[:]
+    principal = request_user(api_key)
+    assert principal.id == regular_user.id
+    assert principal.role == regular_user.role
+    assert user_queries()
+
+    del sql_statements[:]
+    for _ in range(3):
+        assert request_user(api_key) == principal
+    assert user_queries() == []
+
+    regular_user.deactivate()
+    db.session.commit()
+    assert request_user(api_key).is_anonymous
+    assert request_user("not a key").is_anonymous
+
+
+def test_api_key_principal_not_cached_per_process(
+    app, regular_user, db, sql_statements, monkeypatch
+):
+    """Another process couldn't invalidate a principal cached in this one's
+    own cache, so every request reads it from the db."""
+    monkeypatch.setitem(app.config, "CACHE_SHARED", False)
+    api_key = regular_user.generate_api_key()
+    db.session.commit()
+
+    def user_queries():
+        with app.test_request_context(headers={"X-API-Key": api_key}):
+            assert current_user.id == regular_user.id
+        queries = [s for s in sql_statements if "FROM users" in s]
+        del sql_statements[:]
+        return queries
+
+    del sql_statements[:]
+    first = user_queries()
+    assert first
+    assert user_queries() == first
@@ -2,6 +2,24 @@ import pytest
 from datetime import datetime
 
 import pmapi.event.controllers as events
+from pmapi.config import BaseConfig
+from pmapi.extensions import cache
+from pmapi.services.embeddings import (
+    embedding_text_hash,
+    event_embedding_text,
+    refresh_event_embeddings,
+)
+from pmapi.event.retrieval import reciprocal_rank_fusion
+from pmapi.services.vector_index import NumpyVectorIndex
+from pmapi.services.query_embeddings import (
+    get_query_embedding,
+    get_query_embedding_stats,
+    memory_cache,
+    prune_query_embeddings,
+)
+from pmapi.services.model import QueryEmbedding
+from pmapi.celery_tasks import update_translation_field
+from pmapi.services.translations import get_translations
 from pmapi.event_date.model import EventDate
 import pmapi.exceptions as exc
 from dateutil.relativedelta import relativedelta
@@ -36,6 +54,75 @@ def test_search_events(complete_event_factory):
     assert len(results.items) == 1
 
 
+def test_refresh_event_embeddings(complete_event_factory, embedding_api, db, monkeypatch):
+    batch = [complete_event_factory(name="embedded {}".format(i % 2)) for i in range(3)]
+    texts = [event_embedding_text(event) for event in batch]
+
+    assert refresh_event_embeddings(batch, batch_size=1) == (3, 0, 0)
+    db.session.commit()
+    # one request per batch, each distinct text is only sent once
+    assert sorted(sum(embedding_api, [])) == sorted(set(texts))
+    assert all(len(inputs) == 1 for inputs in embedding_api)
+    assert batch[0].search_embedding_hash == embedding_text_hash(texts[0])
+    assert len(batch[0].search_embedding) == len(batch[1].search_embedding)
+
+    # unchanged events aren't embedded again
+    del embedding_api[:]
+    assert refresh_event_embeddings(batch) == (0, 3, 0)
+    assert embedding_api == []
+    assert refresh_event_embeddings(batch, force=True) == (3, 0, 0)
+
+    # a new model makes every embedding stale
+    monkeypatch.setattr(BaseConfig, "EMBEDDING_MODEL", "other-embedding-model")
+    assert refresh_event_embeddings(batch) == (3, 0, 0)
+
+
+def test_query_embedding_cache(db, embedding_api):
+    cache.clear()
+    memory_cache.clear()
+
+    # a miss is generated and stored
+    assert get_query_embedding("Techno  Berlin", background=False) is not None
+    # same normalized query from the worker's memory, then the table
+    assert get_query_embedding("techno berlin") is not None
+    memory_cache.clear()
+    assert get_query_embedding(" TECHNO berlin") is not None
+
+    assert embedding_api == [["techno berlin"]]
+    stats = get_query_embedding_stats()
+    assert (stats["misses"], stats["memory_hits"], stats["table_hits"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 2 / 3
+    assert stats["cached_queries"] == 1
+    assert stats["per_process"] is False
+
+    # expired embeddings are deleted by the periodic prune, not on a fill
+    assert prune_query_embeddings() == 0
+    db.session.query(QueryEmbedding).update({"created_at": datetime(2000, 1, 1)})
+    db.session.commit()
+    assert prune_query_embeddings() == 1
+    assert get_query_embedding_stats()["cached_queries"] == 0
+
+
+def test_numpy_vector_index(tmp_path):
+    index = NumpyVectorIndex([10, 20, 30], [[1, 0], [0.8, 0.6], [0, 1]])
+    nearest = index.search([1, 0.1], 2)
+    assert [event_id for event_id, distance in nearest] == [10, 20]
+    assert nearest[0][1] < nearest[1][1]
+
+    index.save(tmp_path / "index.npz")
+    loaded = NumpyVectorIndex.load(tmp_path / "index.npz")
+    assert loaded.search([0, 1], 1)[0][0] == 30
+
+
+def test_reciprocal_rank_fusion():
+    # 2 is near the top of both rankings, 1 only tops one of them
+    fused = reciprocal_rank_fusion([(1, [1, 2, 3]), (1, [2, 4, 1])], k=60)
+    assert fused == [2, 1, 4, 3]
+
+    # a heavier ranking wins ties of rank
+    assert reciprocal_rank_fusion([(0.35, [1]), (0.65, [2])]) == [2, 1]
+
+
 def test_add_event_rrule(regular_user):
     payload = {
         "creator": regular_user,
@@ -296,3 +383,37 @@ def test_delete_event(complete_event_factory):
     events.delete_event(id)
     with pytest.raises(exc.RecordNotFound):
         events.get_event_or_404(id)
+
+
+def test_translations_use_translation_memory(translation_api, db):
+    translations = get_translations("Techno in the forest", ["fr", "de"])
+    assert translations == {
+        "fr": "[fr] Techno in the forest",
+        "de": "[de] Techno in the forest",
+    }
+    # both languages in one request
+    assert len(translation_api) == 1
+
+    # the same text is only sent for the languages it wasn't translated to
+    translations = get_translations("Techno in the forest", ["fr", "de", "ja"])
+    assert translations["ja"] == "[ja] Techno in the forest"
+    assert len(translation_api) == 2
+    assert '"fr"' not in translation_api[1]
+
+    get_translations("Techno in the forest", ["fr", "ja"])
+    assert len(translation_api) == 2
+
+
+def test_cut_off_translations_are_split(translation_api, db):
+    text = "Techno in the forest. " * 30
+    langs = ["fr", "de", "ja", "es"]
+    translations = get_translations(text, langs)
+    assert translations == {lang: "[{}] {}".format(lang, text.strip()) for lang in langs}
+    # the four languages didn't fit, each half did
+    assert len(translation_api) == 3
+
+    # a language that can't be translated is left out, not stored as None
+    del translation_api[:]
+    assert get_translations("Techno in the forest. " * 100, ["fr"]) == {}
+    assert len(translation_api) == 1
+    assert update_translation_field({}, "Techno in the forest. " * 100) == {}
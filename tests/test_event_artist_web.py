@@ -1,6 +1,8 @@
 import pytest
 from flask import url_for
 
+from pmapi.event_artist.model import Artist
+
 
 # ---------------------------------------------------------------------------
 # Artist CRUD endpoints
@@ -92,3 +94,41 @@ def test_remove_artists_from_event_date(regular_user, event_date_factory):
 def test_update_artist_set_times(regular_user, event_date_factory):
     """PUT /date/<id> with update_artists should modify artist start_naive times."""
     pass
+
+
+def test_get_artists_batches_event_count(db, anon_user, sql_statements):
+    for i in range(3):
+        db.session.add(Artist(name="artist {}".format(i)))
+    db.session.commit()
+    del sql_statements[:]
+
+    rv = anon_user.client.get(url_for("artists.ArtistsResource"))
+    assert len(rv.json["items"]) == 3
+    assert [item["event_count"] for item in rv.json["items"]] == [0, 0, 0]
+    assert len([s for s in sql_statements if "FROM event_date_artists" in s]) == 1
+
+
+def test_get_artists_cursor_past_null_popularity(db, anon_user):
+    # the artists without popularity span the page boundaries
+    for i, popularity in enumerate([5, None, 3, None, None]):
+        db.session.add(Artist(name="artist {}".format(i), popularity=popularity))
+    db.session.commit()
+
+    names = []
+    cursor = ""
+    while cursor is not None:
+        rv = anon_user.client.get(
+            url_for(
+                "artists.ArtistsResource",
+                sort="popularity",
+                desc=True,
+                cursor=cursor,
+                per_page=2,
+            )
+        )
+        assert rv.status_code == 200
+        names.extend(item["name"] for item in rv.json["items"])
+        cursor = rv.json["next_cursor"]
+
+    assert names[:2] == ["artist 0", "artist 2"]
+    assert sorted(names[2:]) == ["artist 1", "artist 3", "artist 4"]
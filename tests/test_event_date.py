@@ -936,3 +936,64 @@ def test_query_event_date(complete_event_factory):
     assert len(event.event_dates) == 1
     ed = event_dates.get_event_date_or_404(event.event_dates[0].id)
     assert ed.id == event.event_dates[0].id
+
+
+def test_snap_radius():
+    assert event_dates.snap_radius(0) == 10000
+    assert event_dates.snap_radius(10000) == 10000
+    assert event_dates.snap_radius(10001) == 20000
+    assert event_dates.snap_radius(450000) == 500000
+    assert event_dates.snap_radius(20000001) == 0
+
+
+def test_query_event_dates_nearby_radius(
+    regular_user,
+    complete_event_factory,
+    event_location_factory,
+):
+    for i in range(4):
+        location = event_location_factory(
+            name="timaru {}".format(i),
+            geometry={"location": {"lat": -44.3903881, "lng": 171.2372756}},
+        )
+        complete_event_factory(name="event {}".format(i), event_location=location)
+
+    # exact location of the events
+    location = {"lat": -44.3903881, "lng": 171.2372756}
+    dates = event_dates.query_event_dates(location=location, radius=0)
+    assert dates.radius == 10000
+    assert len(dates.items) == 4
+
+    # roughly 33km north of the events
+    location = {"lat": -44.0903881, "lng": 171.2372756}
+    dates = event_dates.query_event_dates(location=location, radius=0)
+    assert dates.radius == 50000
+    assert len(dates.items) == 4
+
+
+def test_query_event_dates_nearby_radius_not_enough_events(
+    regular_user,
+    complete_event_factory,
+):
+    complete_event_factory()
+
+    location = {"lat": -44.3903881, "lng": 171.2372756}
+    dates = event_dates.query_event_dates(location=location, radius=0)
+    assert dates.radius == 0
+    assert len(dates.items) == 1
+
+
+def test_query_event_dates_facets(regular_user, complete_event_factory):
+    complete_event_factory(name="event 1", tags=["test", "timaru"])
+    complete_event_factory(name="event 2", tags=["test", "barca"])
+
+    dates = event_dates.query_event_dates(page=1)
+
+    assert len(dates.items) == 2
+    assert dates.top_tags[0].tag.tag == "test"
+    assert dates.top_tags[0].count == 2
+    assert {t.tag.tag for t in dates.top_tags} == {"test", "timaru", "barca"}
+    assert len(dates.top_regions) == 1
+    assert dates.top_regions[0].long_name == "Canterbury"
+    assert dates.top_regions[0].count == 2
+    assert dates.top_artists == []
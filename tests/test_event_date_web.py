@@ -696,3 +696,27 @@ def test_query_single_event_date(complete_event_factory, anon_user):
 
     rv = anon_user.client.get(url_for("dates.DateResource", id=event.event_dates[0].id))
     assert rv.json["id"] == event.event_dates[0].id
+
+
+def test_query_event_dates_cursor(complete_event_factory, anon_user):
+    # same start, so pages are separated by id
+    for i in range(5):
+        complete_event_factory(name="cursor {}".format(i))
+
+    ids = []
+    cursor = ""
+    while cursor is not None:
+        rv = anon_user.client.get(
+            url_for("dates.DatesResource", cursor=cursor, per_page=2)
+        )
+        assert rv.status_code == 200
+        assert rv.json["total_estimated"] is True
+        ids.extend(item["id"] for item in rv.json["items"])
+        cursor = rv.json["next_cursor"]
+
+    rv = anon_user.client.get(url_for("dates.DatesResource", per_page=10))
+    assert ids == [item["id"] for item in rv.json["items"]]
+    assert len(ids) == 5
+
+    rv = anon_user.client.get(url_for("dates.DatesResource", cursor="invalid"))
+    assert rv.status_code == 400
@@ -1,9 +1,12 @@
 import pytest
 from datetime import datetime, timedelta
 
+import pmapi.event_location.clustering as clustering
 import pmapi.event_location.controllers as event_locations
 from pmapi.event_location.model import EventLocationType
 from pmapi.exceptions import RecordNotFound
+from pmapi.services import gmaps
+from pmapi.services.timezones import timezones_at
 
 
 def test_add_location(regular_user):
@@ -52,6 +55,7 @@ def test_add_location(regular_user):
     assert location.country == "New Zealand"
     assert location.country_code == "NZ"
     assert location.address_components == location_data["address_components"]
+    assert location.tz == "Pacific/Auckland"
 
 
 def test_add_dupliacte_location(regular_user):
@@ -189,3 +193,107 @@ def test_get_all_locations_tag_search_multiple_2(
     complete_event_factory(start=start, tags=["test1", "test2"])
     locations = event_locations.get_all_locations(tags=["test1", "test3"])
     assert len(locations.all()) == 1
+
+
+def test_build_cluster_levels():
+    # two points in Christchurch and one in Wellington
+    lat = [-43.5321, -43.5301, -41.2865]
+    lng = [172.6362, 172.6402, 174.7762]
+    levels = clustering.build_cluster_levels(lat, lng)
+
+    labels, counts, lats, lngs, cells = levels[2]
+    assert list(counts) == [3]
+    assert lats[0] == pytest.approx(sum(lat) / 3)
+    assert list(cells) == list(clustering.grid_cell_ids(lat[:1], lng[:1], 2))
+
+    labels, counts, lats, lngs, cells = levels[8]
+    assert sorted(counts) == [1, 2]
+    assert labels[0] == labels[1] != labels[2]
+
+    labels, counts, lats, lngs, cells = levels[16]
+    assert list(counts) == [1, 1, 1]
+    assert sorted(cells) == sorted(clustering.grid_cell_ids(lat, lng, 16))
+
+
+def test_rebuild_and_assign_clusters(db, event_location_factory):
+    event_location_factory(geometry={"location": {"lat": -43.5321, "lng": 172.6362}})
+    event_location_factory(geometry={"location": {"lat": -41.2865, "lng": 174.7762}})
+    assert clustering.rebuild_clusters() == 2
+
+    assert [c.count for c in clustering.get_clusters(2)] == [2]
+    assert len(clustering.get_clusters(8)) == 2
+
+    # new locations are added to their clusters as they're flushed
+    location = event_location_factory(
+        geometry={"location": {"lat": -43.5301, "lng": 172.6402}}
+    )
+    db.session.commit()
+
+    assert [c.count for c in clustering.get_clusters(2)] == [3]
+    assert sorted(c.count for c in clustering.get_clusters(8)) == [1, 2]
+    assert len(clustering.get_clusters(16)) == 3
+
+    # a moved location leaves its old clusters
+    location.lat, location.lng = 51.5072, -0.1276
+    location.geo = "SRID=4326;POINT (-0.1276 51.5072)"
+    db.session.commit()
+    assert sorted(c.count for c in clustering.get_clusters(2)) == [1, 2]
+    assert sorted(c.count for c in clustering.get_clusters(8)) == [1, 1, 1]
+
+    # a deleted location's cluster is emptied, and filled again
+    db.session.delete(location)
+    db.session.commit()
+    assert [c.count for c in clustering.get_clusters(2)] == [2]
+    event_location_factory(geometry={"location": {"lat": 51.5072, "lng": -0.1276}})
+    db.session.commit()
+    assert sorted(c.count for c in clustering.get_clusters(2)) == [1, 2]
+
+
+def test_timezones_at():
+    points = [(-41.285296, 174.771275), (41.3874, 2.1686), (-41.285296, 174.771275)]
+    assert timezones_at(points) == ["Pacific/Auckland", "Europe/Madrid", "Pacific/Auckland"]
+
+
+def test_geocoding_cache(fixture_geocoder, regular_user, db):
+    place = gmaps.get_best_location_result("Timaru, New Zealand")
+    assert place["place_id"] == "ChIJ78dhY4ljLG0ROZl5hIbvAAU"
+    assert place["description"] == "Timaru, New Zealand"
+    assert fixture_geocoder == ["geocode", "place"]
+
+    # the same query, normalized, is answered from the cache
+    assert gmaps.get_best_location_result(" timaru,New Zealand ") == place
+    assert len(fixture_geocoder) == 2
+
+    # a known venue's name alone is geocoded, its place_id skips the details
+    event_locations.add_new_event_location(creator=regular_user, **place)
+    assert gmaps.get_best_location_result("Timaru")["place_id"] == place["place_id"]
+    assert fixture_geocoder == ["geocode", "place", "geocode"]
+
+
+def test_add_location_statements_dont_grow_with_the_country(regular_user, db, sql_statements):
+    def add_location(n):
+        event_locations.add_new_event_location(
+            creator=regular_user,
+            geometry={"location": {"lat": -41.285296, "lng": 174.771275}},
+            name="location {}".format(n),
+            description="location {}".format(n),
+            place_id="place {}".format(n),
+            types=["establishment", "point_of_interest"],
+            address_components=[
+                {"long_name": "Town {}".format(n), "short_name": "Town {}".format(n), "types": ["locality"]},
+                {"long_name": "Region {}".format(n), "short_name": "R{}".format(n), "types": ["administrative_area_level_1"]},
+                {"long_name": "New Zealand", "short_name": "NZ", "types": ["country"]},
+            ],
+        )
+        db.session.commit()
+
+    add_location(0)
+    del sql_statements[:]
+    add_location(1)
+    statements = len(sql_statements)
+
+    for n in range(2, 30):
+        add_location(n)
+    del sql_statements[:]
+    add_location(30)
+    assert len(sql_statements) == statements
@@ -1,5 +1,10 @@
+import json
 from datetime import datetime
-from flask import url_for
+from flask import Flask, url_for
+
+from pmapi.common.response_cache import invalidate_tags, response_cache_key
+from pmapi.event_location.clustering import rebuild_clusters
+from pmapi.extensions import cache
 
 
 def test_get_locations(anon_user, event_location_factory):
@@ -94,6 +99,106 @@ def test_get_points_date_range_tags(anon_user, complete_event_factory):
     assert len(rv.json) == 1
 
 
+def test_get_clusters(anon_user, event_location_factory):
+    event_location_factory(geometry={"location": {"lat": -43.5321, "lng": 172.6362}})
+    event_location_factory(geometry={"location": {"lat": 52.5200, "lng": 13.4049}})
+    rebuild_clusters()
+
+    rv = anon_user.client.get(url_for("locations.ClustersResource", zoom=10))
+    assert rv.status_code == 200
+    assert len(rv.json) == 2
+
+    bounds = {
+        "_northEast": {"lat": -40, "lng": 175},
+        "_southWest": {"lat": -47, "lng": 166},
+    }
+    rv = anon_user.client.get(
+        url_for("locations.ClustersResource", zoom=10, bounds=json.dumps(bounds))
+    )
+    assert len(rv.json) == 1
+    assert rv.json[0]["count"] == 1
+    assert rv.json[0]["lat"] == -43.5321
+
+
+def test_get_tile_points(anon_user, complete_event_factory):
+    start = datetime(year=2006, month=1, day=1)
+    complete_event_factory(start=start)
+    complete_event_factory(start=start)
+
+    # zoomed out, the two events at the same location are counted
+    rv = anon_user.client.get(
+        url_for("locations.TilePointsResource", z=2, x=3, y=2, date_min=start)
+    )
+    assert rv.status_code == 200
+    assert rv.json["points"] == []
+    assert len(rv.json["clusters"]) == 1
+    assert rv.json["clusters"][0]["count"] == 2
+
+    rv = anon_user.client.get(
+        url_for("locations.TilePointsResource", z=12, x=3996, y=2612, date_min=start)
+    )
+    assert rv.json["clusters"] == []
+    assert len(rv.json["points"]) == 2
+    assert len(rv.json["points"][0]["events"]) == 1
+
+    # empty neighbouring tile
+    rv = anon_user.client.get(
+        url_for("locations.TilePointsResource", z=12, x=3997, y=2612, date_min=start)
+    )
+    assert rv.json["points"] == []
+
+    rv = anon_user.client.get(
+        url_for("locations.TilePointsResource", z=2, x=3, y=2, date_min=start),
+        headers={"If-None-Match": rv.headers["ETag"]},
+    )
+    assert rv.status_code == 200
+    etag = rv.headers["ETag"]
+    rv = anon_user.client.get(
+        url_for("locations.TilePointsResource", z=2, x=3, y=2, date_min=start),
+        headers={"If-None-Match": etag},
+    )
+    assert rv.status_code == 304
+
+
+def test_get_points_cached(app, monkeypatch, anon_user, complete_event_factory):
+    monkeypatch.setitem(app.config, "RESPONSE_CACHE_TIMEOUT", 60)
+    cache.clear()
+    start = datetime(year=2006, month=1, day=1)
+    complete_event_factory(start=start)
+
+    url = url_for("locations.PointsResource", date_min=start)
+    rv = anon_user.client.get(url)
+    assert rv.headers["X-Cache"] == "MISS"
+    rv = anon_user.client.get(url)
+    assert rv.headers["X-Cache"] == "HIT"
+    assert len(rv.json) == 1
+
+    # committing a new event invalidates the cached points
+    complete_event_factory(start=start)
+    rv = anon_user.client.get(url)
+    assert rv.headers["X-Cache"] == "MISS"
+    assert len(rv.json) == 2
+
+
+def test_cached_points_invalidated_by_other_processes(tmp_path):
+    """A commit in one process invalidates the responses cached by another,
+    two clients of one filesystem cache stand in for the shared backend."""
+    web, worker = Flask("web"), Flask("worker")
+    for process in (web, worker):
+        cache.init_app(
+            process, config={"CACHE_TYPE": "filesystem", "CACHE_DIR": str(tmp_path)}
+        )
+
+    with web.test_request_context("/api/locations/points"):
+        key = response_cache_key(["events"])
+        cache.set(key, "points")
+    with worker.test_request_context("/api/locations/points"):
+        assert cache.get(response_cache_key(["events"])) == "points"
+        invalidate_tags(["events"])
+    with web.test_request_context("/api/locations/points"):
+        assert response_cache_key(["events"]) != key
+
+
 def test_get_event_location_or_404(anon_user, event_location_factory):
     event_location = event_location_factory()
     rv = anon_user.client.get(
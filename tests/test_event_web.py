@@ -1,6 +1,9 @@
+import pytest
 from datetime import datetime
 from flask import url_for
 
+from pmapi.event.model import event_page_view_rollups_table
+
 
 def test_get_event(anon_user, complete_event_factory):
     event = complete_event_factory()
@@ -9,6 +12,22 @@ def test_get_event(anon_user, complete_event_factory):
     assert rv.json["id"] == event.id
 
 
+def test_get_event_counts_page_views(db, anon_user, regular_user, complete_event_factory):
+    event = complete_event_factory()
+    for client in [anon_user.client, anon_user.client, regular_user.client, regular_user.client]:
+        rv = client.get(url_for("events.EventResource", event_id=event.id))
+    assert rv.json["page_views"] == 4
+
+    rollup = db.session.execute(
+        event_page_view_rollups_table.select().where(
+            event_page_view_rollups_table.c.event_id == event.id
+        )
+    ).one()
+    assert rollup.views == 4
+    # anonymous views aren't unique views
+    assert rollup.unique_views == 1
+
+
 def test_get_event_or_404(anon_user):
     rv = anon_user.client.get(
         url_for("events.EventResource", event_id="52544252-6f78-4fbd-8fb9-adb3dec7b3f8")
@@ -34,6 +53,40 @@ def test_search_events(complete_event_factory, anon_user):
     assert len(rv.json["items"]) == 1
 
 
+def count_statements(statements, fragment):
+    return len([statement for statement in statements if fragment in statement])
+
+
+def test_search_events_batches_row_properties(
+    complete_event_factory, anon_user, sql_statements
+):
+    for i in range(3):
+        complete_event_factory(name="batched {}".format(i))
+    del sql_statements[:]
+
+    rv = anon_user.client.get(url_for("events.EventsResource", query="batched"))
+    assert len(rv.json["items"]) == 3
+    assert all(item["next_date"] for item in rv.json["items"])
+    # one query per property for the whole page
+    assert count_statements(sql_statements, "FROM event_page_view_rollups") == 1
+    assert count_statements(sql_statements, "DISTINCT ON (event_dates.event_id)") == 1
+    assert count_statements(sql_statements, "DISTINCT ON (events_version.id)") == 1
+
+
+def test_featured_events_batches_row_properties(
+    db, complete_event_factory, anon_user, sql_statements
+):
+    for i in range(3):
+        event = complete_event_factory(name="featured {}".format(i))
+        event.featured = True
+    db.session.commit()
+    del sql_statements[:]
+
+    rv = anon_user.client.get(url_for("events.FeaturedEventsResource"))
+    assert len(rv.json["items"]) == 3
+    assert count_statements(sql_statements, "DISTINCT ON (event_dates.event_id)") == 1
+
+
 def test_add_event_rrule(regular_user):
     payload = {
         "name": "Test event",
@@ -453,3 +506,38 @@ def test_delete_event_no_permission(complete_event_factory, regular_user_factory
     event_id = event.id
     rv = user2.client.delete(url_for("events.EventResource", event_id=event_id))
     assert rv.status_code == 403  # no permission
+
+
+def test_failed_page_view_flush_is_requeued(app, monkeypatch):
+    """Views that fail to be written are kept for the next flush."""
+    from pmapi.event import page_views
+
+    def fail(views):
+        raise RuntimeError("db down")
+
+    page_views.buffer.drain()
+    page_views.buffer.add(1, None)
+    page_views.buffer.add(2, None)
+    monkeypatch.setattr(page_views, "write_page_views", fail)
+    with pytest.raises(RuntimeError):
+        page_views.flush_page_views()
+    page_views.buffer.add(3, None)
+    views, dropped = page_views.buffer.drain()
+    assert [view["event_id"] for view in views] == [1, 2, 3]
+    assert dropped == 0
+
+
+def test_page_view_buffer_drops_the_oldest():
+    """A full buffer, e.g. while the db is down, drops the oldest views."""
+    from pmapi.event.page_views import PageViewBuffer
+
+    buffer = PageViewBuffer(3)
+    for event_id in (1, 2, 3):
+        buffer.add(event_id, None)
+    views, _ = buffer.drain()
+    buffer.add(4, None)
+    buffer.add(5, None)
+    buffer.requeue(views)
+    views, dropped = buffer.drain()
+    assert [view["event_id"] for view in views] == [3, 4, 5]
+    assert dropped == 2
@@ -0,0 +1,149 @@
+import base64
+import os
+import subprocess
+
+import pytest
+from PIL import Image
+
+import pmapi.media_item.controllers as media_items
+from pmapi import exceptions as exc
+from pmapi.media_item import renditions, transcoding, uploads
+from pmapi.media_item.model import MediaItem
+from pmapi.media_item.schemas import MediaItemSchema
+
+
+def test_render_renditions(tmp_path):
+    Image.new("RGB", (3000, 2000)).save(tmp_path / "image_upload", "JPEG")
+    filenames = {
+        column: "image_{}.webp".format(column) for column, size in renditions.IMAGE_RENDITIONS
+    }
+    filenames["image_filename"] = "image.webp"
+
+    renditions.render_renditions(str(tmp_path), filenames)
+
+    sizes = {
+        column: Image.open(tmp_path / filename).size for column, filename in filenames.items()
+    }
+    assert sizes["image_filename"] == (3000, 2000)
+    assert sizes["image_med_filename"][0] == 1024
+    assert sizes["thumb_xxs_filename"][0] == 64
+    # the upload is removed once every size is written
+    assert not os.path.exists(tmp_path / "image_upload")
+
+
+def test_processing_media_item_has_no_urls(app):
+    item = MediaItem(
+        type="image",
+        status=renditions.PROCESSING,
+        event_id=1,
+        image_filename="image.webp",
+        thumb_filename="image_thumb.webp",
+    )
+    data = MediaItemSchema().dump(item)
+    assert data["status"] == "processing"
+    assert "thumb_url" not in data
+
+    item.status = renditions.FAILED
+    assert "thumb_url" not in MediaItemSchema().dump(item)
+
+    item.status = renditions.READY
+    assert MediaItemSchema().dump(item)["thumb_url"].endswith("image_thumb.webp")
+
+
+def test_failed_video_has_no_urls(app, tmp_path):
+    filenames = transcoding.video_filenames("video", 640, 360)
+    source = tmp_path / transcoding.upload_filename(filenames["video_low_filename"])
+    source.write_bytes(b"not a video")
+    with pytest.raises(Exception):
+        transcoding.transcode_video(str(tmp_path), filenames, 640, 360, 10)
+    # the upload of a video that fails to transcode is removed
+    assert not os.path.exists(source)
+
+    item = MediaItem(type="video", status=renditions.FAILED, event_id=1, **filenames)
+    data = MediaItemSchema().dump(item)
+    assert data["status"] == "failed"
+    assert not [key for key in data if key.endswith("_url")]
+
+
+def test_unreadable_image_is_rejected(app, tmp_path):
+    upload_path = tmp_path / "upload.png"
+    upload_path.write_bytes(b"not an image")
+    with pytest.raises(exc.InvalidAPIRequest):
+        media_items.save_media_item((str(upload_path), "image/png"), str(tmp_path / "media"))
+    assert not os.path.exists(upload_path)
+
+    # the upload of an image that fails to render is removed too
+    (tmp_path / "image_upload").write_bytes(b"not an image")
+    filenames = {
+        column: "image_{}.webp".format(column) for column, size in renditions.IMAGE_RENDITIONS
+    }
+    filenames["image_filename"] = "image.webp"
+    with pytest.raises(Exception):
+        renditions.render_renditions(str(tmp_path), filenames)
+    assert not os.path.exists(tmp_path / "image_upload")
+
+
+def test_decode_base64_upload(upload_folder):
+    data = os.urandom(uploads.CHUNK_SIZE * 2 + 5)
+    path, mimetype = uploads.decode_base64_upload(
+        "data:image/png;base64," + base64.b64encode(data).decode()
+    )
+    assert mimetype == "image/png"
+    assert os.path.dirname(path) == str(upload_folder)
+    with open(path, "rb") as fh:
+        assert fh.read() == data
+
+    # line wrapped base64
+    path, mimetype = uploads.decode_base64_upload(
+        "data:image/png;base64," + base64.encodebytes(data).decode()
+    )
+    with open(path, "rb") as fh:
+        assert fh.read() == data
+
+
+def test_save_upload_too_large(app, upload_folder, monkeypatch):
+    monkeypatch.setitem(app.config, "MEDIA_UPLOAD_MAX_SIZE", 10)
+    with pytest.raises(exc.InvalidAPIRequest):
+        uploads.save_upload([b"0123456789", b"0"], "image/png")
+    # the partial file is removed
+    assert os.listdir(upload_folder) == []
+
+
+def test_video_filenames():
+    assert set(transcoding.video_filenames("a", 640, 360)) == {
+        "thumb_filename", "video_poster_filename", "video_low_filename"
+    }
+    # portrait videos get the renditions of the same size landscape
+    assert "video_med_filename" in transcoding.video_filenames("a", 1080, 1920)
+    assert "video_high_filename" not in transcoding.video_filenames("a", 1080, 1920)
+
+
+def test_parse_progress():
+    output = [
+        "frame=10\n", "out_time_us=2500000\n", "progress=continue\n",
+        "out_time_us=9000000\n", "progress=continue\n",
+        "out_time_us=10000000\n", "progress=end\n",
+    ]
+    assert list(transcoding.parse_progress(output, 10)) == [25, 90, 100]
+
+
+@pytest.mark.skipif(not os.path.exists(transcoding.FFMPEG), reason="needs ffmpeg")
+def test_transcode_video(app, tmp_path):
+    filenames = transcoding.video_filenames("clip", 320, 240)
+    subprocess.run(
+        [
+            transcoding.FFMPEG, "-v", "quiet", "-f", "lavfi",
+            "-i", "testsrc=size=320x240:rate=10", "-t", "2", "-pix_fmt", "yuv420p",
+            "-f", "mp4", str(tmp_path / transcoding.upload_filename(filenames["video_low_filename"])),
+        ],
+        check=True,
+    )
+    progress = []
+
+    transcoding.transcode_video(str(tmp_path), filenames, 320, 240, 2, progress.append)
+
+    assert progress[-1] == 100
+    assert transcoding.probe_video(str(tmp_path / filenames["video_low_filename"]))[:2] == (320, 240)
+    assert Image.open(tmp_path / filenames["thumb_filename"]).size == (320, 240)
+    assert os.path.exists(tmp_path / filenames["video_poster_filename"])
+    assert not os.path.exists(tmp_path / "clip_upload")
@@ -1,6 +1,10 @@
+import io
+
 import pytest
 from flask import url_for
 
+from pmapi.media_item import uploads
+
 
 # ---------------------------------------------------------------------------
 # Media item endpoint tests
@@ -37,6 +41,47 @@ def test_delete_media_item_unauthorized(regular_user_factory, complete_event_fac
     pass
 
 
+def test_upload_media_file(regular_user, upload_folder):
+    """POST /media/upload should stream the file to disk and return an uploadId."""
+    rv = regular_user.client.post(
+        url_for("media.MediaUploadResource"),
+        data={"file": (io.BytesIO(b"RIFF fake webp"), "image.webp", "image/webp")},
+        content_type="multipart/form-data",
+    )
+    assert rv.status_code == 201
+    path, mimetype = uploads.get_upload(rv.json["uploadId"])
+    assert mimetype == "image/webp"
+    with open(path, "rb") as fh:
+        assert fh.read() == b"RIFF fake webp"
+
+
+def test_upload_media_file_unsupported_type(regular_user, upload_folder):
+    rv = regular_user.client.post(
+        url_for("media.MediaUploadResource"),
+        data=b"%PDF-1.4",
+        content_type="application/pdf",
+    )
+    assert rv.status_code == 400
+
+
+def test_upload_media_file_too_large(app, regular_user, upload_folder, monkeypatch):
+    """Bodies over MAX_CONTENT_LENGTH are refused before they're read."""
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 10)
+    rv = regular_user.client.post(
+        url_for("media.MediaUploadResource"),
+        data={"file": (io.BytesIO(b"RIFF fake webp"), "image.webp", "image/webp")},
+        content_type="multipart/form-data",
+    )
+    assert rv.status_code == 413
+    rv = regular_user.client.post(
+        url_for("media.MediaUploadResource"),
+        data=b"RIFF fake webp",
+        content_type="image/webp",
+    )
+    assert rv.status_code == 413
+    assert not upload_folder.exists()
+
+
 # ---------------------------------------------------------------------------
 # Logo upload via event creation
 # ---------------------------------------------------------------------------
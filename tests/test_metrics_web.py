@@ -1,3 +1,5 @@
+from collections import Counter
+
 import pytest
 from flask import url_for
 
@@ -29,3 +31,77 @@ def test_get_country_metrics(anon_user):
 def test_get_country_metrics_with_date_range(anon_user):
     """GET /metrics/countries?start_time=...&end_time=... should filter by date."""
     pass
+
+
+def test_usage_is_buffered_and_summarized(db):
+    """Buffered usage is written in one batch with its hourly summaries."""
+    import time
+
+    from pmapi.metrics import usage
+    from pmapi.metrics.model import FlaskUsage, usage_summary_tables
+
+    record = usage.UsageRecord(
+        url="http://localhost/api/event/1",
+        user_agent="Mozilla/5.0",
+        ua_browser="firefox",
+        ua_language="en",
+        ua_platform="linux",
+        ua_version="120.0",
+        blueprint="events",
+        view_args={"event_id": 1},
+        status=200,
+        remote_addr="127.0.0.1",
+        xforwardedfor=None,
+        authorization=False,
+        ip_info={"country": "NZ"},
+        path="/api/event/1",
+        speed=0.01,
+        date=int(time.time()),
+        username=None,
+        track_var={},
+        server_name="PARTYMAP",
+        content_length=100,
+    )
+    buffer = usage.UsageBuffer(2)
+    for _ in range(3):
+        buffer.add(record, flush_size=10)
+    records, dropped = buffer.drain()
+    assert len(records) == 2
+    assert dropped == 1
+
+    usage.write_usage(records)
+    usage.write_usage(records)
+    assert db.session.query(FlaskUsage).count() == 4
+    hourly = db.session.execute(usage_summary_tables[("url", "hourly")].select()).all()
+    assert [(row.url, row.hits, row.transfer) for row in hourly] == [
+        ("http://localhost/api/event/1", 4, 400)
+    ]
+
+
+def test_failed_usage_write_is_requeued(app, monkeypatch):
+    """Records that fail to be written go back to the buffer, the oldest
+    are dropped if they don't fit."""
+    from pmapi.metrics import usage
+
+    def fail(records):
+        raise RuntimeError("db down")
+
+    buffer = usage.UsageBuffer(3)
+    monkeypatch.setattr(usage, "buffer", buffer)
+    monkeypatch.setattr(usage, "write_usage", fail)
+    monkeypatch.setitem(app.config, "CACHE_SHARED", False)
+    monkeypatch.setattr(usage, "_stats", Counter())
+    buffer.add("a", flush_size=10)
+    buffer.add("b", flush_size=10)
+    with pytest.raises(RuntimeError):
+        usage.flush_usage()
+    assert buffer.drain() == (["a", "b"], 0)
+
+    buffer.add("c", flush_size=10)
+    buffer.add("d", flush_size=10)
+    buffer.requeue(["a", "b"])
+    assert buffer.drain() == (["b", "c", "d"], 1)
+
+    stats = usage.get_usage_stats()
+    assert stats["failed"] == 2
+    assert stats["per_process"] is True
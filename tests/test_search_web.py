@@ -1,5 +1,10 @@
 import pytest
 from flask import url_for
+from sqlalchemy import select
+
+from pmapi.event_artist.model import Artist
+from pmapi.search.controllers import refresh_search_term_popularity
+from pmapi.search.model import SearchTerm
 
 
 # ---------------------------------------------------------------------------
@@ -7,16 +12,53 @@ from flask import url_for
 # ---------------------------------------------------------------------------
 
 
-@pytest.mark.skip(reason="TODO")
-def test_search_with_query(anon_user, complete_event_factory):
+def test_search_with_query(db, anon_user, complete_event_factory, sql_statements):
     """GET /search/?query=... should return matching events, tags, locations, artists."""
-    pass
+    quiet = complete_event_factory(name="techno night", tags=["techno"])
+    busy = complete_event_factory(name="techno day", tags=["techno"])
+    complete_event_factory(name="hidden techno")
+    for event in (quiet, busy):
+        event.hidden = False
+    db.session.add(Artist(name="Techno Artist", popularity=10))
+    db.session.commit()
+    complete_event_factory(name="other", tags=["techno"]).hidden = False
+    db.session.commit()
+    del sql_statements[:]
+
+    rv = anon_user.client.get(url_for("search.SearchResource", query="TECHNO"))
+    results = rv.json["results"]
+    assert [result["type"] for result in results] == ["tag", "artist", "event", "event"]
+    assert results[0]["result"] == "techno"
+    assert results[1]["id"] is not None
+    assert {result["id"] for result in results[2:]} == {quiet.id, busy.id}
+    # all suggestions come from one query
+    assert len([s for s in sql_statements if "FROM search_terms" in s]) == 1
+
+
+def test_refresh_search_term_popularity(db, complete_event_factory):
+    """The periodic refresh rewrites only the popularity that's out of date,
+    like an event's upcoming dates once they've passed."""
+    event = complete_event_factory(name="refreshed event")
+    db.session.commit()
+    search_terms = SearchTerm.__table__
+    term = search_terms.c.key == str(event.id)
+    popularity = db.session.execute(
+        select(search_terms.c.popularity).where(term)
+    ).scalar()
+
+    assert refresh_search_term_popularity() == 0
+    db.session.execute(search_terms.update().where(term).values(popularity=popularity + 5))
+    db.session.commit()
+    assert refresh_search_term_popularity() == 1
+    assert db.session.execute(
+        select(search_terms.c.popularity).where(term)
+    ).scalar() == popularity
 
 
-@pytest.mark.skip(reason="TODO")
 def test_search_empty_query(anon_user):
     """GET /search/?query= (empty) should handle gracefully."""
-    pass
+    rv = anon_user.client.get(url_for("search.SearchResource", query=""))
+    assert rv.json["results"] == []
 
 
 @pytest.mark.skip(reason="TODO")
@@ -17,3 +17,33 @@ def test_ip_lookup_default(anon_user):
 def test_ip_lookup_specific_ip(anon_user):
     """GET /services/ip_lookup/<ip> should return location for the given IP."""
     pass
+
+
+def test_ip_location_cached_per_network(monkeypatch):
+    """Ip locations are read once per /24 and named in the requested locale."""
+    from pmapi.services import ip_location
+
+    reads = []
+
+    def read_location(ip_address):
+        reads.append(ip_address)
+        return {
+            "country": {"en": "New Zealand", "de": "Neuseeland"},
+            "region": {"en": "Auckland"},
+            "city": {"en": "Auckland"},
+            "lat": -36.85,
+            "lon": 174.76,
+        }
+
+    monkeypatch.setattr(ip_location, "read_location", read_location)
+    ip_location.cache.clear()
+
+    location = ip_location.lookup("49.224.108.78")
+    assert ip_location.lookup("49.224.108.9") == location
+    assert reads == ["49.224.108.78"]
+    ip_location.lookup("49.224.109.9")
+    assert len(reads) == 2
+
+    assert ip_location.serialize_location(location, "de")["country"] == "Neuseeland"
+    assert ip_location.serialize_location(location, "de")["region"] == "Auckland"
+    assert ip_location.serialize_location({}, "de") == {}
@@ -0,0 +1,65 @@
+import gzip
+
+from flask import url_for
+
+from pmapi.celery_tasks import update_sitemap
+from pmapi.event_artist.model import Artist
+from pmapi.extensions import cache
+from pmapi.sitemap.controllers import regenerate_sitemap, schedule_sitemap_update
+
+
+def test_get_sitemap(app, db, anon_user, complete_event_factory, monkeypatch, tmp_path):
+    """GET /sitemap.xml should index gzipped shards of the events and artists."""
+    monkeypatch.setitem(app.config, "SITEMAP_DIR", str(tmp_path))
+    monkeypatch.setitem(app.config, "SITEMAP_SHARD_SIZE", 2)
+    events = [complete_event_factory(name="event {}".format(i)) for i in range(3)]
+    artist = Artist(name="sitemap artist")
+    db.session.add(artist)
+    db.session.commit()
+
+    rv = anon_user.client.get(url_for("sitemap.SiteMapResource"))
+    assert rv.status_code == 200
+    assert rv.mimetype == "application/xml"
+    index = rv.get_data(as_text=True)
+    assert "sitemap-pages.xml.gz" in index
+    for event in events:
+        assert "sitemap-events-{}.xml.gz".format(event.id // 2) in index
+    assert "sitemap-artists-{}.xml.gz".format(artist.id // 2) in index
+
+    shard = "events-{}".format(events[0].id // 2)
+    rv = anon_user.client.get(url_for("sitemap.SiteMapShardResource", shard=shard))
+    assert rv.status_code == 200
+    urls = gzip.decompress(rv.data).decode()
+    assert "/event/{}?name=event 0".format(events[0].id) in urls
+
+    rv = anon_user.client.get(
+        url_for("sitemap.SiteMapShardResource", shard=shard),
+        headers={"If-None-Match": rv.headers["ETag"]},
+    )
+    assert rv.status_code == 304
+
+    rv = anon_user.client.get(url_for("sitemap.SiteMapShardResource", shard="events-x"))
+    assert rv.status_code == 404
+
+
+def test_sitemap_update_pending_across_processes(app, db, monkeypatch, tmp_path):
+    """A shard's pending update is seen by the celery worker that clears it,
+    whatever cache each process has."""
+    monkeypatch.setitem(app.config, "SITEMAP_DIR", str(tmp_path))
+    queued = []
+    monkeypatch.setattr(
+        update_sitemap, "apply_async", lambda args, countdown: queued.append(args[0])
+    )
+
+    schedule_sitemap_update({"events-0"})
+    # queued once while it's pending
+    schedule_sitemap_update({"events-0"})
+    assert queued == [["events-0"]]
+
+    # the task runs in a worker with its own cache
+    cache.clear()
+    regenerate_sitemap(["events-0"])
+
+    # a change after the update queues another one
+    schedule_sitemap_update({"events-0"})
+    assert queued == [["events-0"], ["events-0"]]
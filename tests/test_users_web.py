@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta
+
 from flask import url_for
 from pmapi.notification.model import EmailAction
 from sqlalchemy import and_
@@ -115,3 +117,57 @@ def test_activate_user(anon_user, db):
 def test_activate_user_invalid_token(anon_user, db):
     rv = anon_user.client.post(url_for("users.activate", token="test"))
     assert rv.status_code == 404
+
+
+def test_repeated_requests_dont_write_last_active(regular_user, db, sql_statements):
+    """Authenticated requests write last_active only once it's older than
+    LAST_ACTIVE_GRANULARITY."""
+
+    def get_current_user():
+        rv = regular_user.client.get(
+            url_for("auth.LoginResource"), headers={"Content-Type": "application/json"}
+        )
+        assert rv.status_code == 200
+
+    def last_active_writes():
+        return [s for s in sql_statements if s.startswith("UPDATE users")]
+
+    del sql_statements[:]
+    for _ in range(3):
+        get_current_user()
+    assert last_active_writes() == []
+
+    regular_user.last_active = datetime.utcnow() - timedelta(days=1)
+    db.session.commit()
+    del sql_statements[:]
+    for _ in range(3):
+        get_current_user()
+    assert len(last_active_writes()) == 1
+
+
+def test_activity_flusher_starts_once_per_process(app, monkeypatch):
+    """Every request starts the process's flusher if it isn't running,
+    even when there's nothing new to note."""
+    import threading
+    from datetime import datetime
+
+    from pmapi.auth.principal import Principal
+    from pmapi.user import activity
+
+    started = []
+    running = threading.Event()
+
+    def run_flusher(app):
+        started.append(app)
+        running.set()
+
+    monkeypatch.setattr(activity.flusher, "_pid", None)
+    monkeypatch.setattr(activity.flusher, "run", run_flusher)
+    monkeypatch.setitem(app.config, "LAST_ACTIVE_FLUSH_INTERVAL", 60)
+    user = Principal("user", 10, "active", "en", datetime.utcnow())
+    with app.test_request_context():
+        activity.record_activity(user)
+        activity.record_activity(user)
+    assert running.wait(1)
+    assert started == [app]
+    assert activity.buffer.drain() == {}